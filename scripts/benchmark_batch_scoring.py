@@ -0,0 +1,107 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare the throughput of predicting the merchant size of all leads with BatchScorer and with the previous
+prediction, which preprocessed all leads at once, saved the preprocessed data, predicted all leads in one call,
+mapped the labels in Python and read the enriched data again for the identity columns of the leads.
+
+Synthetic enriched leads are written into a temporary directory, a LightGBM model with the parameters of the
+LightGBM predictor is trained on a sample of them and the leads are scored with both approaches.
+
+Usage:
+    python scripts/benchmark_batch_scoring.py --leads 200000 --chunk-size 50000
+    python scripts/benchmark_batch_scoring.py --leads 200000 --workers 1 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from benchmark_sparse_features import add_place_types  # noqa: E402
+from benchmark_storage_format import create_enriched_leads  # noqa: E402
+
+from database import get_database  # noqa: E402
+from database.leads import LocalRepository, write_dataframe  # noqa: E402
+from evp import LEAD_ID_COLUMNS, BatchScorer  # noqa: E402
+from evp.predictors import LightGBM  # noqa: E402
+from preprocessing import Preprocessing, get_transformer_name  # noqa: E402
+
+MODEL_NAME = "lightgbm_epochs(1)_f1(0.5)_numclasses(5)_model.pkl"
+
+
+def previous_prediction(model_name: str) -> int:
+    db = get_database()
+    transformer = db.load_ml_model(get_transformer_name(model_name))
+    preprocessor = Preprocessing(
+        filter_null_data=False, historical_bool=False, transformer=transformer
+    )
+    preprocessor.load_data()
+    df = preprocessor.implement_preprocessing_pipeline()
+    preprocessor.save_preprocessed_data()
+
+    model = db.load_ml_model(model_name)
+    predictions = model.predict(df[transformer.get_feature_names_out()])
+    size_mapping = {0: "XS", 1: "S", 2: "M", 3: "L", 4: "XL"}
+    remapped_predictions = [size_mapping[prediction] for prediction in predictions]
+
+    raw_data = db.load_enriched_dataframe(historical=False, columns=LEAD_ID_COLUMNS)
+    raw_data["PredictedMerchantSize"] = remapped_predictions
+    db.save_prediction(raw_data)
+    return len(raw_data)
+
+
+def prepare(work_dir: str, num_leads: int, train_size: int) -> None:
+    LocalRepository.DF_OUTPUT = os.path.join(work_dir, "leads_enriched.csv")
+    LocalRepository.DF_PREPROCESSED_INPUT = work_dir
+    LocalRepository.DF_PREDICTION_OUTPUT = os.path.join(work_dir, "predictions.csv")
+    LocalRepository.ML_MODELS = work_dir
+    db = get_database()
+
+    leads = add_place_types(
+        create_enriched_leads(num_leads, Preprocessing().numerical_data), 300
+    )
+    write_dataframe(leads, db.get_enriched_data_path())
+
+    preprocessor = Preprocessing(filter_null_data=False)
+    preprocessor.preprocessed_df = db.load_enriched_dataframe().iloc[:train_size]
+    features = preprocessor.implement_preprocessing_pipeline()
+    labels = features.pop(preprocessor.class_labels)
+    predictor = LightGBM()
+    predictor.model.fit(features.to_numpy(np.float32), labels)
+    db.save_ml_model(predictor.model, MODEL_NAME)
+    db.save_ml_model(preprocessor.transformer, get_transformer_name(MODEL_NAME))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=200_000)
+    parser.add_argument("--train-size", type=int, default=20_000)
+    parser.add_argument("--chunk-size", type=int, default=50_000)
+    parser.add_argument(
+        "--workers", type=int, nargs="+", default=sorted({1, os.cpu_count()})
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        prepare(work_dir, args.leads, args.train_size)
+
+        results = []
+        start = time.perf_counter()
+        rows = previous_prediction(MODEL_NAME)
+        results.append(("previous", rows / (time.perf_counter() - start)))
+        for workers in args.workers:
+            report = BatchScorer(MODEL_NAME, workers=workers).score(args.chunk_size)
+            results.append((f"batch, {workers} workers", report["leads_per_second"]))
+
+    print(f"{args.leads} leads, chunks of {args.chunk_size} leads")
+    print(f"{'prediction':>20} | {'leads/s':>9}")
+    for name, leads_per_second in results:
+        print(f"{name:>20} | {leads_per_second:>9.0f}")
@@ -0,0 +1,128 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare the peak memory and time of preparing the training data from the preprocessed data file and from the feature
+store.
+
+Synthetic preprocessed leads are written as preprocessed data file and as feature store into a temporary directory.
+Every run loads the data and splits it into the training, validation and test sets of EstimatedValuePredictor in
+its own subprocess, such that every run starts with an empty page cache of the process. The peak memory is measured
+with tracemalloc, memory-mapped pages of the feature store are not included, as they can be dropped by the operating
+system at any time. The float64 run converts the preprocessed data like EstimatedValuePredictor did before the
+features were converted to float32.
+
+Usage:
+    python scripts/benchmark_feature_store.py --leads 100000 --features 335
+    python scripts/benchmark_feature_store.py --leads 100000 --format parquet
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+BASE_PATH = os.path.dirname(__file__)
+SRC_PATH = os.path.abspath(os.path.join(BASE_PATH, "../src"))
+
+
+def create_preprocessed_data(num_leads: int, num_features: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    # a few scaled numerical features, the remaining features are mostly zero encodings, all of them float64 like
+    # the features of PreprocessingTransformer
+    num_numerical = min(32, num_features)
+    data = {f"numerical_{i}": rng.normal(size=num_leads) for i in range(num_numerical)}
+    data |= {
+        f"place_type_{i}": (rng.random(num_leads) < 0.01).astype(float)
+        for i in range(num_features - num_numerical)
+    }
+    data["MerchantSizeByDPV"] = rng.integers(0, 5, num_leads)
+    return pd.DataFrame(data)
+
+
+def run_worker(work_dir: str, storage_format: str, mode: str) -> None:
+    from database.leads import LocalRepository
+
+    LocalRepository.DF_PREPROCESSED_INPUT = work_dir
+
+    from sklearn.model_selection import train_test_split
+
+    from database import get_database
+    from evp import EstimatedValuePredictor
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    db = get_database(storage_format=storage_format)
+    if mode == "store":
+        X_train = EstimatedValuePredictor(data=db.load_feature_store()).X_train
+    elif mode == "float32":
+        X_train = EstimatedValuePredictor(data=db.load_preprocessed_data()).X_train
+    else:
+        df = db.load_preprocessed_data()
+        features = df.drop("MerchantSizeByDPV", axis=1).to_numpy()
+        X_train, X_temp = train_test_split(features, test_size=0.2, random_state=42)
+        X_val, X_test = train_test_split(X_temp, test_size=0.5, random_state=42)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    print(f"RESULT {peak} {elapsed:.2f} {X_train.dtype}")
+
+
+def benchmark(num_leads: int, num_features: int, storage_format: str) -> list[tuple]:
+    from database.leads import FeatureStoreWriter, LocalRepository, write_dataframe
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        LocalRepository.DF_PREPROCESSED_INPUT = work_dir
+        repository = LocalRepository(storage_format=storage_format)
+        df = create_preprocessed_data(num_leads, num_features)
+        write_dataframe(df, repository.get_preprocessed_data_path(), storage_format)
+        with FeatureStoreWriter(repository.get_feature_store_path()) as writer:
+            writer.write(df)
+        del df
+
+        for mode in ["float64", "float32", "store"]:
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--worker",
+                    work_dir,
+                    storage_format,
+                    mode,
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            result_line = [l for l in output.splitlines() if l.startswith("RESULT")][-1]
+            _, peak, elapsed, dtype = result_line.split()
+            results.append((mode, int(peak) / 2**20, float(elapsed), dtype))
+    return results
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, SRC_PATH)
+    os.environ.setdefault("DATABASE_TYPE", "Local")
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        run_worker(sys.argv[2], sys.argv[3], sys.argv[4])
+        sys.exit(0)
+
+    from database.leads import STORAGE_FORMATS
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=100_000)
+    parser.add_argument("--features", type=int, default=335)
+    parser.add_argument("--format", choices=STORAGE_FORMATS, default="parquet")
+    args = parser.parse_args()
+
+    print(f"{args.leads} leads, {args.features} features, {args.format}")
+    print(f"{'source':>16} | {'peak memory (MiB)':>17} | {'time (s)':>8}")
+    for mode, peak, elapsed, dtype in benchmark(args.leads, args.features, args.format):
+        source = "store" if mode == "store" else f"{args.format} ({dtype})"
+        print(f"{source:>16} | {peak:>17.1f} | {elapsed:>8.2f}")
@@ -0,0 +1,81 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare the duration and the best validation F1 score of random search and successive halving.
+
+Synthetic preprocessed leads, whose class labels depend on a few numerical features, are written to a feature store
+in a temporary directory. Both methods sample the same configurations of the model type and run their trials in a
+pool of --processes processes with --threads threads each, which memory-map the feature store.
+
+Usage:
+    python scripts/benchmark_hyperparameter_search.py --model-type LightGBM --trials 9
+    python scripts/benchmark_hyperparameter_search.py --model-type RandomForest --processes 4 --threads 1
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from benchmark_feature_store import create_preprocessed_data  # noqa: E402
+
+from database.leads import FeatureStore, FeatureStoreWriter  # noqa: E402
+from evp import SEARCH_METHODS, HyperparameterSearch  # noqa: E402
+from evp.predictors import Predictors  # noqa: E402
+
+
+def create_feature_store(directory: str, num_leads: int, num_features: int) -> None:
+    df = create_preprocessed_data(num_leads, num_features)
+    rng = np.random.default_rng(0)
+    score = df["numerical_0"] + 0.5 * df["numerical_1"] + rng.normal(size=num_leads)
+    df["MerchantSizeByDPV"] = np.digitize(
+        score, np.quantile(score, [0.2, 0.4, 0.6, 0.8])
+    )
+    with FeatureStoreWriter(directory) as writer:
+        writer.write(df)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "--model-type", default="LightGBM", choices=list(Predictors.__members__)
+    )
+    parser.add_argument("--leads", type=int, default=20_000)
+    parser.add_argument("--features", type=int, default=100)
+    parser.add_argument("--trials", type=int, default=9)
+    parser.add_argument("--processes", type=int, default=os.cpu_count())
+    parser.add_argument("--threads", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        create_feature_store(work_dir, args.leads, args.features)
+        results = [
+            HyperparameterSearch(
+                FeatureStore(work_dir),
+                Predictors[args.model_type],
+                method=method,
+                num_trials=args.trials,
+                processes=args.processes,
+                threads=args.threads,
+            ).run()
+            for method in SEARCH_METHODS
+        ]
+
+    print(
+        f"{args.model_type}, {args.trials} configurations, {args.leads} leads, "
+        f"{args.processes} processes with {args.threads} threads"
+    )
+    print(
+        f"{'method':>8} | {'trials':>6} | {'seconds':>8} | {'best F1':>7} | best configuration"
+    )
+    for result in results:
+        print(
+            f"{result['method']:>8} | {len(result['trials']):>6} | {result['seconds']:>8.1f} | "
+            f"{result['f1']:>7.4f} | {result['params']}"
+        )
@@ -0,0 +1,118 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare the time of repeatedly instantiating a predictor from a saved model with and without the model cache.
+
+A RandomForest is trained on synthetic features and saved to a temporary LocalRepository and to a local moto server
+as S3 stand-in, with and without S3 disk cache. For every repository the predictor is instantiated --repeat times
+in the same process, as a long-running process would do. Without the model cache every instantiation downloads and
+unpickles the model, like Classifier.load did before.
+
+Usage:
+    python scripts/benchmark_model_cache.py --trees 100 --repeat 10
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from unittest import mock
+
+import boto3
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from benchmark_s3_streaming import start_moto_server  # noqa: E402
+
+from database.leads import (  # noqa: E402
+    LocalRepository,
+    ModelCache,
+    S3DiskCache,
+    S3Repository,
+    s3_repository,
+)
+from evp.predictors import RandomForest  # noqa: E402
+
+
+def train_model(num_trees: int, num_leads: int, num_features: int):
+    rng = np.random.default_rng(42)
+    features = rng.random((num_leads, num_features), dtype=np.float32)
+    labels = rng.integers(0, 5, num_leads)
+    predictor = RandomForest(n_estimators=num_trees)
+    predictor.train(features[:-1000], labels[:-1000], features[-1000:], labels[-1000:])
+    return predictor
+
+
+def measure(repository, model_name: str, repeat: int) -> tuple[float, float]:
+    """
+    :return: Time of the first and mean time of the following instantiations in seconds
+    """
+    durations = []
+    with mock.patch("evp.predictors.get_database", return_value=repository):
+        for _ in range(repeat):
+            start = time.perf_counter()
+            RandomForest(model_name=model_name)
+            durations.append(time.perf_counter() - start)
+    return durations[0], float(np.mean(durations[1:]))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--trees", type=int, default=100)
+    parser.add_argument("--leads", type=int, default=20_000)
+    parser.add_argument("--features", type=int, default=335)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    predictor = train_model(args.trees, args.leads, args.features)
+    server, endpoint = start_moto_server()
+    results = []
+    try:
+        client = boto3.client(
+            "s3",
+            endpoint_url=endpoint,
+            region_name="us-east-1",
+            aws_access_key_id="benchmark",
+            aws_secret_access_key="benchmark",
+        )
+        with tempfile.TemporaryDirectory() as work_dir, mock.patch.object(
+            s3_repository, "s3", client
+        ), mock.patch.multiple(
+            LocalRepository,
+            ML_MODELS=os.path.join(work_dir, "models"),
+            CLASSIFICATION_REPORTS=os.path.join(work_dir, "reports"),
+        ):
+            client.create_bucket(Bucket="amos--models")
+            repositories = {
+                "local": lambda: LocalRepository(),
+                "s3": lambda: S3Repository(),
+                "s3, disk cache": lambda: S3Repository(
+                    cache=S3DiskCache(os.path.join(work_dir, "cache"), 2**30)
+                ),
+            }
+            for name, create_repository in repositories.items():
+                repository = create_repository()
+                with mock.patch("evp.predictors.get_database", return_value=repository):
+                    model_name = predictor.save()
+                for cached in [False, True]:
+                    repository = create_repository()
+                    if not cached:
+                        # every model is evicted right away
+                        repository.model_cache = ModelCache(max_entries=0)
+                    first, following = measure(repository, model_name, args.repeat)
+                    results.append((name, cached, first, following))
+    finally:
+        server.terminate()
+
+    print(f"RandomForest with {args.trees} trees, {args.repeat} instantiations")
+    print(
+        f"{'repository':>15} | {'cache':>5} | {'first (ms)':>10} | {'following (ms)':>14}"
+    )
+    for name, cached, first, following in results:
+        print(
+            f"{name:>15} | {'yes' if cached else 'no':>5} | {first * 1000:>10.1f} | {following * 1000:>14.2f}"
+        )
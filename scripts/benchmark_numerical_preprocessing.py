@@ -0,0 +1,109 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare the batched NumericalTransformer with imputing and scaling the numerical columns one by one.
+
+The per-column loop fits a scikit-learn imputer and scaler on every column separately, like the preprocessing did
+before the numerical columns were processed as one float32 array. By default the historical enriched data
+(100k_historic_enriched.csv) is used. If it is not available locally, synthetic enriched leads with --missing
+missing values are generated instead.
+
+Usage:
+    python scripts/benchmark_numerical_preprocessing.py --input src/data/100k_historic_enriched.csv
+    python scripts/benchmark_numerical_preprocessing.py --leads 100000 --scaling standard
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.impute import SimpleImputer
+from sklearn.preprocessing import MinMaxScaler, RobustScaler, StandardScaler
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from benchmark_storage_format import create_enriched_leads  # noqa: E402
+
+from database.leads import LocalRepository, read_dataframe  # noqa: E402
+from preprocessing import (  # noqa: E402
+    IMPUTATION_STRATEGIES,
+    SCALING_STRATEGIES,
+    NumericalTransformer,
+    Preprocessing,
+)
+
+SCALERS = {
+    "robust": RobustScaler,
+    "standard": StandardScaler,
+    "min_max": MinMaxScaler,
+}
+
+
+def per_column_loop(
+    df: pd.DataFrame, columns: list[str], imputation: str, scaling: str
+) -> pd.DataFrame:
+    df = df.copy()
+    for column in columns:
+        df[column] = SimpleImputer(strategy=imputation).fit_transform(df[[column]])
+        df[column] = SCALERS[scaling]().fit_transform(df[[column]])
+    return df
+
+
+def measure(func, repeat: int) -> float:
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return min(durations)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=LocalRepository.DF_HISTORICAL_OUTPUT)
+    parser.add_argument("--leads", type=int, default=100_000)
+    parser.add_argument("--missing", type=float, default=0.2)
+    parser.add_argument("--imputation", choices=IMPUTATION_STRATEGIES, default="mean")
+    parser.add_argument("--scaling", choices=SCALING_STRATEGIES, default="robust")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    columns = Preprocessing().numerical_data
+    if os.path.exists(args.input):
+        df = read_dataframe(args.input, columns=columns)
+        print(f"Using {args.input} ({len(df)} leads)")
+    else:
+        df = create_enriched_leads(args.leads, columns)[columns]
+        rng = np.random.default_rng(42)
+        df = df.mask(rng.random(df.shape) < args.missing)
+        print(f"Using {len(df)} synthetic leads")
+    columns = [col for col in columns if col in df]
+
+    transformer = NumericalTransformer(
+        columns,
+        imputation_strategies={col: args.imputation for col in columns},
+        scaling_strategies={col: args.scaling for col in columns},
+    )
+    loop_time = measure(
+        lambda: per_column_loop(df, columns, args.imputation, args.scaling),
+        args.repeat,
+    )
+    fit_time = measure(lambda: transformer.fit_transform(df), args.repeat)
+    transform_time = measure(lambda: transformer.transform(df), args.repeat)
+
+    expected = per_column_loop(df, columns, args.imputation, args.scaling)[columns]
+    max_error = np.nanmax(np.abs(transformer.transform(df) - expected.to_numpy()))
+    print(
+        f"{len(columns)} columns, {args.imputation} imputation, {args.scaling} scaling"
+    )
+    print(f"{'per-column loop':>22}: {loop_time:.3f} s")
+    print(
+        f"{'batched fit_transform':>22}: {fit_time:.3f} s ({loop_time / fit_time:.1f}x)"
+    )
+    print(f"{'batched transform':>22}: {transform_time:.3f} s")
+    print(f"{'max. difference':>22}: {max_error:.2e}")
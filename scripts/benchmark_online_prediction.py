@@ -0,0 +1,141 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Measure the latency and throughput of the online PredictionService with and without micro-batching.
+
+Synthetic enriched leads are written into a temporary directory and a LightGBM model with the parameters of the
+LightGBM predictor is trained on them, see benchmark_batch_scoring.py. Concurrent clients send single leads to the
+service, either directly or over the local HTTP endpoint. The service is measured without batching (every request
+is transformed and predicted on its own), batching only the requests that are already waiting (max. wait 0 ms) and
+waiting --max-wait-ms for further requests.
+
+Usage:
+    python scripts/benchmark_online_prediction.py --clients 16 --requests 50
+    python scripts/benchmark_online_prediction.py --clients 16 --http
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from benchmark_batch_scoring import MODEL_NAME, prepare  # noqa: E402
+
+from database import get_database  # noqa: E402
+from evp import LEAD_ID_COLUMNS, PredictionService, create_http_server  # noqa: E402
+
+
+def run_clients(send, leads: list[dict], num_clients: int, num_requests: int) -> float:
+    """
+    :param send: Function sending a single lead to the service
+    :return: Throughput in requests per second
+    """
+
+    def client(offset: int):
+        for i in range(num_requests):
+            send(leads[(offset * num_requests + i) % len(leads)])
+
+    threads = [
+        threading.Thread(target=client, args=(offset,)) for offset in range(num_clients)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return num_clients * num_requests / (time.perf_counter() - start)
+
+
+def send_http(url: str, lead: dict) -> list[str]:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(lead).encode("utf-8"),
+        headers={"Content-Type": "application/json"},
+    )
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)["predictions"]
+
+
+def benchmark(args, leads: list[dict], max_wait_ms: float, max_batch_size: int) -> dict:
+    with PredictionService(
+        MODEL_NAME, max_wait_ms=max_wait_ms, max_batch_size=max_batch_size
+    ) as service:
+        # the first request pays for the lazy initialization of the model
+        service.predict(leads[0])
+        if args.http:
+            server = create_http_server(service, port=0)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            url = f"http://127.0.0.1:{server.server_port}/predict"
+            try:
+                throughput = run_clients(
+                    lambda lead: send_http(url, lead),
+                    leads,
+                    args.clients,
+                    args.requests,
+                )
+            finally:
+                server.shutdown()
+                server.server_close()
+        else:
+            throughput = run_clients(
+                service.predict, leads, args.clients, args.requests
+            )
+        return service.get_metrics() | {"throughput": throughput}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=20_000)
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--max-wait-ms", type=float, default=5)
+    parser.add_argument("--max-batch-size", type=int, default=256)
+    parser.add_argument("--http", action="store_true")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        prepare(work_dir, args.leads, args.leads)
+        leads = get_database().load_enriched_dataframe().drop(columns=LEAD_ID_COLUMNS)
+        leads = leads.astype(object).where(leads.notna(), None)
+        # the place types are read as arrays, which are sent as JSON lists
+        leads = [
+            {
+                key: getattr(value, "tolist", lambda: value)()
+                for key, value in lead.items()
+            }
+            for lead in leads.to_dict("records")
+        ]
+
+        results = [
+            (name, benchmark(args, leads, max_wait_ms, max_batch_size))
+            for name, max_wait_ms, max_batch_size in [
+                ("no batching", 0, 1),
+                ("max. wait 0 ms", 0, args.max_batch_size),
+                (
+                    f"max. wait {args.max_wait_ms:g} ms",
+                    args.max_wait_ms,
+                    args.max_batch_size,
+                ),
+            ]
+        ]
+
+    print(
+        f"{args.clients} clients, {args.requests} single leads each"
+        + (" over HTTP" if args.http else "")
+    )
+    print(
+        f"{'service':>15} | {'p50 (ms)':>8} | {'p99 (ms)':>8} | {'mean batch':>10} | {'requests/s':>10}"
+    )
+    for name, metrics in results:
+        print(
+            f"{name:>15} | {metrics['p50_ms']:>8.2f} | {metrics['p99_ms']:>8.2f} | "
+            f"{metrics['mean_batch']:>10.1f} | {metrics['throughput']:>10.0f}"
+        )
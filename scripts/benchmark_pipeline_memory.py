@@ -0,0 +1,112 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare the peak memory (RSS) of a pipeline run that loads all leads at once with a chunked/streaming run.
+
+Synthetic leads are generated into a temporary directory and every run is executed in its own subprocess, such that
+the peak RSS reported by the operating system belongs to exactly one pipeline run. Only the HashGenerator step is
+used, as it does not call external APIs.
+
+Usage:
+    python scripts/benchmark_pipeline_memory.py --leads 100000 1000000 --chunk-size 10000
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+BASE_PATH = os.path.dirname(__file__)
+SRC_PATH = os.path.abspath(os.path.join(BASE_PATH, "../src"))
+
+
+def generate_leads(path: str, num_leads: int, chunk_size: int = 100_000) -> None:
+    rng = np.random.default_rng(42)
+    for start in range(0, num_leads, chunk_size):
+        n = min(chunk_size, num_leads - start)
+        ids = np.arange(start, start + n)
+        leads = pd.DataFrame(
+            {
+                "Last Name": [f"Last{i}" for i in ids],
+                "First Name": [f"First{i}" for i in ids],
+                "Company / Account": [f"Company {i}" for i in ids],
+                "Phone": [f"+49{p:09d}" for p in rng.integers(0, 10**9, n)],
+                "Email": [f"first{i}.last{i}@company{i}.de" for i in ids],
+            }
+        )
+        leads.to_csv(
+            path, mode="w" if start == 0 else "a", header=start == 0, index=False
+        )
+
+
+def run_worker(input_path: str, work_dir: str, chunk_size: int) -> None:
+    os.environ["DATABASE_TYPE"] = "Local"
+    sys.path.insert(0, SRC_PATH)
+
+    from bdc.pipeline import Pipeline
+    from bdc.steps import HashGenerator
+    from database.leads import LocalRepository
+
+    LocalRepository.DF_INPUT = input_path
+    LocalRepository.DF_OUTPUT = os.path.join(work_dir, "leads_enriched.csv")
+    LocalRepository.SNAPSHOTS = work_dir
+
+    start = time.perf_counter()
+    pipeline = Pipeline(
+        steps=[HashGenerator(force_refresh=True)],
+        chunk_size=chunk_size if chunk_size > 0 else None,
+    )
+    pipeline.run()
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"RESULT {peak_rss} {elapsed:.2f}")
+
+
+def benchmark(num_leads: int, chunk_size: int) -> list[tuple]:
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, "leads.csv")
+        generate_leads(input_path, num_leads)
+        for mode, mode_chunk_size in [("full", 0), ("chunked", chunk_size)]:
+            output = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--worker",
+                    input_path,
+                    work_dir,
+                    str(mode_chunk_size),
+                ],
+                capture_output=True,
+                text=True,
+                check=True,
+            ).stdout
+            result_line = [l for l in output.splitlines() if l.startswith("RESULT")][-1]
+            _, peak_rss, elapsed = result_line.split()
+            results.append((num_leads, mode, int(peak_rss) / 1024, float(elapsed)))
+    return results
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        run_worker(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        sys.exit(0)
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--chunk-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    print(f"{'leads':>10} | {'mode':>8} | {'peak RSS (MiB)':>14} | {'time (s)':>8}")
+    for num_leads in args.leads:
+        for leads, mode, peak_rss, elapsed in benchmark(num_leads, args.chunk_size):
+            print(f"{leads:>10} | {mode:>8} | {peak_rss:>14.1f} | {elapsed:>8.2f}")
@@ -0,0 +1,130 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare the peak memory (RSS) of preprocessing all historical leads at once with the out-of-core chunked
+preprocessing.
+
+Synthetic enriched leads with the columns used by the preprocessing are generated into a temporary directory and
+every run is executed in its own subprocess, such that the peak RSS reported by the operating system belongs to
+exactly one preprocessing run.
+
+Usage:
+    python scripts/benchmark_preprocessing_memory.py --leads 100000 1000000 --chunk-size 100000
+    python scripts/benchmark_preprocessing_memory.py --leads 1000000 --format parquet
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_PATH = os.path.dirname(__file__)
+SRC_PATH = os.path.abspath(os.path.join(BASE_PATH, "../src"))
+
+
+def generate_leads(
+    path: str, storage_format: str, num_leads: int, chunk_size: int = 100_000
+) -> None:
+    from benchmark_sparse_features import add_place_types
+    from benchmark_storage_format import create_enriched_leads
+
+    from database.leads import DataframeChunkWriter
+    from preprocessing import Preprocessing
+
+    numerical_columns = Preprocessing().numerical_data
+    writer = DataframeChunkWriter(path, storage_format)
+    for start in range(0, num_leads, chunk_size):
+        leads = create_enriched_leads(
+            min(chunk_size, num_leads - start), numerical_columns
+        )
+        writer.write(add_place_types(leads, 300))
+    writer.close()
+
+
+def run_worker(work_dir: str, storage_format: str, chunk_size: int) -> None:
+    from database.leads import LocalRepository
+    from preprocessing import Preprocessing
+
+    LocalRepository.DF_HISTORICAL_OUTPUT = os.path.join(work_dir, "historic.csv")
+    LocalRepository.DF_PREPROCESSED_INPUT = work_dir
+    LocalRepository.ML_MODELS = work_dir
+
+    from database import get_database
+
+    get_database(storage_format=storage_format)
+    start = time.perf_counter()
+    preprocessor = Preprocessing(filter_null_data=False, historical_bool=True)
+    if chunk_size > 0:
+        preprocessor.preprocess_in_chunks(chunk_size)
+    else:
+        preprocessor.load_data()
+        preprocessor.implement_preprocessing_pipeline()
+        preprocessor.save_preprocessed_data()
+    elapsed = time.perf_counter() - start
+
+    # ru_maxrss is reported in kilobytes on Linux
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"RESULT {peak_rss} {elapsed:.2f}")
+
+
+def benchmark(num_leads: int, storage_format: str, chunk_size: int) -> list[tuple]:
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        generate_leads(
+            os.path.join(work_dir, f"historic.{storage_format}"),
+            storage_format,
+            num_leads,
+        )
+        for mode, mode_chunk_size in [("full", 0), ("chunked", chunk_size)]:
+            process = subprocess.run(
+                [
+                    sys.executable,
+                    __file__,
+                    "--worker",
+                    work_dir,
+                    storage_format,
+                    str(mode_chunk_size),
+                ],
+                capture_output=True,
+                text=True,
+            )
+            if process.returncode != 0:
+                # e.g. killed by the operating system when running out of memory
+                results.append((num_leads, mode, None, None))
+                continue
+            result_line = [
+                l for l in process.stdout.splitlines() if l.startswith("RESULT")
+            ][-1]
+            _, peak_rss, elapsed = result_line.split()
+            results.append((num_leads, mode, int(peak_rss) / 1024, float(elapsed)))
+    return results
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, SRC_PATH)
+    os.environ.setdefault("DATABASE_TYPE", "Local")
+    if len(sys.argv) > 1 and sys.argv[1] == "--worker":
+        run_worker(sys.argv[2], sys.argv[3], int(sys.argv[4]))
+        sys.exit(0)
+
+    from database.leads import STORAGE_FORMATS
+
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, nargs="+", default=[100_000, 1_000_000])
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    parser.add_argument("--format", choices=STORAGE_FORMATS, default="csv")
+    args = parser.parse_args()
+
+    print(f"{'leads':>10} | {'mode':>8} | {'peak RSS (MiB)':>14} | {'time (s)':>8}")
+    for num_leads in args.leads:
+        for leads, mode, peak_rss, elapsed in benchmark(
+            num_leads, args.format, args.chunk_size
+        ):
+            if peak_rss is None:
+                print(f"{leads:>10} | {mode:>8} | {'failed':>14} | {'-':>8}")
+            else:
+                print(f"{leads:>10} | {mode:>8} | {peak_rss:>14.1f} | {elapsed:>8.2f}")
@@ -0,0 +1,143 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare memory and time of buffered and streaming S3 uploads and downloads of enriched leads.
+
+A local moto server is started as S3 stand-in, so no AWS credentials are needed. The buffered variants serialize the
+whole file into memory before uploading it and download the whole Parquet file before reading the projected columns,
+as the S3Repository did before. The streaming variants use S3MultipartWriter and S3RangeReader. Peak memory is
+measured with tracemalloc and therefore only includes allocations made by Python.
+
+Usage:
+    python scripts/benchmark_s3_streaming.py --leads 100000
+"""
+
+import argparse
+import io
+import os
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+import boto3
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from benchmark_storage_format import create_enriched_leads  # noqa: E402
+
+from database.leads import read_dataframe, s3_repository, write_dataframe  # noqa: E402
+from database.leads.s3_repository import (  # noqa: E402
+    S3MultipartWriter,
+    S3RangeReader,
+)
+from preprocessing import Preprocessing  # noqa: E402
+
+BUCKET = "benchmark"
+
+
+def start_moto_server():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "moto.server", "-p", str(port)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    endpoint = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            return server, endpoint
+        except OSError:
+            time.sleep(0.1)
+    server.terminate()
+    raise RuntimeError("moto server did not start")
+
+
+def measure(function) -> tuple[float, float]:
+    """
+    :return: Elapsed time in seconds and peak of the memory allocated by Python in MiB
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    function()
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def buffered_upload(df, storage_format, key):
+    buffer = io.BytesIO()
+    write_dataframe(df, buffer, storage_format)
+    s3_repository.s3.put_object(Bucket=BUCKET, Key=key, Body=buffer.getvalue())
+
+
+def streaming_upload(df, storage_format, key):
+    with S3MultipartWriter(BUCKET, key) as fp:
+        write_dataframe(df, fp, storage_format)
+
+
+def buffered_download(key, columns):
+    body = s3_repository.s3.get_object(Bucket=BUCKET, Key=key)["Body"]
+    read_dataframe(io.BytesIO(body.read()), "parquet", columns)
+
+
+def streaming_download(key, columns):
+    source = io.BufferedReader(S3RangeReader(BUCKET, key), buffer_size=2**20)
+    read_dataframe(source, "parquet", columns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=100_000)
+    args = parser.parse_args()
+
+    preprocessor = Preprocessing()
+    columns = preprocessor.numerical_data[:5]
+    df = create_enriched_leads(args.leads, preprocessor.numerical_data)
+    print(f"Using {len(df)} synthetic leads ({len(df.columns)} columns)")
+
+    server, endpoint = start_moto_server()
+    try:
+        client = boto3.client(
+            "s3",
+            endpoint_url=endpoint,
+            region_name="us-east-1",
+            aws_access_key_id="testing",
+            aws_secret_access_key="testing",
+        )
+        client.create_bucket(Bucket=BUCKET)
+        results = []
+        with mock.patch.object(s3_repository, "s3", client):
+            for storage_format in ["csv", "parquet"]:
+                key = f"leads.{storage_format}"
+                for variant, upload in [
+                    ("buffered", buffered_upload),
+                    ("streaming", streaming_upload),
+                ]:
+                    results.append(
+                        (f"upload {storage_format}", variant)
+                        + measure(lambda: upload(df, storage_format, key))
+                    )
+            for variant, download in [
+                ("buffered", buffered_download),
+                ("streaming", streaming_download),
+            ]:
+                results.append(
+                    (f"read {len(columns)} cols parquet", variant)
+                    + measure(lambda: download("leads.parquet", columns))
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{'operation':>22} | {'variant':>9} | {'time (s)':>8} | {'peak (MiB)':>10}")
+    for operation, variant, elapsed, peak in results:
+        print(f"{operation:>22} | {variant:>9} | {elapsed:>8.2f} | {peak:>10.1f}")
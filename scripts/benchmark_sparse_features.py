@@ -0,0 +1,106 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare memory and training time of dense and sparse feature matrices.
+
+The features are created by PreprocessingTransformer, once as dense columns and once as sparse columns, and the
+models supporting sparse features are trained on both. By default the historical enriched data
+(100k_historic_enriched.csv) is used. If it is not available locally, synthetic enriched leads are generated instead,
+with a few of --place-types place types per lead like the Google Places data.
+
+Usage:
+    python scripts/benchmark_sparse_features.py --input src/data/100k_historic_enriched.csv
+    python scripts/benchmark_sparse_features.py --leads 100000 --place-types 300
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+import warnings
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from benchmark_storage_format import create_enriched_leads  # noqa: E402
+
+from database.leads import LIST_DELIMITER, LocalRepository, read_dataframe  # noqa: E402
+from evp import SPARSE_PREDICTORS, EstimatedValuePredictor  # noqa: E402
+from preprocessing import Preprocessing  # noqa: E402
+
+
+def add_place_types(df: pd.DataFrame, num_place_types: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    place_types = [f"place_type_{i}" for i in range(num_place_types)]
+    df["google_places_detailed_type"] = [
+        LIST_DELIMITER.join(rng.choice(place_types, size, replace=False))
+        for size in rng.integers(1, 4, len(df))
+    ]
+    return df
+
+
+def get_matrix_size(features: pd.DataFrame) -> float:
+    """
+    :return: Size of the feature values in MiB, including the indices of sparse columns
+    """
+    return features.memory_usage(index=False, deep=True).sum() / 2**20
+
+
+def measure_preprocessing(df: pd.DataFrame, sparse: bool):
+    preprocessor = Preprocessing(filter_null_data=False, sparse=sparse)
+    preprocessor.preprocessed_df = df.copy()
+    tracemalloc.start()
+    start = time.perf_counter()
+    preprocessed_df = preprocessor.implement_preprocessing_pipeline()
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return preprocessed_df, duration, peak
+
+
+def measure_training(preprocessed_df: pd.DataFrame, model_type, sparse: bool):
+    evp = EstimatedValuePredictor(
+        data=preprocessed_df, model_type=model_type, sparse=sparse
+    )
+    start = time.perf_counter()
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        evp.train()
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=LocalRepository.DF_HISTORICAL_OUTPUT)
+    parser.add_argument("--leads", type=int, default=100_000)
+    parser.add_argument("--place-types", type=int, default=300)
+    args = parser.parse_args()
+
+    if os.path.exists(args.input):
+        df = read_dataframe(args.input)
+        print(f"Using {args.input} ({len(df)} leads)")
+    else:
+        df = create_enriched_leads(args.leads, Preprocessing().numerical_data)
+        df = add_place_types(df, args.place_types)
+        print(f"Using {len(df)} synthetic leads")
+
+    results = {}
+    for sparse in [False, True]:
+        preprocessed_df, duration, peak = measure_preprocessing(df, sparse)
+        features = preprocessed_df.drop("MerchantSizeByDPV", axis=1)
+        results[sparse] = (preprocessed_df, duration, peak)
+        print(
+            f"{'sparse' if sparse else 'dense':>6}: {features.shape[1]} features, "
+            f"{get_matrix_size(features):.1f} MiB, preprocessing {duration:.2f} s, peak {peak:.1f} MiB"
+        )
+
+    print(f"{'model':>14} | {'dense (s)':>9} | {'sparse (s)':>10}")
+    for model_type in SPARSE_PREDICTORS:
+        dense_time = measure_training(results[False][0], model_type, sparse=False)
+        sparse_time = measure_training(results[True][0], model_type, sparse=True)
+        print(f"{model_type.value:>14} | {dense_time:>9.2f} | {sparse_time:>10.2f}")
@@ -0,0 +1,80 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Measure the startup cost of the demo menu with `python -X importtime`.
+
+Every module is imported in a fresh interpreter, so the measured times include all transitive imports. The report
+lists the cumulative import time of every module and the modules with the highest self time, which are the
+candidates for lazy imports. Heavy dependencies (ML libraries, API clients) should not show up for main.py, they are
+only imported when a demo or pipeline step using them runs.
+
+Usage:
+    python scripts/benchmark_startup.py
+    python scripts/benchmark_startup.py --modules demo bdc.steps --top 20 --repeat 5
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+SRC_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "../src"))
+HEAVY_MODULES = ["sklearn", "xgboost", "lightgbm", "textblob", "openai", "osmnx"]
+
+
+def measure_import(module: str) -> list[tuple]:
+    """
+    Import a module in a fresh interpreter
+    :return: (module name, self time in us, cumulative time in us, whether it was imported at top level) of every
+    imported module
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=SRC_DIR,
+        env=os.environ | {"DATABASE_TYPE": os.environ.get("DATABASE_TYPE", "Local")},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative_time, name = line[len("import time:") :].split("|")
+        # nested imports are indented by two spaces per level
+        top_level = not name.startswith("  ")
+        timings.append((name.strip(), int(self_time), int(cumulative_time), top_level))
+    return timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--modules", nargs="+", default=["demo", "bdc.steps"])
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for module in args.modules:
+        runs = [measure_import(module) for _ in range(args.repeat)]
+        # the parent packages of the module are imported first, at top level as well
+        totals = [
+            sum(cumulative for _, _, cumulative, top_level in timings if top_level)
+            for timings in runs
+        ]
+        imported = {name for name, _, _, _ in runs[0]}
+        heavy = [name for name in HEAVY_MODULES if name in imported]
+
+        print(
+            f"import {module}: {statistics.median(totals) / 1000:.0f} ms (median of {args.repeat}), "
+            f"{len(imported)} modules, heavy dependencies: {', '.join(heavy) or 'none'}"
+        )
+        print(f"{'self (ms)':>10} | {'cumulative (ms)':>15} | module")
+        for name, self_time, cumulative_time, _ in sorted(
+            runs[0], key=lambda timing: timing[1], reverse=True
+        )[: args.top]:
+            print(
+                f"{self_time / 1000:>10.1f} | {cumulative_time / 1000:>15.1f} | {name}"
+            )
+        print()
@@ -0,0 +1,101 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Measure the cost of handing the dataframe from one pipeline step to the next.
+
+The previous hand-off copied the whole dataframe for every step and replaced NaN by None in every column afterwards.
+It is compared with the shared dataframe hand-off of Pipeline._run_steps. Every dummy step adds a single numerical
+column, so the measured time and memory are dominated by the hand-off itself.
+
+Usage:
+    python scripts/benchmark_step_transition.py --leads 100000 --steps 10
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from bdc.pipeline import Pipeline  # noqa: E402
+from bdc.steps.step import Step  # noqa: E402
+
+
+class AddColumnStep(Step):
+    def __init__(self, idx: int) -> None:
+        super().__init__(force_refresh=True)
+        self.name = f"Add-Column-{idx}"
+        self.added_cols = [f"added_{idx}"]
+
+    def load_data(self) -> None:
+        pass
+
+    def run(self) -> pd.DataFrame:
+        self.df[self.added_cols[0]] = 1.0
+        return self.df
+
+    def finish(self) -> None:
+        pass
+
+
+def create_leads(num_leads: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    df = pd.DataFrame(
+        {f"numerical_{i}": rng.random(num_leads) for i in range(20)}
+        | {f"text_{i}": rng.random(num_leads).astype(str) for i in range(20)}
+    )
+    # every tenth value is missing
+    df.iloc[::10, :] = np.nan
+    return df
+
+
+def copying_hand_off(df: pd.DataFrame, steps: list[Step]) -> pd.DataFrame:
+    for step in steps:
+        step.df = df.copy()
+        df = step.run()
+        df = df.replace(np.nan, None)
+    return df
+
+
+def shared_hand_off(df: pd.DataFrame, steps: list[Step]) -> pd.DataFrame:
+    with mock.patch("bdc.pipeline.get_database"):
+        df, _ = Pipeline(steps, chunk_size=len(df))._run_steps(df, "benchmark")
+    return df
+
+
+def measure(hand_off: callable, num_leads: int, num_steps: int) -> tuple:
+    df = create_leads(num_leads)
+    steps = [AddColumnStep(i) for i in range(num_steps)]
+    tracemalloc.start()
+    base_memory = tracemalloc.get_traced_memory()[0]
+    start = time.perf_counter()
+    df = hand_off(df, steps)
+    elapsed = time.perf_counter() - start
+    peak_memory = tracemalloc.get_traced_memory()[1] - base_memory
+    tracemalloc.stop()
+    num_numerical = sum(dtype != object for dtype in df.dtypes)
+    return elapsed / num_steps, peak_memory / 2**20, num_numerical
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--leads", type=int, default=100_000)
+    parser.add_argument("--steps", type=int, default=10)
+    args = parser.parse_args()
+
+    print(
+        f"{'hand-off':>8} | {'time per step (ms)':>18} | {'peak memory (MiB)':>17} | {'numerical columns':>17}"
+    )
+    for name, hand_off in [("copying", copying_hand_off), ("shared", shared_hand_off)]:
+        elapsed, peak_memory, num_numerical = measure(hand_off, args.leads, args.steps)
+        print(
+            f"{name:>8} | {elapsed * 1000:>18.1f} | {peak_memory:>17.1f} | {num_numerical:>17}"
+        )
@@ -0,0 +1,119 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Compare read/write time and file size of the CSV and Parquet storage formats for enriched leads.
+
+By default the historical enriched data (100k_historic_enriched.csv) is used. If it is not available locally,
+synthetic enriched leads with the columns used by the preprocessing are generated instead. The projected read only
+loads the columns required by Preprocessing.
+
+Usage:
+    python scripts/benchmark_storage_format.py --input src/data/100k_historic_enriched.csv
+    python scripts/benchmark_storage_format.py --leads 100000
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from database.leads import (  # noqa: E402
+    STORAGE_FORMATS,
+    LocalRepository,
+    read_dataframe,
+    write_dataframe,
+)
+from preprocessing import Preprocessing  # noqa: E402
+
+
+def create_enriched_leads(num_leads: int, numerical_columns: list[str]) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    ids = np.arange(num_leads)
+    place_types = np.array(["restaurant|food", "bar", "store|clothing_store", None])
+    return pd.DataFrame(
+        {
+            "Last Name": [f"Last{i}" for i in ids],
+            "First Name": [f"First{i}" for i in ids],
+            "Company / Account": [f"Company {i}" for i in ids],
+            "Phone": [f"+49{p:09d}" for p in rng.integers(0, 10**9, num_leads)],
+            "Email": [f"first{i}.last{i}@company{i}.de" for i in ids],
+            "lead_hash": [f"{h:064x}" for h in rng.integers(0, 2**63, num_leads)],
+            "google_places_formatted_address": [
+                f"Street {i % 500}, {10000 + i % 900} City {i % 90}" for i in ids
+            ],
+            "google_places_detailed_type": rng.choice(place_types, num_leads),
+            "review_polarization_type": rng.choice(
+                ["High-Rating Dominance", "Low-Rating Dominance", None], num_leads
+            ),
+            "MerchantSizeByDPV": rng.choice(["XS", "S", "M", "L", "XL"], num_leads),
+            "gpt_summary": [
+                f"Company {i} is a business in city {i % 90} offering products."
+                for i in ids
+            ],
+        }
+        | {column: rng.random(num_leads) for column in numerical_columns}
+    )
+
+
+def measure(df: pd.DataFrame, work_dir: str, columns: list[str]) -> list[tuple]:
+    results = []
+    for storage_format in STORAGE_FORMATS:
+        path = os.path.join(work_dir, f"leads.{storage_format}")
+
+        start = time.perf_counter()
+        write_dataframe(df, path, storage_format)
+        write_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        read_dataframe(path, storage_format)
+        read_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        read_dataframe(path, storage_format, columns=columns)
+        projected_read_time = time.perf_counter() - start
+
+        size = os.path.getsize(path) / 2**20
+        results.append(
+            (storage_format, write_time, read_time, projected_read_time, size)
+        )
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--input", default=LocalRepository.DF_HISTORICAL_OUTPUT)
+    parser.add_argument("--leads", type=int, default=100_000)
+    args = parser.parse_args()
+
+    preprocessor = Preprocessing()
+    columns = (
+        preprocessor.numerical_data
+        + preprocessor.categorical_data
+        + [preprocessor.class_labels]
+    )
+
+    if os.path.exists(args.input):
+        df = read_dataframe(args.input)
+        print(f"Using {args.input} ({len(df)} leads, {len(df.columns)} columns)")
+    else:
+        df = create_enriched_leads(args.leads, preprocessor.numerical_data)
+        print(f"Using {len(df)} synthetic leads ({len(df.columns)} columns)")
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        results = measure(df, work_dir, columns)
+
+    print(
+        f"{'format':>8} | {'write (s)':>9} | {'read (s)':>8} | {f'read {len(columns)} cols (s)':>16} | {'size (MiB)':>10}"
+    )
+    for storage_format, write_time, read_time, projected_read_time, size in results:
+        print(
+            f"{storage_format:>8} | {write_time:>9.2f} | {read_time:>8.2f} | {projected_read_time:>16.2f} | {size:>10.1f}"
+        )
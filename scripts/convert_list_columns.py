@@ -0,0 +1,70 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Convert the list columns of enriched CSV files from Python list literals to the delimited encoding.
+
+Older CSV files store lists like google_places_detailed_type as their string representation, e.g.
+"['restaurant', 'food']", which is now stored as "restaurant|food". The files are converted chunk by chunk into a
+temporary file, which replaces the original file when the conversion finished. By default the local enriched lead
+data and historical data are converted.
+
+Usage:
+    python scripts/convert_list_columns.py
+    python scripts/convert_list_columns.py src/data/100k_historic_enriched.csv --chunk-size 50000
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "../src")))
+os.environ.setdefault("DATABASE_TYPE", "Local")
+
+from database.leads import (  # noqa: E402
+    DataframeChunkWriter,
+    LocalRepository,
+    iter_dataframe_chunks,
+)
+
+
+def convert_file(path: str, chunk_size: int) -> int:
+    """
+    :return: Number of converted rows
+    """
+    tmp_path = path + ".tmp"
+    writer = DataframeChunkWriter(tmp_path, "csv")
+    rows = 0
+    try:
+        # legacy lists are decoded when reading and written delimited
+        for chunk in iter_dataframe_chunks(path, "csv", chunk_size):
+            writer.write(chunk)
+            rows += len(chunk)
+        writer.close()
+        os.replace(tmp_path, path)
+    except BaseException:
+        writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument(
+        "paths",
+        nargs="*",
+        default=[LocalRepository.DF_OUTPUT, LocalRepository.DF_HISTORICAL_OUTPUT],
+    )
+    parser.add_argument("--chunk-size", type=int, default=100_000)
+    args = parser.parse_args()
+
+    for path in args.paths:
+        if not os.path.exists(path):
+            print(f"Skipping {path}, it does not exist")
+            continue
+        start = time.perf_counter()
+        rows = convert_file(path, args.chunk_size)
+        print(f"Converted {rows} rows of {path} in {time.perf_counter() - start:.1f} s")
@@ -1,6 +1,5 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Lucca Baumgärtner <lucca.baumgaertner@fau.de>
-import inspect
 import os.path
 
 import pandas as pd
@@ -11,9 +10,10 @@ if __name__ == "__main__":
     BASE_PATH = os.path.dirname(__file__)
 
     col_names = []
-    for name, obj in inspect.getmembers(steps):
-        if inspect.isclass(obj) and obj.added_cols is not None:
-            col_names += obj.added_cols
+    for name in steps.STEP_MODULES:
+        step_class = steps.get_step_class(name)
+        if step_class.added_cols is not None:
+            col_names += step_class.added_cols
 
             # TODO: add description and source for each columns
 
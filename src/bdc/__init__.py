@@ -2,4 +2,3 @@
 # SPDX-FileCopyrightText: 2023 Ruchita Nathani <ruchita.nathani@fau.de>
 
 from .pipeline import *
-from .steps import *
@@ -1,10 +1,12 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Lucca Baumgärtner <lucca.baumgaertner@fau.de>
 # SPDX-FileCopyrightText: 2023 Sophie Heasman <sophieheasmann@gmail.com>
-from datetime import datetime
+from datetime import datetime, timedelta
 
-import numpy as np
+import pandas as pd
 
+from bdc.run_report import RunReport
+from bdc.steps.helpers import get_lead_hash_generator
 from bdc.steps.step import Step, StepError
 from database import get_database
 from logger import get_logger
@@ -17,58 +19,376 @@ class Pipeline:
         self,
         steps,
         limit: int = None,
+        chunk_size: int = None,
+        resume_run_id: str = None,
+        incremental: bool = False,
     ):
+        """
+        :param steps: Steps to execute sequentially
+        :param limit: Maximum number of leads to process (None = no limit)
+        :param chunk_size: If set, the leads are streamed through all steps in chunks of this size and the enriched
+        chunks are appended to the output incrementally, instead of loading the whole input into memory
+        :param resume_run_id: If set, the failed pipeline run with this id is resumed from the snapshot of its latest
+        successful step instead of starting from the input. Steps that already finished in that run are skipped.
+        :param incremental: If set, only leads that are not part of the enriched data of the previous run and leads
+        whose data is older than the freshness window of a step are enriched and merged into the enriched data
+        """
         self.steps: list[Step] = steps
         self.limit: int = limit
-        self.df = get_database().get_dataframe()
+        self.chunk_size: int = chunk_size
+        self.df = None
+        self.report = RunReport(steps)
+        self.run_id = None
+        self.completed_steps = 0
+        self.manifest = None
+        self.incremental = incremental
+        self.unchanged_df = None
 
-        if limit is not None:
-            self.df = self.df[:limit]
+        if incremental and chunk_size is not None:
+            log.error(
+                "Error: Incremental runs are not supported in chunked mode, enriching all leads instead!"
+            )
+            self.incremental = False
+
+        if resume_run_id is not None:
+            if chunk_size is not None or self.incremental:
+                log.error(
+                    "Error: Resuming a pipeline run is not supported in chunked or incremental mode, starting a new run instead!"
+                )
+            else:
+                self.df = self._load_resume_snapshot(resume_run_id)
+
+        if chunk_size is None and self.df is None:
+            self.df = get_database().get_dataframe()
+
+            if self.incremental and self.df is not None:
+                self.df = self._select_incremental_leads(self.df)
+
+        if limit is not None and self.df is not None:
+            self.df = self.df[:limit].copy()
+
+    def _load_resume_snapshot(self, resume_run_id: str):
+        """
+        Load the snapshot of the latest successful step of a previous run, verifying it against the checksum
+        recorded in the manifest of the run. If the snapshot is corrupted, the snapshot of the step before is used.
+        :param resume_run_id: Id of the run, e.g. 2024/01/01/120000/, or the name of its snapshot directory
+        :return: The snapshotted dataframe or None if the run cannot be resumed
+        """
+        manifest = get_database().load_snapshot_manifest(resume_run_id.strip("/") + "/")
+        if manifest is None:
+            log.error(
+                f"Error: Cannot resume pipeline run {resume_run_id}, no manifest found!"
+            )
+            return None
+        # the run id is taken from the manifest, it cannot be derived from the name of the snapshot directory
+        run_id = manifest["run_id"]
+
+        # only a contiguous sequence of successful steps, matching the current configuration, can be skipped
+        entries = []
+        for idx, entry in enumerate(manifest["steps"]):
+            if (
+                idx >= len(self.steps)
+                or entry["name"] != self.steps[idx].name
+                or entry["status"] == "failed"
+            ):
+                break
+            entries.append(entry)
+
+        for entry in reversed(entries):
+            df = get_database().load_snapshot(
+                run_id, entry["name"], checksum=entry["checksum"]
+            )
+            if df is not None:
+                self.run_id = run_id
+                self.completed_steps = entry["index"] + 1
+                self.manifest = manifest | {"steps": entries[: entry["index"] + 1]}
+                log.info(
+                    f"Resuming pipeline run {run_id} after step {entry['name']}, skipping {self.completed_steps} steps"
+                )
+                return df
+
+        log.error(
+            f"Error: Cannot resume pipeline run {run_id}, no valid snapshot of a successful step found!"
+        )
+        return None
+
+    def _get_freshness_windows(self) -> dict:
+        """
+        :return: Freshness windows of the steps by name of their lookup tables
+        """
+        return {
+            table: timedelta(days=step.freshness_days)
+            for step in self.steps
+            if step.freshness_days is not None
+            for table in step.get_lookup_table_names()
+        }
 
-    def run(self):
-        run_id = datetime.now().strftime("%Y/%m/%d/%H%M%S/")
+    def _select_incremental_leads(self, input_df):
+        """
+        Diff the input against the enriched data of the previous run by lead_hash. New leads, including leads whose
+        basic data changed, and leads whose data in the lookup table of a step is outside the freshness window of the
+        step are selected for enrichment. All other leads are kept in self.unchanged_df and merged with the enriched
+        leads after the run. Leads that are no longer part of the input are dropped.
+        :return: The leads to enrich
+        """
+        hash_generator = get_lead_hash_generator()
+        input_df["lead_hash"] = hash_generator.hash_leads(input_df)
+
+        enriched_df = get_database().load_enriched_dataframe()
+        if enriched_df is None or "lead_hash" not in enriched_df:
+            log.info("No previously enriched leads found, enriching all leads")
+            return input_df
+
+        enriched_df = enriched_df[
+            enriched_df["lead_hash"].isin(input_df["lead_hash"])
+        ].drop_duplicates("lead_hash", keep="last")
+        new_leads = input_df[~input_df["lead_hash"].isin(enriched_df["lead_hash"])]
+
+        stale_hashes = set()
+        # new leads with fresh data in the lookup table of a step were enriched before and are not collected again
+        new_hashes = set(new_leads["lead_hash"])
+        fresh_new_hashes = set()
+        hash_generator.freshness_windows = self._get_freshness_windows()
+        for table in hash_generator.freshness_windows:
+            lookup_table = get_database().load_lookup_table(table)
+            stale_hashes.update(
+                lead_hash
+                for lead_hash in enriched_df["lead_hash"]
+                if lead_hash not in lookup_table
+                or not hash_generator.is_fresh(lookup_table[lead_hash], table)
+            )
+            fresh_new_hashes.update(
+                lead_hash
+                for lead_hash in new_hashes
+                if lead_hash in lookup_table
+                and hash_generator.is_fresh(lookup_table[lead_hash], table)
+            )
+        stale = enriched_df["lead_hash"].isin(stale_hashes)
+
+        self.unchanged_df = enriched_df[~stale]
+        # the lookup tables of steps without freshness window may contain new leads that were enriched before but
+        # are missing in the enriched data, their data is collected again unless it is fresh in any lookup table
+        hash_generator.refresh_hashes = new_hashes - fresh_new_hashes
+        log.info(
+            f"Incremental run: {len(new_leads)} new or changed leads, {stale.sum()} leads with expired data, "
+            f"{len(self.unchanged_df)} unchanged leads"
+        )
+        return pd.concat([enriched_df[stale], new_leads], ignore_index=True)
+
+    def run(self) -> bool:
+        """
+        Run all steps and save the enriched leads
+        :return: Whether all steps succeeded
+        """
+        run_id = self.run_id or datetime.now().strftime("%Y/%m/%d/%H%M%S/")
+        if self.manifest is None:
+            self.manifest = {
+                "run_id": run_id,
+                "snapshot_dir": get_database().get_snapshot_dir_name(run_id),
+                "steps": [],
+            }
+        self.report = RunReport(self.steps)
+        self.report.start(run_id)
+        get_lead_hash_generator().freshness_windows = self._get_freshness_windows()
+
+        if self.chunk_size is not None:
+            error_occurred = self._run_chunked(run_id)
+        else:
+            if self.df is None:
+                log.error(
+                    "Error: DataFrame of pipeline has not been initialized, aborting pipeline run!"
+                )
+                return False
+
+            if self.incremental and len(self.df) == 0:
+                log.info("All leads are up to date, no step has to be run")
+                error_occurred = False
+            else:
+                self.df, error_occurred = self._run_steps(self.df, run_id)
+
+            if self.unchanged_df is not None:
+                self.df = pd.concat([self.unchanged_df, self.df], ignore_index=True)
+                self.unchanged_df = None
+            get_lead_hash_generator().refresh_hashes = set()
+
+            # Set dataframe in DAL
+            get_database().set_dataframe(self.df)
+
+            # Upload DAL dataframe to chosen database
+            get_database().save_dataframe()
+
+        # Delete snapshots
+        if not error_occurred:
+            get_database().clean_snapshots(run_id)
+        elif self.chunk_size is None:
+            log.info(
+                f"Resume the failed run with --resume {self.manifest.get('snapshot_dir', run_id)}"
+            )
+
+        # Store the run report next to the snapshots
+        self.report.finish()
+        get_database().save_run_report(self.report.to_dict(), prefix=run_id)
+
+        log.info(
+            f"Pipeline finished running {len(self.steps)} steps!\n{self.report.summary_table()}"
+        )
+
+        # Apply the retention policy to the snapshots of previous runs
+        get_database().prune_snapshots()
+
+        # a subsequent run starts from scratch
+        self.run_id = None
+        self.completed_steps = 0
+        self.manifest = None
+        return not error_occurred
+
+    def _run_chunked(self, run_id: str) -> bool:
+        """
+        Stream the input through all steps chunk by chunk and append every enriched chunk to the output
+        :return: Whether an error occurred in any step
+        """
         error_occurred = False
-        if self.df is None:
+        output_columns = None
+        processed = 0
+
+        try:
+            for chunk_idx, chunk in enumerate(
+                get_database().iter_dataframe(self.chunk_size)
+            ):
+                if self.limit is not None and processed + len(chunk) > self.limit:
+                    chunk = chunk.iloc[: self.limit - processed].copy()
+                if len(chunk) == 0:
+                    break
+
+                log.info(
+                    f"Processing chunk {chunk_idx} (leads {processed} to {processed + len(chunk) - 1})"
+                )
+                # steps keep their dataframe between runs, make sure every chunk is loaded freshly
+                for step in self.steps:
+                    step.df = None
+
+                chunk, chunk_error = self._run_steps(
+                    chunk, run_id, snapshot_suffix=f"_chunk_{chunk_idx}"
+                )
+                error_occurred = error_occurred or chunk_error
+
+                # all chunks are written with the header of the first one
+                if output_columns is None:
+                    output_columns = chunk.columns
+                else:
+                    chunk = chunk.reindex(columns=output_columns)
+                get_database().save_dataframe_chunk(chunk, first_chunk=chunk_idx == 0)
+
+                processed += len(chunk)
+                if self.limit is not None and processed >= self.limit:
+                    break
+        except BaseException:
+            # the saved chunks must not replace the previous output, also if the run is interrupted
+            get_database().abort_dataframe_chunks()
+            raise
+
+        if output_columns is None:
             log.error(
-                "Error: DataFrame of pipeline has not been initialized, aborting pipeline run!"
+                "Error: No leads were read from the input, aborting pipeline run!"
             )
-            return
+            return True
+
+        get_database().finish_dataframe_chunks()
+        log.info(f"Processed {processed} leads in chunks of {self.chunk_size}")
+        return error_occurred
+
+    def _run_steps(self, df, run_id: str, snapshot_suffix: str = ""):
+        """
+        Run all steps sequentially on the given dataframe. The steps share the dataframe instead of working on copies
+        and only write the columns they declare in added_cols, which are rolled back if a step fails.
+        :return: The enriched dataframe and whether an error occurred in any step
+        """
+        error_occurred = False
+        _normalize_missing_values(df, df.columns)
 
         # helper to pass the dataframe and/or input location from previous step to next step
-        for step in self.steps:
+        for idx, (step, metrics) in enumerate(zip(self.steps, self.report.steps)):
+            if idx < self.completed_steps:
+                log.info(f"Skipping step {step.name}, it finished in the resumed run")
+                continue
+
             log.info(f"Processing step {step.name}")
             # load dataframe and/or input location for this step
             if step.df is None:
-                step.df = self.df.copy()
+                step.df = df
 
+            step_failed = False
+            step_status = "skipped"
+            backup = None
             try:
-                step.load_data()
-                verified = step.verify()
-                log.info(f"Verification for step {step.name}: {verified}")
-                data_present = step.check_data_presence()
-                if verified and not data_present:
-                    step_df = step.run()
-                    self.df = step_df
-
-                    # cleanup
-                    step.finish()
+                with metrics.measure():
+                    step.load_data()
+                    verified = step.verify()
+                    log.info(f"Verification for step {step.name}: {verified}")
+                    # in incremental runs all leads need enrichment, still valid data is served by hash_check
+                    data_present = step.check_data_presence() and not self.incremental
+                    if verified and not data_present:
+                        backup = df[
+                            [col for col in step.added_cols if col in df]
+                        ].copy()
+                        step_df = step.run()
+                        df = step_df
+                        metrics.rows_processed += len(df)
+                        metrics.set_status("completed")
+                        step_status = "completed"
+
+                        # cleanup
+                        step.finish()
             except (StepError, Exception) as e:
-                error_occurred = True
+                step_failed = True
+                step_status = "failed"
+                metrics.set_status("failed")
                 log.error(f"Step {step.name} failed! {e}")
             finally:
-                # Create snapshots to avoid data loss
-                get_database().create_snapshot(step.df, prefix=run_id, name=step.name)
+                # Write buffered results of the step and create snapshots to avoid data loss
+                get_database().flush_gpt_results()
+                checksum = get_database().create_snapshot(
+                    step.df, prefix=run_id, name=step.name + snapshot_suffix
+                )
 
-            self.df = self.df.replace(np.nan, None)
+            # snapshots of chunks only contain part of the leads and cannot be resumed from
+            if not snapshot_suffix and self.manifest is not None:
+                self.manifest["steps"].append(
+                    {
+                        "index": idx,
+                        "name": step.name,
+                        "status": step_status,
+                        "checksum": checksum,
+                    }
+                )
+                get_database().save_snapshot_manifest(self.manifest, prefix=run_id)
 
-        # Set dataframe in DAL
-        get_database().set_dataframe(self.df)
+            if step_failed:
+                error_occurred = True
+                if backup is not None:
+                    _roll_back_columns(df, backup, step.added_cols)
 
-        # Upload DAL dataframe to chosen database
-        get_database().save_dataframe()
+            _normalize_missing_values(df, step.added_cols)
+
+        return df, error_occurred
+
+
+def _normalize_missing_values(df, columns) -> None:
+    """
+    Replace NaN by None in the given object columns of df in place. Numerical columns keep their dtype and NaN values.
+    """
+    for col in columns:
+        if col in df and df[col].dtype == object:
+            df[col] = df[col].where(df[col].notna(), None)
 
-        # Delete snapshots
-        if not error_occurred:
-            get_database().clean_snapshots(run_id)
 
-        log.info(f"Pipeline finished running {len(self.steps)} steps!")
+def _roll_back_columns(df, backup, added_cols) -> None:
+    """
+    Restore the columns of a failed step from backup and drop the columns that the step newly added
+    """
+    for col in backup.columns:
+        df[col] = backup[col]
+    df.drop(
+        columns=[col for col in added_cols if col in df and col not in backup],
+        inplace=True,
+    )
@@ -0,0 +1,190 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from bdc.steps.helpers import get_external_call_counter, get_lead_hash_generator
+from database import get_database
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+
+def get_peak_rss_mb() -> float:
+    """
+    Returns the peak resident set size of the current process in MiB, or None if it cannot be determined
+    """
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is given in bytes on macOS and in kilobytes on Linux
+    return peak_rss / 2**20 if sys.platform == "darwin" else peak_rss / 2**10
+
+
+class StepMetrics:
+    """
+    Resource usage and throughput of a single pipeline step. When the pipeline runs in chunks, the metrics of all
+    chunks are accumulated.
+
+    Attributes:
+        name: Name of the step
+        status: One of "skipped", "completed" or "failed". A step that failed on any chunk is reported as failed.
+        wall_time: Elapsed real time in seconds
+        cpu_time: CPU time of the process in seconds
+        peak_rss_delta: Increase of the peak resident set size of the process in MiB
+        rows_processed: Number of leads the step was run on
+        cache_hits: Number of leads for which hash_check found previously collected data
+        cache_misses: Number of leads for which hash_check had to collect the data
+        external_calls: Number of calls to external services, by name of the service
+        storage_requests: Number of requests to the storage backend and cache hits that saved a request, by type
+    """
+
+    STATUS_PRIORITY = ["skipped", "completed", "failed"]
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.status = "skipped"
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        self.peak_rss_delta = 0.0
+        self.rows_processed = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.external_calls = Counter()
+        self.storage_requests = Counter()
+
+    @property
+    def cache_hit_rate(self) -> float:
+        lookups = self.cache_hits + self.cache_misses
+        return self.cache_hits / lookups if lookups > 0 else None
+
+    @property
+    def storage_round_trips(self) -> int:
+        return sum(
+            count
+            for request, count in self.storage_requests.items()
+            if not request.endswith("cache_hit")
+        )
+
+    @property
+    def round_trips_per_row(self) -> float:
+        return (
+            self.storage_round_trips / self.rows_processed
+            if self.rows_processed > 0
+            else None
+        )
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_processed / self.wall_time if self.wall_time > 0 else None
+
+    def set_status(self, status: str) -> None:
+        if self.STATUS_PRIORITY.index(status) > self.STATUS_PRIORITY.index(self.status):
+            self.status = status
+
+    @contextmanager
+    def measure(self):
+        """
+        Context manager adding the resources used within its body to the metrics of this step
+        """
+        hash_generator = get_lead_hash_generator()
+        cache_hits = hash_generator.cache_hits
+        cache_misses = hash_generator.cache_misses
+        external_calls = get_external_call_counter().get_counts()
+        storage_requests = get_database().get_request_counts()
+        peak_rss = get_peak_rss_mb()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield self
+        finally:
+            self.wall_time += time.perf_counter() - wall_start
+            self.cpu_time += time.process_time() - cpu_start
+            if peak_rss is not None:
+                self.peak_rss_delta += get_peak_rss_mb() - peak_rss
+            self.cache_hits += hash_generator.cache_hits - cache_hits
+            self.cache_misses += hash_generator.cache_misses - cache_misses
+            self.external_calls.update(
+                Counter(get_external_call_counter().get_counts())
+                - Counter(external_calls)
+            )
+            self.storage_requests.update(
+                Counter(get_database().get_request_counts()) - Counter(storage_requests)
+            )
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "status": self.status,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "peak_rss_delta_mb": self.peak_rss_delta,
+            "rows_processed": self.rows_processed,
+            "rows_per_second": self.rows_per_second,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "cache_hit_rate": self.cache_hit_rate,
+            "external_calls": dict(self.external_calls),
+            "external_calls_total": sum(self.external_calls.values()),
+            "storage_requests": dict(self.storage_requests),
+            "storage_round_trips_per_row": self.round_trips_per_row,
+        }
+
+
+class RunReport:
+    """
+    Machine-readable report of a pipeline run, containing the metrics of every step
+    """
+
+    def __init__(self, steps: list) -> None:
+        self.run_id = None
+        self.started_at = None
+        self.finished_at = None
+        self.steps = [StepMetrics(step.name) for step in steps]
+
+    def start(self, run_id: str) -> None:
+        self.run_id = run_id
+        self.started_at = datetime.now()
+
+    def finish(self) -> None:
+        self.finished_at = datetime.now()
+
+    def to_dict(self) -> dict:
+        return {
+            "run_id": self.run_id,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "peak_rss_mb": get_peak_rss_mb(),
+            "steps": [step.to_dict() for step in self.steps],
+            "storage_latencies": get_database().get_operation_latencies(),
+        }
+
+    def summary_table(self) -> str:
+        header = f"{'Step':<32} | {'Status':<9} | {'Wall (s)':>9} | {'CPU (s)':>9} | {'Rows':>8} | {'Rows/s':>9} | {'RSS +MiB':>8} | {'Cache hit':>9} | {'Ext. calls':>10} | {'Req/row':>7}"
+        lines = [header, "-" * len(header)]
+        for step in self.steps:
+            rows_per_second = (
+                f"{step.rows_per_second:.1f}" if step.rows_per_second else "-"
+            )
+            cache_hit_rate = (
+                f"{step.cache_hit_rate * 100:.1f}%"
+                if step.cache_hit_rate is not None
+                else "-"
+            )
+            round_trips_per_row = (
+                f"{step.round_trips_per_row:.2f}"
+                if step.round_trips_per_row is not None
+                else "-"
+            )
+            lines.append(
+                f"{step.name:<32} | {step.status:<9} | {step.wall_time:>9.2f} | {step.cpu_time:>9.2f} | "
+                f"{step.rows_processed:>8} | {rows_per_second:>9} | {step.peak_rss_delta:>8.1f} | "
+                f"{cache_hit_rate:>9} | {sum(step.external_calls.values()):>10} | {round_trips_per_row:>7}"
+            )
+        return "\n".join(lines)
@@ -1,13 +1,39 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Lucca Baumgärtner <lucca.baumgaertner@fau.de>
 
-from .analyze_emails import *
-from .analyze_reviews import *
-from .google_places import *
-from .google_places_detailed import *
-from .gpt_summarizer import *
-from .hash_generator import *
-from .preprocess_phonenumbers import *
-from .regionalatlas import *
-from .search_offeneregister import *
+from importlib import import_module
+
 from .step import *
+
+# Module of every pipeline step by class name. The step modules import heavy dependencies (sklearn, openai, osmnx,
+# ...), so they are only imported when a step is accessed, e.g. `from bdc.steps import GooglePlaces`.
+STEP_MODULES = {
+    "AnalyzeEmails": "analyze_emails",
+    "GPTReviewSentimentAnalyzer": "analyze_reviews",
+    "SmartReviewInsightsEnhancer": "analyze_reviews",
+    "GooglePlaces": "google_places",
+    "GooglePlacesDetailed": "google_places_detailed",
+    "GPTSummarizer": "gpt_summarizer",
+    "HashGenerator": "hash_generator",
+    "PreprocessPhonenumbers": "preprocess_phonenumbers",
+    "RegionalAtlas": "regionalatlas",
+    "SearchOffeneRegister": "search_offeneregister",
+}
+
+__all__ = ["Step", "StepError", "STEP_MODULES", "get_step_class"]
+
+
+def get_step_class(name: str) -> type:
+    """
+    Import the module of a pipeline step and return the class of the step
+    :param name: Class name of the step, e.g. "HashGenerator"
+    :return: The step class
+    :raises KeyError: If there is no step with the given name
+    """
+    return getattr(import_module(f"{__name__}.{STEP_MODULES[name]}"), name)
+
+
+def __getattr__(name: str):
+    if name in STEP_MODULES:
+        return get_step_class(name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
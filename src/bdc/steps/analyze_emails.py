@@ -69,6 +69,8 @@ class AnalyzeEmails(Step):
 
     required_cols = ["Email", "First Name", "Last Name"]
 
+    lookup_tables = [name + "_Custom-Domains", name + "_Email-Accounts"]
+
     def load_data(self):
         pass
 
@@ -13,7 +13,11 @@ from pandas import DataFrame
 from sklearn.linear_model import LinearRegression
 from tqdm import tqdm
 
-from bdc.steps.helpers import TextAnalyzer, get_lead_hash_generator
+from bdc.steps.helpers import (
+    TextAnalyzer,
+    get_external_call_counter,
+    get_lead_hash_generator,
+)
 from bdc.steps.step import Step, StepError
 from config import OPEN_AI_API_KEY
 from database import get_database
@@ -40,6 +44,23 @@ def is_review_valid(review):
     return not (review["text"] is None or review["lang"] is None)
 
 
+def get_reviews(reviews_by_place, place_id):
+    """
+    Get the reviews of a place from the reviews fetched in bulk, places missing in the review store are fetched
+    individually.
+
+    Args:
+    reviews_by_place (dict): Lists of reviews by place_id, as returned by fetch_reviews.
+    place_id (str): The ID of the place.
+
+    Returns:
+    list: The reviews of the place.
+    """
+    if place_id in reviews_by_place:
+        return reviews_by_place[place_id]
+    return get_database().fetch_review(place_id)
+
+
 def check_api_key(api_key, api_name):
     """
     Checks if an API key is provided for a specific API.
@@ -116,6 +137,7 @@ class GPTReviewSentimentAnalyzer(Step):
         Loads the GPT model.
         """
         self.gpt = openai.OpenAI(api_key=OPEN_AI_API_KEY)
+        self.reviews = {}
 
     def verify(self) -> bool:
         """
@@ -137,6 +159,10 @@ class GPTReviewSentimentAnalyzer(Step):
         """
         tqdm.pandas(desc="Running sentiment analysis on reviews")
 
+        # fetch the reviews of all leads with one read per partition of the review store
+        self.reviews = get_database().fetch_reviews(
+            self.df[self.gpt_required_fields["place_id"]], fallback=False
+        )
         self.df[self.extracted_col_name] = self.df.progress_apply(
             lambda lead: get_lead_hash_generator().hash_check(
                 lead,
@@ -154,7 +180,8 @@ class GPTReviewSentimentAnalyzer(Step):
         return self.df
 
     def finish(self) -> None:
-        pass
+        # write the GPT results that are still buffered by the database
+        get_database().flush_gpt_results()
 
     def run_sentiment_analysis(self, place_id):
         """
@@ -172,7 +199,7 @@ class GPTReviewSentimentAnalyzer(Step):
         cached_result = get_database().fetch_gpt_result(place_id, self.name)
         if cached_result:
             return cached_result["result"]
-        reviews = get_database().fetch_review(place_id)
+        reviews = get_reviews(self.reviews, place_id)
         avg_score = self.textblob_calculate_avg_sentiment_score(reviews)
         get_database().save_gpt_result(avg_score, place_id, self.name)
         return avg_score
@@ -242,6 +269,7 @@ class GPTReviewSentimentAnalyzer(Step):
         for attempt in range(max_retries):
             try:
                 log.info(f"Attempt {attempt+1} of {max_retries}")
+                get_external_call_counter().count("openai")
                 response = self.gpt.chat.completions.create(
                     model=self.model,
                     messages=[
@@ -410,7 +438,7 @@ class SmartReviewInsightsEnhancer(Step):
         """
         Loads the data for the step.
         """
-        pass
+        self.reviews = {}
 
     def verify(self) -> bool:
         """
@@ -430,6 +458,11 @@ class SmartReviewInsightsEnhancer(Step):
         """
         tqdm.pandas(desc="Running reviews insights enhancement")
 
+        # fetch the reviews of all leads with one read per partition of the review store
+        self.reviews = get_database().fetch_reviews(
+            self.df["google_places_place_id"], fallback=False
+        )
+
         # Apply the enhancement function
         self.df[self.added_cols] = self.df.progress_apply(
             lambda lead: pd.Series(
@@ -468,7 +501,7 @@ class SmartReviewInsightsEnhancer(Step):
         place_id = lead["google_places_place_id"]
         if place_id is None or pd.isna(place_id):
             return pd.Series({f"{col}": None for col in self.added_cols})
-        reviews = get_database().fetch_review(place_id)
+        reviews = get_reviews(self.reviews, place_id)
         if not reviews:
             return pd.Series({f"{col}": None for col in self.added_cols})
         results = []
@@ -15,7 +15,7 @@ from googlemaps.exceptions import ApiError, HTTPError, Timeout, TransportError
 from requests import RequestException
 from tqdm import tqdm
 
-from bdc.steps.helpers import get_lead_hash_generator
+from bdc.steps.helpers import get_external_call_counter, get_lead_hash_generator
 from bdc.steps.step import Step, StepError
 from config import GOOGLE_PLACES_API_KEY
 from logger import get_logger
@@ -216,6 +216,7 @@ class GooglePlaces(Step):
         if query is None:
             return None, 0
         try:
+            get_external_call_counter().count("google_places_find_place")
             response = self.gmaps.find_place(query, input_type, fields=self.api_fields)
 
             # Retrieve response
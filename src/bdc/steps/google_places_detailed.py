@@ -15,7 +15,7 @@ from googlemaps.exceptions import ApiError, HTTPError, Timeout, TransportError
 from requests import RequestException
 from tqdm import tqdm
 
-from bdc.steps.helpers import get_lead_hash_generator
+from bdc.steps.helpers import get_external_call_counter, get_lead_hash_generator
 from bdc.steps.step import Step, StepError
 from config import GOOGLE_PLACES_API_KEY
 from database import get_database
@@ -76,6 +76,8 @@ class GooglePlacesDetailed(Step):
     def run(self) -> pd.DataFrame:
         # Call places API
         tqdm.pandas(desc="Getting info from Places API")
+        # places whose reviews are saved by this run
+        self.saved_place_ids = set()
 
         # generate_hash = GenerateHashLeads()
         self.df[
@@ -100,7 +102,9 @@ class GooglePlacesDetailed(Step):
         return self.df
 
     def finish(self) -> None:
-        pass
+        # fold the reviews saved by this run into the consolidated review store, only their partitions are rewritten
+        if self.saved_place_ids:
+            get_database().compact_reviews(place_ids=self.saved_place_ids)
 
     def get_data_from_detailed_google_api(self, lead_row):
         error_return_value = pd.Series([None] * len(self.df_fields))
@@ -113,6 +117,7 @@ class GooglePlacesDetailed(Step):
         # Call for the detailed API using specified fields
         try:
             # Fetch place details including reviews
+            get_external_call_counter().count("google_places_details")
             response = self.gmaps.place(
                 place_id,
                 fields=self.api_fields,
@@ -143,7 +148,9 @@ class GooglePlacesDetailed(Step):
         if "result" in response and "reviews" in response["result"]:
             reviews = response["result"]["reviews"]
 
-        get_database().save_review(reviews, place_id)
+        # the fetched reviews are newer than any saved reviews of the place and replace them
+        get_database().save_review(reviews, place_id, force_refresh=True)
+        self.saved_place_ids.add(place_id)
 
         results_list = [
             response["result"][field] if field in response["result"] else None
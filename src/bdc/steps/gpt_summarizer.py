@@ -14,7 +14,7 @@ from pandas import DataFrame
 from requests import RequestException
 from tqdm import tqdm
 
-from bdc.steps.helpers import get_lead_hash_generator
+from bdc.steps.helpers import get_external_call_counter, get_lead_hash_generator
 from bdc.steps.step import Step, StepError
 from config import OPEN_AI_API_KEY
 from database import get_database
@@ -92,7 +92,8 @@ class GPTSummarizer(Step):
         return self.df
 
     def finish(self) -> None:
-        pass
+        # write the GPT results that are still buffered by the database
+        get_database().flush_gpt_results()
 
     def summarize_the_company_website(self, website, place_id):
         """
@@ -115,6 +116,7 @@ class GPTSummarizer(Step):
         for attempt in range(max_retries):
             try:
                 log.info(f"Attempt {attempt+1} of {max_retries}")
+                get_external_call_counter().count("openai")
                 response = self.client.chat.completions.create(
                     model=self.model,
                     messages=[
@@ -170,6 +172,7 @@ class GPTSummarizer(Step):
     def extract_the_raw_html_and_parse(self, url):
         try:
             # Send a request to the URL
+            get_external_call_counter().count("website")
             response = requests.get(url)
         except RequestException as e:
             log.error(f"An error occured during getting repsonse from url: {e}")
@@ -1,9 +1,16 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Berkay Bozkurt <resitberkaybozkurt@gmail.com>
 
+from importlib import import_module
+
+from .call_counter import *
 from .generate_hash_leads import *
-from .offeneregister_api import *
-from .text_analyzer import *
+
+# Helpers with heavy dependencies are only imported by the steps that use them
+_LAZY_HELPERS = {
+    "OffeneRegisterAPI": "offeneregister_api",
+    "TextAnalyzer": "text_analyzer",
+}
 
 _lead_hash_generator = None
 
@@ -15,3 +22,9 @@ def get_lead_hash_generator() -> LeadHashGenerator:
         _lead_hash_generator = LeadHashGenerator()
 
     return _lead_hash_generator
+
+
+def __getattr__(name: str):
+    if name in _LAZY_HELPERS:
+        return getattr(import_module(f"{__name__}.{_LAZY_HELPERS[name]}"), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
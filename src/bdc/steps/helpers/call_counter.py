@@ -0,0 +1,36 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+from collections import Counter
+from threading import Lock
+
+
+class ExternalCallCounter:
+    """
+    Counts the calls to external services (Google APIs, OpenAI, websites, ...) made by the pipeline steps, grouped by
+    the name of the service. The pipeline reads the counts before and after every step to report the calls per step.
+    """
+
+    def __init__(self) -> None:
+        self._counts = Counter()
+        self._lock = Lock()
+
+    def count(self, service: str, calls: int = 1) -> None:
+        with self._lock:
+            self._counts[service] += calls
+
+    def get_counts(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+
+_external_call_counter = None
+
+
+def get_external_call_counter() -> ExternalCallCounter:
+    global _external_call_counter
+
+    if _external_call_counter is None:
+        _external_call_counter = ExternalCallCounter()
+
+    return _external_call_counter
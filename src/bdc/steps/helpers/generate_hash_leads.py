@@ -3,7 +3,7 @@
 
 import hashlib
 import os
-from datetime import datetime
+from datetime import datetime, timedelta
 
 import pandas as pd
 
@@ -15,23 +15,61 @@ log = get_logger()
 
 class LeadHashGenerator:
     BASE_PATH = os.path.dirname(__file__)
+    LAST_UPDATED_FORMAT = "%Y-%m-%d_%H:%M:%S"
     _curr_lookup_table = ("", None)
+    # number of leads for which hash_check found (hit) or did not find (miss) previously collected data
+    cache_hits = 0
+    cache_misses = 0
+
+    def __init__(self) -> None:
+        # maximum age of the data in a lookup table, by name of the lookup table
+        self.freshness_windows: dict[str, timedelta] = {}
+        # hashes of leads whose data is collected regardless of the lookup tables
+        self.refresh_hashes: set[str] = set()
+
+    def is_fresh(self, lookup_entry: list, step_name: str) -> bool:
+        """
+        Check whether the data of a lookup table entry is within the freshness window of the lookup table
+        :param lookup_entry: Entry of the lookup table, with the "Last Updated" time as last element
+        :param step_name: Name of the lookup table
+        :return: False if the entry is older than the freshness window or its age cannot be determined
+        """
+        window = self.freshness_windows.get(step_name)
+        if window is None:
+            return True
+        try:
+            last_updated = datetime.strptime(lookup_entry[-1], self.LAST_UPDATED_FORMAT)
+        except (IndexError, TypeError, ValueError):
+            return False
+        return datetime.now() - last_updated <= window
+
+    # Columns identifying a lead, which are concatenated for its hash
+    KEY_COLUMNS = ["First Name", "Last Name", "Company / Account", "Phone", "Email"]
 
     def hash_lead(self, lead_data):
         # Concatenate key lead information
-        data_to_hash = (
-            str(lead_data["First Name"])
-            + str(lead_data["Last Name"])
-            + str(lead_data["Company / Account"])
-            + str(lead_data["Phone"])
-            + str(lead_data["Email"])
-        )
+        data_to_hash = "".join(str(lead_data[column]) for column in self.KEY_COLUMNS)
 
         # Hash the concatenated string using SHA-256
         lead_hash = hashlib.sha256(data_to_hash.encode()).hexdigest()
 
         return lead_hash
 
+    def hash_leads(self, leads: pd.DataFrame) -> pd.Series:
+        """
+        Hash all leads like hash_lead(). The key columns are concatenated column-wise instead of building a Series per
+        lead, only the SHA-256 hashing is done per lead.
+        :return: Hashes of the leads, with the index of the leads
+        """
+        data_to_hash = pd.Series("", index=leads.index, dtype=object)
+        for column in self.KEY_COLUMNS:
+            data_to_hash += leads[column].map(str)
+        return pd.Series(
+            [hashlib.sha256(data.encode()).hexdigest() for data in data_to_hash],
+            index=leads.index,
+            dtype=object,
+        )
+
     def hash_check(
         self,
         lead_data: pd.Series,
@@ -53,20 +91,26 @@ class LeadHashGenerator:
 
         lookup_table = self._curr_lookup_table[1]
 
-        if lead_hash in lookup_table:
+        if (
+            lead_hash in lookup_table
+            and lead_hash not in self.refresh_hashes
+            and self.is_fresh(lookup_table[lead_hash], step_name)
+        ):
             # If the hash exists in the lookup table, return the corresponding data
             log.debug(f"Hash {lead_hash} already exists in the lookup table.")
             try:
                 previous_data = lead_data[fields_tofill]
+                self.cache_hits += 1
                 return previous_data
             except KeyError as e:
                 log.debug(
                     f"Hash is present but data fields {fields_tofill} were not found."
                 )
                 lookup_table[lead_hash] = lookup_table[lead_hash][:-1] + [
-                    datetime.now().strftime("%Y-%m-%d_%H:%M:%S"),
+                    datetime.now().strftime(self.LAST_UPDATED_FORMAT),
                 ]
                 get_database().save_lookup_table(lookup_table, step_name)
+                self.cache_misses += 1
                 return data_fill_function(*args, **kwargs)
 
         lookup_table[lead_hash] = [
@@ -75,8 +119,9 @@ class LeadHashGenerator:
             lead_data["Company / Account"],
             lead_data["Phone"],
             lead_data["Email"],
-            datetime.now().strftime("%Y-%m-%d_%H:%M:%S"),
+            datetime.now().strftime(self.LAST_UPDATED_FORMAT),
         ]
         get_database().save_lookup_table(lookup_table, step_name)
+        self.cache_misses += 1
 
         return data_fill_function(*args, **kwargs)
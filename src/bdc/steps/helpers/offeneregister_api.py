@@ -6,6 +6,8 @@ from bs4 import BeautifulSoup
 
 from logger import get_logger
 
+from .call_counter import get_external_call_counter
+
 log = get_logger()
 
 OFFENREGISTER_BASE_URL = "https://db.offeneregister.de/"
@@ -81,6 +83,7 @@ class OffeneRegisterAPI:
             dict: A dictionary containing class name and value pairs of the retrieved data.
         """
         url = OFFENRENREGISTER_POSITIONS_URL.format(first_name, last_name)
+        get_external_call_counter().count("offeneregister")
         response = requests.get(url)
 
         # Check if the request was successful
@@ -146,6 +149,7 @@ class OffeneRegisterAPI:
         """
         if company_id:
             url = url.format(company_id)
+            get_external_call_counter().count("offeneregister")
             response = requests.get(url)
 
             # Check if the request was successful
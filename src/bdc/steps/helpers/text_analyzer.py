@@ -12,6 +12,8 @@ from textblob import TextBlob
 
 from logger import get_logger
 
+from .call_counter import get_external_call_counter
+
 log = get_logger()
 
 
@@ -172,6 +174,7 @@ class TextAnalyzer:
 
         for attempt in range(max_retries):
             try:
+                get_external_call_counter().count("languagetool")
                 errors = ltp.check(
                     inp_text, api_url="https://languagetool.org/api/v2/", lang=language
                 )
@@ -206,6 +209,7 @@ class TextAnalyzer:
             return inp_text
 
         try:
+            get_external_call_counter().count("google_translate")
             return GoogleTranslator(source=source_lang, target=target_lang).translate(
                 inp_text
             )
@@ -9,7 +9,7 @@ import pandas as pd
 from pandas import DataFrame
 from tqdm import tqdm
 
-from bdc.steps.helpers import get_lead_hash_generator
+from bdc.steps.helpers import get_external_call_counter, get_lead_hash_generator
 from bdc.steps.step import Step, StepError
 from logger import get_logger
 
@@ -98,6 +98,8 @@ class RegionalAtlas(Step):
         )
     ] + [f"{name.lower()}_regional_score"]
 
+    lookup_tables = [name + "_Location-Data", name + "_Regional-Score"]
+
     required_cols = ["google_places_formatted_address"]
 
     regions_gdfs = gpd.GeoDataFrame()
@@ -111,13 +113,14 @@ class RegionalAtlas(Step):
         pass
 
     def verify(self) -> bool:
-        # Load the data file
-        try:
-            self.regions_gdfs = gpd.read_file("data/merged_geo.geojson")
-        except:
-            raise StepError(
-                "The path for the geojson for regional information (Regionalatlas) is not valid!"
-            )
+        # Load the data file only once, as the step is verified for every chunk when streaming
+        if self.regions_gdfs.empty:
+            try:
+                self.regions_gdfs = gpd.read_file("data/merged_geo.geojson")
+            except:
+                raise StepError(
+                    "The path for the geojson for regional information (Regionalatlas) is not valid!"
+                )
         return super().verify()
 
     def run(self) -> DataFrame:
@@ -220,6 +223,7 @@ class RegionalAtlas(Step):
 
         # Get the polygon of the city, to find the corresponding region
         try:
+            get_external_call_counter().count("osm_geocoding")
             if row["google_places_formatted_address"] is not None:
                 search_gdf = osmnx.geocode_to_gdf(",".join(google_location))
             else:  # at this point we know, that either a google_places_address exists or a number_area
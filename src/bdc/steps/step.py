@@ -16,21 +16,33 @@ class StepError(Exception):
 class Step:
     """
     Step is an abstract parent class for all steps of the data enrichment pipeline. Steps can be added to a list
-    and then be passed to the pipeline for sequential execution.
+    and then be passed to the pipeline for sequential execution. All steps of a pipeline work on the same dataframe
+    instead of a copy, so a step must only write the columns it declares in added_cols.
 
     Attributes:
         name: Name of this step, used for logging and as column prefix
-        added_cols: List of fields that will be added to the main dataframe by executing a step
+        added_cols: List of fields that will be added to the main dataframe by executing a step. These are rolled
+            back by the pipeline if the step fails
         required_cols: List of fields that are required to be existent in the input dataframe before performing a step
+        lookup_tables: Names of the lookup tables this step passes to hash_check, defaults to the name of the step
+        freshness_days: Maximum age in days of the data of a lead in the lookup tables of this step. Older data is
+            collected again, also in incremental runs of the pipeline. None means the data never expires.
     """
 
     name: str = None
     added_cols: list[str] = []
     required_cols: list[str] = []
+    lookup_tables: list[str] = None
 
-    def __init__(self, force_refresh: bool = False) -> None:
+    def __init__(
+        self, force_refresh: bool = False, freshness_days: float = None
+    ) -> None:
         self.df = None
         self.force_refresh = force_refresh
+        self.freshness_days = freshness_days
+
+    def get_lookup_table_names(self) -> list[str]:
+        return self.lookup_tables if self.lookup_tables is not None else [self.name]
 
     @property
     def df(self) -> DataFrame:
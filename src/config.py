@@ -23,3 +23,10 @@ AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
 AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_ACCESS_KEY")
 
 DATABASE_TYPE = os.getenv("DATABASE_TYPE")
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT") or "csv"
+S3_CACHE_DIR = os.getenv("S3_CACHE_DIR")
+S3_CACHE_MAX_SIZE_MB = int(os.getenv("S3_CACHE_MAX_SIZE_MB") or 2048)
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS") or 50)
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS") or 5)
+S3_CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT") or 10)
+S3_READ_TIMEOUT = float(os.getenv("S3_READ_TIMEOUT") or 60)
@@ -1,24 +1,38 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Felix Zailskas <felixzailskas@gmail.com>
 
-from config import DATABASE_TYPE
+from config import DATABASE_TYPE, S3_CACHE_DIR, S3_CACHE_MAX_SIZE_MB, STORAGE_FORMAT
 from logger import get_logger
 
-from .leads import LocalRepository, Repository, S3Repository
+from .leads import LocalRepository, Repository, S3DiskCache, S3Repository
 
 _database = None
 log = get_logger()
 
 
-def get_database() -> Repository:
+def get_database(storage_format: str = None) -> Repository:
+    """
+    :param storage_format: Format of the lead data files written by the database, overrides STORAGE_FORMAT. Only
+    takes effect if the database has not been created yet.
+    """
     global _database
     if _database is None:
+        storage_format = storage_format or STORAGE_FORMAT
         if DATABASE_TYPE == "S3":
-            _database = S3Repository()
+            cache = (
+                S3DiskCache(S3_CACHE_DIR, S3_CACHE_MAX_SIZE_MB * 2**20)
+                if S3_CACHE_DIR
+                else None
+            )
+            _database = S3Repository(storage_format=storage_format, cache=cache)
         elif DATABASE_TYPE == "Local":
-            _database = LocalRepository()
+            _database = LocalRepository(storage_format=storage_format)
         else:
             log.error("Database type not initialised")
             raise ValueError
+    elif storage_format is not None and storage_format != _database.storage_format:
+        log.warning(
+            f"Database already uses storage format {_database.storage_format}, ignoring {storage_format}"
+        )
 
     return _database
@@ -1,6 +1,10 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Sophie Heasman <sophieheasmann@gmail.com>
 
+from .feature_store import *
 from .local_repository import *
+from .model_cache import *
+from .record_store import *
 from .repository import *
+from .s3_cache import *
 from .s3_repository import *
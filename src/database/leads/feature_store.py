@@ -0,0 +1,219 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from logger import get_logger
+
+log = get_logger()
+
+# All features are stored as float32, which the tree-based models use internally, so they are not converted again
+FEATURE_STORE_DTYPE = np.float32
+
+
+def get_source_signature(path: str) -> dict:
+    """
+    :param path: Local file of the preprocessed data
+    :return: Path, size and modification time of the file, which change when it is written again, or None if the file
+    does not exist
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return {
+        "path": os.path.abspath(path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+class FeatureStore:
+    """
+    Preprocessed leads as a float32 feature matrix, which is memory-mapped instead of read into memory. Loading the
+    features takes no time and memory, the rows are only read from disk when they are accessed.
+
+    A feature store is a directory with three files:
+        - manifest.json: number of rows, names of the feature columns and of the label column and the signature of
+          the preprocessed data file the features were written with
+        - features.bin: the feature matrix in row-major order
+        - labels.bin: the class labels, nan for leads without label
+
+    The feature store is written with FeatureStoreWriter.
+    """
+
+    MANIFEST = "manifest.json"
+    FEATURES = "features.bin"
+    LABELS = "labels.bin"
+
+    def __init__(self, directory: str) -> None:
+        """
+        :param directory: Directory of the feature store
+        :raises FileNotFoundError: If there is no feature store in the directory
+        :raises ValueError: If the files of the feature store do not match its manifest
+        """
+        self.directory = directory
+        with open(os.path.join(directory, self.MANIFEST)) as fp:
+            manifest = json.load(fp)
+        self.columns = manifest["columns"]
+        self.label_column = manifest["label_column"]
+        self.num_rows = manifest["rows"]
+        self.source = manifest.get("source")
+
+        features_path = os.path.join(directory, self.FEATURES)
+        expected_size = (
+            self.num_rows * len(self.columns) * np.dtype(FEATURE_STORE_DTYPE).itemsize
+        )
+        if os.path.getsize(features_path) != expected_size:
+            raise ValueError(
+                f"The features in {directory} do not match its manifest, preprocess the data again!"
+            )
+        if self.num_rows * len(self.columns) > 0:
+            self.features = np.memmap(
+                features_path,
+                dtype=FEATURE_STORE_DTYPE,
+                mode="r",
+                shape=(self.num_rows, len(self.columns)),
+            )
+        else:
+            # empty files cannot be memory-mapped
+            self.features = np.empty(
+                (self.num_rows, len(self.columns)), FEATURE_STORE_DTYPE
+            )
+        self.labels = np.fromfile(
+            os.path.join(directory, self.LABELS), dtype=FEATURE_STORE_DTYPE
+        )
+        if not np.isnan(self.labels).any():
+            self.labels = self.labels.astype(np.int64)
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        return os.path.isfile(os.path.join(directory, cls.MANIFEST))
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def is_stale(self, source_path: str) -> bool:
+        """
+        Check whether the preprocessed data file was written again, or by another version, after the features
+        :param source_path: Local file of the preprocessed data
+        :return: True if the file differs from the file the features were written with. Feature stores without
+        recorded source are stale if the file exists.
+        """
+        source = get_source_signature(source_path)
+        return source is not None and source != self.source
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        :return: Features and labels as dataframe, like the preprocessed data
+        """
+        df = pd.DataFrame(self.features, columns=self.columns)
+        df[self.label_column] = self.labels
+        return df
+
+
+class FeatureStoreWriter:
+    """
+    Write preprocessed leads chunk by chunk to a FeatureStore. The files are written under temporary names and
+    replace the previous feature store when the writer is closed. If the writer is used as context manager and an
+    exception occurs, the written files are removed instead.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        label_column: str = "MerchantSizeByDPV",
+        source_path: str = None,
+    ) -> None:
+        """
+        :param directory: Directory of the feature store, created if it does not exist
+        :param label_column: Column of the class labels, all other columns are features
+        :param source_path: Local file of the preprocessed data that is written with the features. It has to be
+        written before the writer is closed, its signature is recorded in the manifest.
+        """
+        self.directory = directory
+        self.label_column = label_column
+        self.source_path = source_path
+        self.columns = None
+        self.num_rows = 0
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self._features_file = open(self._get_tmp_path(FeatureStore.FEATURES), "wb")
+        self._labels_file = open(self._get_tmp_path(FeatureStore.LABELS), "wb")
+
+    def write(self, df: pd.DataFrame) -> None:
+        """
+        :param df: Chunk of preprocessed leads, the feature columns of all chunks have to be the columns of the first
+        chunk
+        """
+        if self.columns is None:
+            self.columns = [col for col in df.columns if col != self.label_column]
+        # sparse columns are written dense, only one chunk is dense in memory at a time
+        features = df.reindex(columns=self.columns).to_numpy(FEATURE_STORE_DTYPE)
+        np.ascontiguousarray(features).tofile(self._features_file)
+        if self.label_column in df:
+            labels = df[self.label_column].to_numpy(
+                FEATURE_STORE_DTYPE, na_value=np.nan
+            )
+        else:
+            labels = np.full(len(df), np.nan, FEATURE_STORE_DTYPE)
+        labels.tofile(self._labels_file)
+        self.num_rows += len(df)
+
+    def close(self) -> None:
+        if self._features_file.closed:
+            return
+        self._features_file.close()
+        self._labels_file.close()
+        with open(self._get_tmp_path(FeatureStore.MANIFEST), "w") as fp:
+            json.dump(
+                {
+                    "rows": self.num_rows,
+                    "columns": self.columns or [],
+                    "label_column": self.label_column,
+                    "source": (
+                        get_source_signature(self.source_path)
+                        if self.source_path is not None
+                        else None
+                    ),
+                },
+                fp,
+            )
+        # the manifest is replaced last, it is only read together with the files it describes
+        for file_name in [
+            FeatureStore.FEATURES,
+            FeatureStore.LABELS,
+            FeatureStore.MANIFEST,
+        ]:
+            os.replace(
+                self._get_tmp_path(file_name), os.path.join(self.directory, file_name)
+            )
+        log.info(
+            f"Saved {self.num_rows} rows with {len(self.columns or [])} features to the feature store {self.directory}"
+        )
+
+    def abort(self) -> None:
+        """
+        Discard the written chunks and keep the previous feature store
+        """
+        self._features_file.close()
+        self._labels_file.close()
+        for file_name in [FeatureStore.FEATURES, FeatureStore.LABELS]:
+            if os.path.exists(self._get_tmp_path(file_name)):
+                os.remove(self._get_tmp_path(file_name))
+
+    def __enter__(self) -> "FeatureStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.close()
+
+    def _get_tmp_path(self, file_name: str) -> str:
+        return os.path.join(self.directory, file_name + ".tmp")
@@ -4,14 +4,28 @@
 import csv
 import json
 import os
+import shutil
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 import joblib
 import pandas as pd
 
 from logger import get_logger
 
-from .repository import Repository
+from .record_store import JsonlRecordStore
+from .repository import (
+    PARQUET_COMPRESSION,
+    DataframeChunkWriter,
+    Repository,
+    get_storage_format,
+    iter_dataframe_chunks,
+    read_dataframe,
+    write_dataframe,
+)
+
+if TYPE_CHECKING:
+    import pyarrow as pa
 
 log = get_logger()
 
@@ -34,6 +48,9 @@ class LocalRepository(Repository):
         os.path.join(BASE_PATH, "../../data/leads_predicted_size.csv")
     )
     REVIEWS = os.path.abspath(os.path.join(BASE_PATH, "../../data/reviews/"))
+    REVIEWS_STORE = os.path.abspath(
+        os.path.join(BASE_PATH, "../../data/reviews_store/")
+    )
     SNAPSHOTS = os.path.abspath(os.path.join(BASE_PATH, "../../data/snapshots/"))
     GPT_RESULTS = os.path.abspath(os.path.join(BASE_PATH, "../../data/gpt-results/"))
     ML_MODELS = os.path.abspath(os.path.join(BASE_PATH, "../../data/models/"))
@@ -41,21 +58,100 @@ class LocalRepository(Repository):
         os.path.join(BASE_PATH, "../../data/classification_reports/")
     )
 
+    def __init__(self, storage_format: str = "csv"):
+        super().__init__(storage_format)
+        self._record_stores = {}
+
     def _download(self):
         """
         Download database from specified DF path
         """
+        input_path = self.get_input_path()
+        try:
+            self.df = read_dataframe(input_path, get_storage_format(input_path))
+        except FileNotFoundError:
+            log.error("Error: Could not find input file for Pipeline.")
+
+    def iter_dataframe(self, chunk_size: int):
+        """
+        Read the input dataframe from the specified DF path in chunks
+        """
+        input_path = self.get_input_path()
         try:
-            self.df = pd.read_csv(self.DF_INPUT)
+            yield from iter_dataframe_chunks(
+                input_path, get_storage_format(input_path), chunk_size
+            )
         except FileNotFoundError:
             log.error("Error: Could not find input file for Pipeline.")
 
+    def load_enriched_dataframe(
+        self, historical: bool = False, columns: list[str] = None
+    ):
+        """
+        Load the enriched data of the previous pipeline run from the output location
+        """
+        data_path = self._resolve_data_path(
+            self.DF_HISTORICAL_OUTPUT if historical else self.DF_OUTPUT
+        )
+        try:
+            return read_dataframe(data_path, get_storage_format(data_path), columns)
+        except FileNotFoundError:
+            log.info(f"No enriched data found at {data_path}")
+            return None
+
+    def iter_enriched_dataframe(
+        self, chunk_size: int, historical: bool = False, columns: list[str] = None
+    ):
+        """
+        Read the enriched data of the previous pipeline run in chunks
+        """
+        data_path = self._resolve_data_path(
+            self.DF_HISTORICAL_OUTPUT if historical else self.DF_OUTPUT
+        )
+        try:
+            yield from iter_dataframe_chunks(
+                data_path, get_storage_format(data_path), chunk_size, columns
+            )
+        except FileNotFoundError:
+            log.info(f"No enriched data found at {data_path}")
+
     def save_dataframe(self):
         """
         Save dataframe in df attribute in chosen output location
         """
-        self.df.to_csv(self.DF_OUTPUT, index=False)
-        log.info(f"Saved enriched data locally to {self.DF_OUTPUT}")
+        output_path = self.get_enriched_data_path()
+        write_dataframe(self.df, output_path, self.storage_format)
+        log.info(f"Saved enriched data locally to {output_path}")
+
+    def save_dataframe_chunk(self, df, first_chunk: bool = False):
+        """
+        Append a chunk of the enriched dataframe to the chosen output location
+        """
+        if first_chunk or self._chunk_writer is None:
+            self.abort_dataframe_chunks()
+            # the chunks are written to a temporary file, which replaces the output once all chunks were saved
+            self._chunk_writer = DataframeChunkWriter(
+                self.get_enriched_data_path() + ".tmp", self.storage_format
+            )
+        self._chunk_writer.write(df)
+
+    def finish_dataframe_chunks(self):
+        output_path = self.get_enriched_data_path()
+        if self._chunk_writer is not None:
+            self._chunk_writer.close()
+            self._chunk_writer = None
+            os.replace(output_path + ".tmp", output_path)
+        log.info(f"Saved enriched data locally to {output_path}")
+
+    def abort_dataframe_chunks(self):
+        if self._chunk_writer is not None:
+            self._chunk_writer.close()
+            self._chunk_writer = None
+        if os.path.exists(self.get_enriched_data_path() + ".tmp"):
+            os.remove(self.get_enriched_data_path() + ".tmp")
+
+    def _data_exists(self, path: str) -> bool:
+        return os.path.exists(path)
 
     def save_prediction(self, df):
         """
@@ -64,6 +160,24 @@ class LocalRepository(Repository):
         df.to_csv(self.DF_PREDICTION_OUTPUT, index=False)
         log.info(f"Saved prediction result locally to {self.DF_PREDICTION_OUTPUT}")
 
+    def save_prediction_chunks(self, chunks) -> int:
+        tmp_path = self.DF_PREDICTION_OUTPUT + ".tmp"
+        writer = DataframeChunkWriter(tmp_path, "csv")
+        rows = 0
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+                rows += len(chunk)
+            writer.close()
+            os.replace(tmp_path, self.DF_PREDICTION_OUTPUT)
+        except BaseException:
+            writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        log.info(f"Saved {rows} predictions locally to {self.DF_PREDICTION_OUTPUT}")
+        return rows
+
     def insert_data(self, data):
         """
         TODO: Insert new data into specified dataframe
@@ -71,29 +185,43 @@ class LocalRepository(Repository):
         """
         pass
 
+    def _get_record_store(self, directory: str) -> JsonlRecordStore:
+        """
+        Get the record store in the given directory, which is opened on first use
+        """
+        if directory not in self._record_stores:
+            self._record_stores[directory] = JsonlRecordStore(directory)
+        return self._record_stores[directory]
+
     def save_review(self, review, place_id, force_refresh=False):
         """
         Upload review to specified review path
         :param review: json contents of the review to be uploaded
+        :param force_refresh: Replace the reviews that are already saved for the place
         """
-        # Write the data to a JSON file
-        file_name = place_id + "_gpt_results.json"
-        json_file_path = os.path.join(self.REVIEWS, file_name)
-
-        if os.path.exists(json_file_path):
+        reviews_store = self._get_record_store(self.REVIEWS)
+        if not force_refresh and (
+            place_id in reviews_store
+            or os.path.exists(self._get_legacy_review_path(place_id))
+        ):
             log.debug(f"Reviews for {place_id} already exist")
             return
+        reviews_store.put(place_id, review)
 
-        with open(json_file_path, "w", encoding="utf-8") as json_file:
-            json.dump(review, json_file, ensure_ascii=False, indent=4)
+    def _get_legacy_review_path(self, place_id) -> str:
+        # reviews used to be stored in one file per place
+        return os.path.join(self.REVIEWS, place_id + "_gpt_results.json")
 
     def fetch_review(self, place_id):
         """
         Fetch review for specified place_id
         :return: json contents of desired review
         """
-        file_name = place_id + "_gpt_results.json"
-        reviews_path = os.path.join(self.REVIEWS, file_name)
+        reviews = self._get_record_store(self.REVIEWS).get(place_id)
+        if reviews is not None:
+            return reviews
+
+        reviews_path = self._get_legacy_review_path(place_id)
         try:
             with open(reviews_path, "r", encoding="utf-8") as reviews_json:
                 reviews = json.load(reviews_json)
@@ -103,14 +231,105 @@ class LocalRepository(Repository):
             # Return empty list if any exception occurred or status is not OK
             return []
 
+    def _list_review_place_ids(self) -> list[str]:
+        suffix = "_gpt_results.json"
+        return list(
+            set(self._get_record_store(self.REVIEWS).keys())
+            | {
+                file_name[: -len(suffix)]
+                for file_name in os.listdir(self.REVIEWS)
+                if file_name.endswith(suffix)
+            }
+        )
+
+    def _get_review_partition_path(self, partition: int) -> str:
+        return os.path.join(self.REVIEWS_STORE, f"part-{partition:02d}.parquet")
+
+    def _read_review_partition(
+        self, partition: int, columns: list[str] = None
+    ) -> "pa.Table":
+        partition_path = self._get_review_partition_path(partition)
+        if not os.path.exists(partition_path):
+            return None
+        import pyarrow.parquet as pq
+
+        return pq.read_table(partition_path, columns=columns, pre_buffer=False)
+
+    def _write_review_partition(self, partition: int, table: "pa.Table") -> None:
+        import pyarrow.parquet as pq
+
+        partition_path = self._get_review_partition_path(partition)
+        Path(self.REVIEWS_STORE).mkdir(parents=True, exist_ok=True)
+        # write to a temporary file first, such that readers never see a partially written partition
+        pq.write_table(table, partition_path + ".tmp", compression=PARQUET_COMPRESSION)
+        os.replace(partition_path + ".tmp", partition_path)
+
+    def _get_snapshot_dir(self, prefix):
+        return os.path.join(self.SNAPSHOTS, prefix.strip("/").replace("/", "_"))
+
+    def get_snapshot_dir_name(self, prefix) -> str:
+        return os.path.basename(self._get_snapshot_dir(prefix))
+
     def create_snapshot(self, df, prefix, name):
-        full_path = (
-            f"{self.SNAPSHOTS}/{prefix.replace('/','_')}{name.lower()}_snapshot.csv"
+        snapshot_dir = self._get_snapshot_dir(prefix)
+        Path(snapshot_dir).mkdir(parents=True, exist_ok=True)
+        full_path = os.path.join(snapshot_dir, f"{name.lower()}_snapshot.pkl")
+        with open(full_path, "wb") as fh:
+            df.to_pickle(fh)
+        with open(full_path, "rb") as fh:
+            return self._compute_checksum(fh)
+
+    def load_snapshot(self, prefix, name, checksum=None):
+        full_path = os.path.join(
+            self._get_snapshot_dir(prefix), f"{name.lower()}_snapshot.pkl"
         )
-        df.to_csv(full_path, index=False)
+        try:
+            with open(full_path, "rb") as fh:
+                if checksum is not None and self._compute_checksum(fh) != checksum:
+                    log.error(f"Checksum of snapshot {full_path} does not match!")
+                    return None
+                fh.seek(0)
+                return pd.read_pickle(fh)
+        except FileNotFoundError:
+            log.error(f"Could not find snapshot {full_path}")
+            return None
+
+    def save_snapshot_manifest(self, manifest: dict, prefix):
+        snapshot_dir = self._get_snapshot_dir(prefix)
+        Path(snapshot_dir).mkdir(parents=True, exist_ok=True)
+        with open(
+            os.path.join(snapshot_dir, "manifest.json"), "w", encoding="utf-8"
+        ) as json_file:
+            json.dump(manifest, json_file, indent=4)
+
+    def load_snapshot_manifest(self, prefix) -> dict:
+        full_path = os.path.join(self._get_snapshot_dir(prefix), "manifest.json")
+        try:
+            with open(full_path, "r", encoding="utf-8") as json_file:
+                return json.load(json_file)
+        except FileNotFoundError:
+            log.error(f"Could not find snapshot manifest {full_path}")
+            return None
+
+    def get_snapshot_runs(self) -> list[str]:
+        if not os.path.exists(self.SNAPSHOTS):
+            return []
+        return [
+            run_dir.replace("_", "/") + "/"
+            for run_dir in sorted(os.listdir(self.SNAPSHOTS))
+            if os.path.isdir(os.path.join(self.SNAPSHOTS, run_dir))
+        ]
 
     def clean_snapshots(self, prefix):
-        pass
+        shutil.rmtree(self._get_snapshot_dir(prefix), ignore_errors=True)
+
+    def save_run_report(self, report: dict, prefix):
+        snapshot_dir = self._get_snapshot_dir(prefix)
+        Path(snapshot_dir).mkdir(parents=True, exist_ok=True)
+        full_path = os.path.join(snapshot_dir, "run_report.json")
+        with open(full_path, "w", encoding="utf-8") as json_file:
+            json.dump(report, json_file, indent=4)
+        log.info(f"Saved run report locally to {full_path}")
 
     def save_lookup_table(self, lookup_table: dict, step_name: str) -> None:
         lookup_path = Path(
@@ -162,34 +381,32 @@ class LocalRepository(Repository):
         :param operation_name: The name of the GPT operation
         :param save_date: The date the results were saved
         """
-        file_name = file_id + "_gpt_results.json"
-        json_file_path = os.path.join(self.GPT_RESULTS, file_name)
+        gpt_results = self._load_gpt_results(file_id)
+        gpt_results[operation_name] = {
+            "result": gpt_result,
+            "last_update_date": self._get_current_time_as_string(),
+        }
+        self._get_record_store(self.GPT_RESULTS).put(file_id, gpt_results)
+
+    def _load_gpt_results(self, file_id) -> dict:
+        """
+        Load all GPT results of a file ID
+        :return: GPT results by operation name
+        """
+        gpt_results = self._get_record_store(self.GPT_RESULTS).get(file_id)
+        if gpt_results is not None:
+            return gpt_results
 
-        current_date = self._get_current_time_as_string()
-        if os.path.exists(json_file_path):
+        # GPT results used to be stored in one file per file ID
+        json_file_path = os.path.join(self.GPT_RESULTS, file_id + "_gpt_results.json")
+        if not os.path.exists(json_file_path):
+            return {}
+        try:
             with open(json_file_path, "r", encoding="utf-8") as json_file:
-                existing_data = json.load(json_file)
-
-            existing_data[operation_name] = {
-                "result": gpt_result,
-                "last_update_date": current_date,
-            }
-
-            with open(json_file_path, "w", encoding="utf-8") as json_file:
-                json.dump(existing_data, json_file, ensure_ascii=False, indent=4)
-        else:
-            with open(json_file_path, "w", encoding="utf-8") as json_file:
-                json.dump(
-                    {
-                        operation_name: {
-                            "result": gpt_result,
-                            "last_update_date": current_date,
-                        }
-                    },
-                    json_file,
-                    ensure_ascii=False,
-                    indent=4,
-                )
+                return json.load(json_file)
+        except:
+            log.warning(f"Error loading GPT results from path {json_file_path}.")
+            return {}
 
     def fetch_gpt_result(self, file_id, operation_name):
         """
@@ -202,33 +419,50 @@ class LocalRepository(Repository):
         Returns:
             The GPT result for the specified file ID and operation name.
         """
-        file_name = file_id + "_gpt_results.json"
-        json_file_path = os.path.join(self.GPT_RESULTS, file_name)
-        if not os.path.exists(json_file_path):
-            return ""
-        try:
-            with open(json_file_path, "r", encoding="utf-8") as json_file:
-                data = json.load(json_file)
-                if operation_name not in data:
-                    log.info(
-                        f"Data for operation {operation_name} was not found in {json_file_path}"
-                    )
-                    return ""
-                return data[operation_name]
-        except:
-            log.warning(f"Error loading GPT results from path {json_file_path}.")
-            # Return empty string if any exception occurred or status is not OK
+        gpt_results = self._load_gpt_results(file_id)
+        if operation_name not in gpt_results:
+            log.info(f"Data for operation {operation_name} was not found for {file_id}")
             return ""
+        return gpt_results[operation_name]
+
+    def flush_gpt_results(self) -> None:
+        for record_store in self._record_stores.values():
+            record_store.commit()
+
+    def compact_results(self) -> None:
+        """
+        Move reviews and GPT results that are still stored in one JSON file per place into their record stores and
+        remove outdated versions of records from the record stores
+        """
+        suffix = "_gpt_results.json"
+        for directory in [self.REVIEWS, self.GPT_RESULTS]:
+            record_store = self._get_record_store(directory)
+            legacy_files = [
+                file_name
+                for file_name in os.listdir(directory)
+                if file_name.endswith(suffix)
+            ]
+            for file_name in legacy_files:
+                key = file_name[: -len(suffix)]
+                if key not in record_store:
+                    with open(
+                        os.path.join(directory, file_name), "r", encoding="utf-8"
+                    ) as json_file:
+                        record_store.put(key, json.load(json_file))
+            record_store.compact()
+            for file_name in legacy_files:
+                os.remove(os.path.join(directory, file_name))
+            log.info(
+                f"Compacted {directory}, moved {len(legacy_files)} files into the record store"
+            )
 
     def load_ml_model(self, model_name: str):
         model_file_path = os.path.join(self.ML_MODELS, model_name)
         try:
-            model = joblib.load(open(model_file_path, "rb"))
+            return self._load_joblib_file(model_file_path)
         except FileNotFoundError:
             log.error(f"Could not find model file {model_file_path}")
-            model = None
-
-        return model
+            return None
 
     def save_ml_model(self, model, model_name: str):
         if not os.path.exists(self.ML_MODELS):
@@ -237,7 +471,7 @@ class LocalRepository(Repository):
         if os.path.exists(model_file_path):
             log.warning(f"Overwriting model at {model_file_path}")
         try:
-            joblib.dump(model, open(model_file_path, "wb"))
+            self._save_joblib_file(model, model_file_path)
         except Exception as e:
             log.error(f"Could not save model at {model_file_path}! Error: {str(e)}")
 
@@ -246,12 +480,10 @@ class LocalRepository(Repository):
             self.CLASSIFICATION_REPORTS, "report_" + model_name
         )
         try:
-            report = joblib.load(open(report_file_path, "rb"))
+            return self._load_joblib_file(report_file_path)
         except FileNotFoundError:
             log.error(f"Could not find report file {report_file_path}")
-            report = None
-
-        return report
+            return None
 
     def save_classification_report(self, report, model_name: str):
         if not os.path.exists(self.CLASSIFICATION_REPORTS):
@@ -262,10 +494,34 @@ class LocalRepository(Repository):
         if os.path.exists(report_file_path):
             log.warning(f"Overwriting report at {report_file_path}")
         try:
-            joblib.dump(report, open(report_file_path, "wb"))
+            self._save_joblib_file(report, report_file_path)
         except Exception as e:
             log.error(f"Could not save report at {report_file_path}! Error: {str(e)}")
 
+    def _load_joblib_file(self, file_path: str):
+        """
+        Load a model or report through the model cache. The version of the file is its modification time and size.
+        :raises FileNotFoundError: If the file does not exist
+        """
+        stat = os.stat(file_path)
+        return self._load_cached(
+            file_path,
+            f"{stat.st_mtime_ns}-{stat.st_size}",
+            lambda: joblib.load(file_path, mmap_mode=self.MODEL_MMAP_MODE),
+        )
+
+    def _save_joblib_file(self, obj, file_path: str) -> None:
+        # models may be memory-mapped from the previous file, so it is replaced instead of being overwritten
+        tmp_path = file_path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as fp:
+                joblib.dump(obj, fp)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        self.model_cache.invalidate(file_path)
+
     def get_preprocessed_data_path(self, historical: bool = True):
         file_name = (
             "historical_preprocessed_data.csv"
@@ -273,10 +529,38 @@ class LocalRepository(Repository):
             else "preprocessed_data.csv"
         )
         file_path = os.path.join(self.DF_PREPROCESSED_INPUT, file_name)
-        return file_path
+        return self._get_data_path(file_path)
 
-    def load_preprocessed_data(self, historical: bool = True):
+    def load_preprocessed_data(
+        self, historical: bool = True, columns: list[str] = None
+    ):
+        file_path = self._resolve_data_path(self.get_preprocessed_data_path(historical))
         try:
-            return pd.read_csv(self.get_preprocessed_data_path(historical))
+            return read_dataframe(file_path, get_storage_format(file_path), columns)
         except FileNotFoundError:
             log.error("Error: Could not find input file for preprocessed data.")
+
+    def get_feature_store_path(self, historical: bool = True):
+        return os.path.join(
+            self.DF_PREPROCESSED_INPUT,
+            "historical_features" if historical else "features",
+        )
+
+    def save_preprocessed_data_chunks(self, chunks, historical: bool = True) -> int:
+        file_path = self.get_preprocessed_data_path(historical)
+        tmp_path = file_path + ".tmp"
+        writer = DataframeChunkWriter(tmp_path, get_storage_format(file_path))
+        rows = 0
+        try:
+            for chunk in chunks:
+                writer.write(chunk)
+                rows += len(chunk)
+            writer.close()
+            os.replace(tmp_path, file_path)
+        except BaseException:
+            writer.close()
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        log.info(f"Saved {rows} rows of preprocessed data to {file_path}")
+        return rows
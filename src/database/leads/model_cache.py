@@ -0,0 +1,61 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import threading
+from collections import OrderedDict
+
+from logger import get_logger
+
+log = get_logger()
+
+
+class ModelCache:
+    """
+    In-process LRU cache of loaded models and classification reports, keyed by name and version. The version
+    identifies the saved file, e.g. its ETag on S3, so a model that is saved again under the same name is loaded
+    again instead of being served from the cache. The cached objects are shared by all callers and must not be
+    modified, e.g. retrained in place.
+
+    The cache is thread-safe, so that a long-running process can load models from multiple threads.
+    """
+
+    def __init__(self, max_entries: int) -> None:
+        """
+        :param max_entries: Maximum number of cached objects, the least recently used objects are removed first
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, name: str, version: str):
+        """
+        :return: The cached object or None if it is not cached in this version
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None or entry[0] != version:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(name)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, name: str, version: str, obj) -> None:
+        with self._lock:
+            self._entries[name] = (version, obj)
+            self._entries.move_to_end(name)
+            while len(self._entries) > self.max_entries:
+                evicted, _ = self._entries.popitem(last=False)
+                log.debug(f"Evicted {evicted} from the model cache")
+
+    def invalidate(self, name: str) -> None:
+        """
+        Remove an object from the cache, e.g. because it was saved again
+        """
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,192 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import atexit
+import json
+import os
+from pathlib import Path
+
+from logger import get_logger
+
+log = get_logger()
+
+
+class JsonlRecordStore:
+    """
+    Key-value store for JSON serializable records, appending the records as JSON Lines to a small number of segment
+    files instead of writing one file per record. An in-memory index maps every key to the position of its latest
+    record, so reading a record costs a single seek and read.
+
+    Records are buffered and appended in batches of batch_size records with a single write. Buffered records are
+    written when commit() is called and when the process exits. Updating a record appends a new version, older
+    versions are removed by compact(), which is run automatically once most of the stored data is outdated.
+
+    The store is meant to be used by a single process at a time.
+    """
+
+    SEGMENT_PREFIX = "segment-"
+    SEGMENT_SUFFIX = ".jsonl"
+
+    def __init__(
+        self,
+        directory: str,
+        batch_size: int = 100,
+        max_segment_size: int = 64 * 2**20,
+    ) -> None:
+        """
+        :param directory: Directory of the segment files, created if it does not exist
+        :param batch_size: Number of buffered records that are written at once
+        :param max_segment_size: Size in bytes after which a new segment file is started
+        """
+        self.directory = directory
+        self.batch_size = batch_size
+        self.max_segment_size = max_segment_size
+        # key -> (segment number, offset, length) of the latest record
+        self._index = {}
+        self._pending = {}
+        self._live_size = 0
+        self._total_size = 0
+        self._segments = []
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        self._load_index()
+        atexit.register(self.commit)
+
+    def _get_segment_path(self, segment: int) -> str:
+        return os.path.join(
+            self.directory, f"{self.SEGMENT_PREFIX}{segment:05d}{self.SEGMENT_SUFFIX}"
+        )
+
+    def _load_index(self) -> None:
+        self._segments = sorted(
+            int(file_name[len(self.SEGMENT_PREFIX) : -len(self.SEGMENT_SUFFIX)])
+            for file_name in os.listdir(self.directory)
+            if file_name.startswith(self.SEGMENT_PREFIX)
+            and file_name.endswith(self.SEGMENT_SUFFIX)
+        )
+        for segment in self._segments:
+            with open(self._get_segment_path(segment), "rb") as fp:
+                offset = 0
+                for line in fp:
+                    try:
+                        key = json.loads(line)["key"]
+                    except (ValueError, KeyError):
+                        # a record that was only partially written when the process was killed
+                        log.warning(
+                            f"Skipping corrupted record in {self._get_segment_path(segment)}"
+                        )
+                    else:
+                        self._add_to_index(key, (segment, offset, len(line)))
+                    offset += len(line)
+                    self._total_size += len(line)
+
+    def _add_to_index(self, key: str, position: tuple) -> None:
+        if key in self._index:
+            self._live_size -= self._index[key][2]
+        self._index[key] = position
+        self._live_size += position[2]
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._pending or key in self._index
+
+    def keys(self) -> list[str]:
+        return list(self._index.keys() | self._pending.keys())
+
+    def get(self, key: str, default=None):
+        """
+        Get the latest record of a key
+        """
+        if key in self._pending:
+            return self._pending[key]
+        if key not in self._index:
+            return default
+        segment, offset, length = self._index[key]
+        with open(self._get_segment_path(segment), "rb") as fp:
+            fp.seek(offset)
+            return json.loads(fp.read(length))["value"]
+
+    def put(self, key: str, value) -> None:
+        """
+        Add or replace the record of a key. The record is written with the next batch.
+        """
+        self._pending[key] = value
+        if len(self._pending) >= self.batch_size:
+            self.commit()
+
+    def commit(self) -> None:
+        """
+        Append all buffered records to the current segment with a single write
+        """
+        if len(self._pending) == 0:
+            return
+        lines = [
+            (
+                json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n"
+            ).encode("utf-8")
+            for key, value in self._pending.items()
+        ]
+        if len(self._segments) == 0:
+            self._segments.append(0)
+        segment_path = self._get_segment_path(self._segments[-1])
+        if (
+            os.path.exists(segment_path)
+            and os.path.getsize(segment_path) >= self.max_segment_size
+        ):
+            self._segments.append(self._segments[-1] + 1)
+            segment_path = self._get_segment_path(self._segments[-1])
+
+        with open(segment_path, "ab") as fp:
+            offset = fp.tell()
+            fp.write(b"".join(lines))
+        for key, line in zip(self._pending, lines):
+            self._add_to_index(key, (self._segments[-1], offset, len(line)))
+            offset += len(line)
+            self._total_size += len(line)
+        self._pending = {}
+
+        # most of the stored data consists of outdated versions of records
+        if self._total_size > 2 * self._live_size + self.max_segment_size:
+            self.compact()
+
+    def compact(self) -> None:
+        """
+        Copy the latest record of every key to new segments and delete the old segments
+        """
+        self.commit()
+        old_segments = self._segments
+        old_index = self._index
+        self._index = {}
+        self._live_size = 0
+        self._total_size = 0
+        self._segments = [old_segments[-1] + 1 if old_segments else 0]
+
+        reader = None
+        reader_segment = None
+        writer = open(self._get_segment_path(self._segments[-1]), "ab")
+        try:
+            # copy the records in the order they are stored, so the old segments are read sequentially
+            for key, (segment, offset, length) in sorted(
+                old_index.items(), key=lambda item: item[1]
+            ):
+                if segment != reader_segment:
+                    if reader is not None:
+                        reader.close()
+                    reader = open(self._get_segment_path(segment), "rb")
+                    reader_segment = segment
+                reader.seek(offset)
+                line = reader.read(length)
+
+                if writer.tell() >= self.max_segment_size:
+                    writer.close()
+                    self._segments.append(self._segments[-1] + 1)
+                    writer = open(self._get_segment_path(self._segments[-1]), "ab")
+                self._add_to_index(key, (self._segments[-1], writer.tell(), length))
+                writer.write(line)
+                self._total_size += length
+        finally:
+            writer.close()
+            if reader is not None:
+                reader.close()
+
+        for segment in old_segments:
+            os.remove(self._get_segment_path(segment))
+        log.info(f"Compacted {len(old_segments)} segments in {self.directory}")
@@ -1,12 +1,336 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Sophie Heasman <sophieheasmann@gmail.com>
 
+import hashlib
+import zlib
 from abc import ABC, abstractmethod
+from collections import defaultdict
 from datetime import datetime
+from functools import cache
+from typing import TYPE_CHECKING
+
+import numpy as np
+import pandas as pd
+
+from logger import get_logger
+
+from .feature_store import FeatureStore
+from .model_cache import ModelCache
+
+# pyarrow is only needed for Parquet files and the review store, it is imported by the functions using it, so that
+# importing the repositories stays fast
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+log = get_logger()
+
+STORAGE_FORMATS = ["csv", "parquet"]
+PARQUET_COMPRESSION = "zstd"
+# Columns holding lists of strings. Parquet files store them as list arrays, CSV files as the list items joined by
+# LIST_DELIMITER, so that they can be split without evaluating Python source.
+LIST_COLUMNS = ["google_places_detailed_type"]
+LIST_DELIMITER = "|"
+
+
+def get_storage_format(path) -> str:
+    """
+    Get the storage format of a data file from its file extension
+    """
+    return "parquet" if str(path).endswith(".parquet") else "csv"
+
+
+def encode_list_column(column: pd.Series) -> pd.Series:
+    """
+    Encode a column of lists for a CSV file. Empty lists are stored as missing values.
+    """
+    return column.map(
+        lambda value: (LIST_DELIMITER.join(value) or None)
+        if isinstance(value, (list, tuple, np.ndarray))
+        else value
+    )
+
+
+def decode_list_column(column: pd.Series) -> pd.Series:
+    """
+    Decode a column of lists read from a CSV file. Values that are lists already are kept. Values in the legacy
+    format, the string representation of a Python list, are parsed as well but should be converted once with
+    scripts/convert_list_columns.py.
+    :return: Column of numpy arrays, missing values are kept
+    """
+    is_string = column.map(type) == str
+    if not is_string.any():
+        return column
+    strings = column[is_string]
+    legacy = strings.str.startswith("[")
+    if legacy.any():
+        log.warning(
+            f"Column {column.name} contains lists in the legacy format, convert the file with scripts/convert_list_columns.py"
+        )
+        strings = strings.mask(
+            legacy,
+            strings[legacy]
+            .str.strip("[]")
+            .str.replace(r"['\"]", "", regex=True)
+            .str.replace(", ", LIST_DELIMITER, regex=False),
+        )
+    strings = strings.where(strings != "")
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    decoded = pc.split_pattern(
+        pa.array(strings, type=pa.string(), from_pandas=True), pattern=LIST_DELIMITER
+    ).to_pandas()
+    decoded.index = strings.index
+    column = column.astype(object)
+    column[is_string] = decoded
+    return column
+
+
+def encode_list_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Encode the LIST_COLUMNS of a dataframe for a CSV file
+    :return: The encoded dataframe, df itself if it has no list columns
+    """
+    list_columns = [col for col in LIST_COLUMNS if col in df]
+    if len(list_columns) == 0:
+        return df
+    return df.assign(**{col: encode_list_column(df[col]) for col in list_columns})
+
+
+def decode_list_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Decode the LIST_COLUMNS of a dataframe read from a CSV file in place
+    :return: df
+    """
+    for col in LIST_COLUMNS:
+        if col in df:
+            df[col] = decode_list_column(df[col])
+    return df
+
+
+def read_dataframe(source, storage_format: str = "csv", columns: list[str] = None):
+    """
+    Read a dataframe from a path or a binary file object
+    :param source: Path or binary file object to read from
+    :param storage_format: One of STORAGE_FORMATS
+    :param columns: Only read these columns (None = all columns), columns that do not exist are ignored
+    :return: The dataframe
+    """
+    if storage_format == "parquet":
+        import pyarrow.parquet as pq
+
+        if columns is not None:
+            existing_columns = pq.read_schema(source).names
+            columns = [column for column in columns if column in existing_columns]
+            if hasattr(source, "seek"):
+                source.seek(0)
+        return pq.read_table(source, columns=columns, pre_buffer=False).to_pandas()
+    if columns is not None:
+        return decode_list_columns(
+            pd.read_csv(source, usecols=lambda column: column in columns)
+        )
+    return decode_list_columns(pd.read_csv(source))
+
+
+def iter_dataframe_chunks(
+    source, storage_format: str, chunk_size: int, columns: list[str] = None
+):
+    """
+    Read a dataframe from a path or a binary file object in chunks of chunk_size rows
+    :param columns: Only read these columns (None = all columns), columns that do not exist are ignored
+    """
+    if storage_format == "parquet":
+        import pyarrow.parquet as pq
+
+        parquet_file = pq.ParquetFile(source)
+        if columns is not None:
+            columns = [
+                column
+                for column in columns
+                if column in parquet_file.schema_arrow.names
+            ]
+        for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+            yield batch.to_pandas()
+        return
+    usecols = None if columns is None else lambda column: column in columns
+    with pd.read_csv(source, chunksize=chunk_size, usecols=usecols) as reader:
+        for chunk in reader:
+            yield decode_list_columns(chunk)
+
+
+def to_arrow_table(df, schema: "pa.Schema" = None) -> "pa.Table":
+    """
+    Convert a dataframe to an Arrow table. Object columns holding values of mixed types, which cannot be represented
+    by Arrow, are converted to strings.
+    """
+    import pyarrow as pa
+
+    try:
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        df = df.copy()
+        for column in df.columns[df.dtypes == object]:
+            try:
+                pa.array(df[column], from_pandas=True)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+                df[column] = df[column].map(
+                    lambda value: value if value is None else str(value)
+                )
+        return pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+
+
+def write_dataframe(df, target, storage_format: str = "csv") -> None:
+    """
+    Write a dataframe to a path or a binary file object. Parquet files are written with dictionary encoding and
+    compression.
+    :param df: Dataframe to write
+    :param target: Path or binary file object to write to
+    :param storage_format: One of STORAGE_FORMATS
+    """
+    if storage_format == "parquet":
+        import pyarrow.parquet as pq
+
+        pq.write_table(
+            to_arrow_table(df),
+            target,
+            compression=PARQUET_COMPRESSION,
+            use_dictionary=True,
+        )
+    else:
+        encode_list_columns(df).to_csv(target, index=False)
+
+
+# Reviews of all places are stored in REVIEW_PARTITIONS Parquet files, one row per review, partitioned by place_id
+REVIEW_PARTITIONS = 16
+
+
+@cache
+def get_review_schema() -> "pa.Schema":
+    """
+    Get the schema of the review store
+    """
+    import pyarrow as pa
+
+    return pa.schema(
+        [
+            ("place_id", pa.string()),
+            # position of the review in the list of reviews of the place, -1 marks a place without reviews
+            ("review_index", pa.int32()),
+            ("author_name", pa.string()),
+            ("author_url", pa.string()),
+            ("language", pa.string()),
+            ("original_language", pa.string()),
+            ("profile_photo_url", pa.string()),
+            ("rating", pa.float64()),
+            ("relative_time_description", pa.string()),
+            ("text", pa.string()),
+            ("time", pa.int64()),
+            ("translated", pa.bool_()),
+        ]
+    )
+
+
+def get_review_partition(place_id: str) -> int:
+    """
+    Get the partition of the review store containing the reviews of a place
+    """
+    return zlib.crc32(place_id.encode("utf-8")) % REVIEW_PARTITIONS
+
+
+def reviews_to_table(reviews_by_place: dict) -> "pa.Table":
+    """
+    Convert reviews to a table of the review store. Fields of a review that are not part of the review schema are
+    dropped.
+    :param reviews_by_place: Lists of reviews by place_id
+    """
+    import pyarrow as pa
+
+    schema = get_review_schema()
+    review_fields = schema.names[2:]
+    rows = []
+    for place_id, reviews in reviews_by_place.items():
+        if not reviews:
+            rows.append({"place_id": place_id, "review_index": -1})
+        for idx, review in enumerate(reviews or []):
+            rows.append(
+                {"place_id": place_id, "review_index": idx}
+                | {field: review.get(field) for field in review_fields}
+            )
+    return pa.Table.from_pylist(rows, schema=schema)
+
+
+def table_to_reviews(table: "pa.Table") -> dict:
+    """
+    Convert a table of the review store back to lists of reviews by place_id
+    """
+    reviews_by_place = {}
+    table = table.sort_by([("place_id", "ascending"), ("review_index", "ascending")])
+    for row in table.to_pylist():
+        reviews = reviews_by_place.setdefault(row.pop("place_id"), [])
+        if row.pop("review_index") >= 0:
+            reviews.append(row)
+    return reviews_by_place
+
+
+class DataframeChunkWriter:
+    """
+    Write a dataframe chunk by chunk to a single CSV or Parquet file, given as path or binary file object
+    """
+
+    def __init__(self, target, storage_format: str = "csv") -> None:
+        self.target = target
+        self.storage_format = storage_format
+        self._first_chunk = True
+        self._parquet_writer = None
+
+    def write(self, df) -> None:
+        if self.storage_format == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            if self._parquet_writer is None:
+                # columns without any value in the first chunk are stored as strings
+                schema = to_arrow_table(df).schema
+                for idx, field in enumerate(schema):
+                    if pa.types.is_null(field.type):
+                        schema = schema.set(idx, field.with_type(pa.string()))
+                self._parquet_writer = pq.ParquetWriter(
+                    self.target,
+                    schema,
+                    compression=PARQUET_COMPRESSION,
+                    use_dictionary=True,
+                )
+            self._parquet_writer.write_table(
+                to_arrow_table(df, schema=self._parquet_writer.schema)
+            )
+        else:
+            # file objects are opened in binary mode
+            binary = "" if isinstance(self.target, str) else "b"
+            encode_list_columns(df).to_csv(
+                self.target,
+                mode=("w" if self._first_chunk else "a") + binary,
+                header=self._first_chunk,
+                index=False,
+            )
+        self._first_chunk = False
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+            self._parquet_writer = None
 
 
 class Repository(ABC):
     DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+    # Number of most recent pipeline runs whose snapshots are kept
+    SNAPSHOT_RETENTION_RUNS = 10
+    storage_format = "csv"
+    _chunk_writer = None
+
+    # Number of loaded models and classification reports that are kept in memory
+    MODEL_CACHE_SIZE = 16
+    # Models are loaded with their NumPy arrays memory-mapped from a local file, if there is one (None = read them)
+    MODEL_MMAP_MODE = "r"
 
     # Database paths for dataframe and reviews have to be set
     @property
@@ -57,27 +381,72 @@ class Repository(ABC):
         """
         pass
 
-    def __init__(self):
+    def __init__(self, storage_format: str = "csv"):
         """
-        Initialise DAL, and saves the input df as an attribute
-        :param download_df: Specify if you want to download the dataframe in this instance (not needed when handling reviews)
+        Initialise DAL. The input df is downloaded lazily on the first call to get_dataframe(), so that handling
+        reviews or streaming the input in chunks does not require loading the whole dataset into memory.
+        :param storage_format: Format of the lead data files written by this repository, one of STORAGE_FORMATS
         """
+        if storage_format not in STORAGE_FORMATS:
+            log.error(
+                f"Storage format has to be one of {STORAGE_FORMATS}, got '{storage_format}'"
+            )
+            raise ValueError
+        self.storage_format = storage_format
         self.df = None
-        self._download()
+        self._chunk_writer = None
+        self.model_cache = ModelCache(self.MODEL_CACHE_SIZE)
 
     def get_dataframe(self):
+        if self.df is None:
+            self._download()
         return self.df
 
     def set_dataframe(self, df):
         self.df = df
 
+    def is_production_output(self) -> bool:
+        """
+        Check whether the enriched data is written to the production dataset, which must not be limited to a subset
+        of the leads
+        """
+        return False
+
     def get_input_path(self):
-        return self.DF_INPUT
+        return self._resolve_data_path(self.DF_INPUT)
 
     def get_enriched_data_path(self, historical=False):
         if historical:
-            return self.DF_HISTORICAL_OUTPUT
-        return self.DF_OUTPUT
+            return self._get_data_path(self.DF_HISTORICAL_OUTPUT)
+        return self._get_data_path(self.DF_OUTPUT)
+
+    def _get_data_path(self, path: str) -> str:
+        """
+        Get the path of a lead data file in the storage format of this repository
+        """
+        if self.storage_format == "parquet" and path.endswith(".csv"):
+            return path[: -len(".csv")] + ".parquet"
+        return path
+
+    def _resolve_data_path(self, path: str) -> str:
+        """
+        Get the path of a lead data file to read. If the file does not exist in the storage format of this
+        repository yet, the CSV file is read instead, so that the storage format can be switched without converting
+        existing data first.
+        """
+        data_path = self._get_data_path(path)
+        if data_path.endswith(".parquet") and not self._data_exists(data_path):
+            csv_path = data_path[: -len(".parquet")] + ".csv"
+            if self._data_exists(csv_path):
+                return csv_path
+        return data_path
+
+    @abstractmethod
+    def _data_exists(self, path: str) -> bool:
+        """
+        Check whether a data file exists at the given path
+        """
+        pass
 
     @abstractmethod
     def _download(self):
@@ -86,6 +455,40 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    def iter_dataframe(self, chunk_size: int):
+        """
+        Read the input dataframe from the specified DF path in chunks without loading it into memory as a whole
+        :param chunk_size: Number of leads per chunk
+        :return: Iterator over dataframes of at most chunk_size rows
+        """
+        pass
+
+    @abstractmethod
+    def load_enriched_dataframe(
+        self, historical: bool = False, columns: list[str] = None
+    ):
+        """
+        Load the enriched data of the previous pipeline run from the output location
+        :param historical: Load the historical enriched data instead
+        :param columns: Only load these columns (None = all columns)
+        :return: The enriched dataframe or None if there is no enriched data yet
+        """
+        pass
+
+    @abstractmethod
+    def iter_enriched_dataframe(
+        self, chunk_size: int, historical: bool = False, columns: list[str] = None
+    ):
+        """
+        Read the enriched data of the previous pipeline run in chunks without loading it into memory as a whole
+        :param chunk_size: Number of leads per chunk
+        :param historical: Read the historical enriched data instead
+        :param columns: Only read these columns (None = all columns)
+        :return: Iterator over dataframes of at most chunk_size rows, empty if there is no enriched data yet
+        """
+        pass
+
     @abstractmethod
     def save_dataframe(self):
         """
@@ -93,6 +496,29 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    def save_dataframe_chunk(self, df, first_chunk: bool = False):
+        """
+        Append a chunk of the enriched dataframe to the chosen output location
+        :param df: Chunk of enriched data
+        :param first_chunk: Whether this is the first chunk of a run, which replaces any existing output
+        """
+        pass
+
+    @abstractmethod
+    def finish_dataframe_chunks(self):
+        """
+        Finalise the output after all chunks have been saved via save_dataframe_chunk()
+        """
+        pass
+
+    @abstractmethod
+    def abort_dataframe_chunks(self):
+        """
+        Discard the chunks saved via save_dataframe_chunk(), e.g. after the run failed, and keep the previous output
+        """
+        pass
+
     @abstractmethod
     def save_prediction(self, df):
         """
@@ -100,6 +526,16 @@ class Repository(ABC):
         """
         pass
 
+    @abstractmethod
+    def save_prediction_chunks(self, chunks) -> int:
+        """
+        Save predictions chunk by chunk to the same location as save_prediction, without holding all of them in
+        memory. The previous predictions are only replaced once all chunks were written.
+        :param chunks: Iterator over dataframes of predictions
+        :return: Number of saved rows
+        """
+        pass
+
     @abstractmethod
     def insert_data(self, data):
         """
@@ -111,12 +547,53 @@ class Repository(ABC):
     @abstractmethod
     def create_snapshot(self, df, prefix, name):
         """
-        Snapshot the current state of the dataframe
+        Snapshot the current state of the dataframe in a binary format
         :param df: Data to create a snapshot of
         :param prefix: Prefix for a group of snapshots belonging to a singe pipeline run, used to identify snapshots
         when cleaning up after a pipeline run
         :param name: Name of the snapshot
-        :return: None
+        :return: SHA-256 checksum of the snapshot
+        """
+
+    @abstractmethod
+    def load_snapshot(self, prefix, name, checksum=None):
+        """
+        Load a snapshot created by create_snapshot()
+        :param prefix: Prefix of the pipeline run the snapshot belongs to
+        :param name: Name of the snapshot
+        :param checksum: Expected SHA-256 checksum of the snapshot, the snapshot is not loaded if it does not match
+        :return: The snapshotted dataframe or None if it does not exist or is corrupted
+        """
+
+    @abstractmethod
+    def save_snapshot_manifest(self, manifest: dict, prefix):
+        """
+        Save the manifest listing the snapshots and their checksums of a pipeline run
+        :param manifest: JSON serializable manifest
+        :param prefix: Prefix of the pipeline run
+        """
+
+    @abstractmethod
+    def load_snapshot_manifest(self, prefix) -> dict:
+        """
+        Load the manifest of a pipeline run
+        :param prefix: Prefix of the pipeline run
+        :return: The manifest or None if it does not exist
+        """
+
+    def get_snapshot_dir_name(self, prefix) -> str:
+        """
+        Get the name of the directory the snapshots of a pipeline run are stored in, it identifies the run when
+        resuming it
+        :param prefix: Prefix of the pipeline run
+        """
+        return prefix
+
+    @abstractmethod
+    def get_snapshot_runs(self) -> list[str]:
+        """
+        Get the prefixes of all pipeline runs that have snapshots stored
+        :return: List of prefixes sorted from oldest to newest run
         """
 
     @abstractmethod
@@ -126,11 +603,32 @@ class Repository(ABC):
         :param prefix: Prefix of the current pipeline run used to identify all snapshots to delete
         """
 
+    def prune_snapshots(self, keep_runs: int = None):
+        """
+        Delete the snapshots of all but the most recent pipeline runs
+        :param keep_runs: Number of runs to keep, defaults to SNAPSHOT_RETENTION_RUNS
+        """
+        keep_runs = self.SNAPSHOT_RETENTION_RUNS if keep_runs is None else keep_runs
+        runs = self.get_snapshot_runs()
+        for prefix in runs[: max(len(runs) - keep_runs, 0)]:
+            log.info(f"Pruning snapshots of pipeline run {prefix}")
+            self.clean_snapshots(prefix)
+
+    @abstractmethod
+    def save_run_report(self, report: dict, prefix):
+        """
+        Save the report of a pipeline run next to its snapshots
+        :param report: Report of the run as a JSON serializable dict
+        :param prefix: Prefix of the pipeline run, as used for its snapshots
+        """
+        pass
+
     @abstractmethod
     def save_review(self, review, place_id, force_refresh=False):
         """
         Upload review to specified review path
         :param review: json contents of the review to be uploaded
+        :param force_refresh: Replace the reviews that are already saved for the place
         """
         pass
 
@@ -142,6 +640,119 @@ class Repository(ABC):
         """
         pass
 
+    def fetch_reviews(self, place_ids, fallback: bool = True) -> dict:
+        """
+        Fetch the reviews of multiple places at once from the consolidated review store, reading every partition of
+        the store at most once
+        :param place_ids: Place ids to fetch the reviews for, missing values are ignored
+        :param fallback: Fetch the reviews of places that are not part of the review store yet with fetch_review
+        :return: Lists of reviews by place_id
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        place_ids = {place_id for place_id in place_ids if isinstance(place_id, str)}
+        partitions = defaultdict(list)
+        for place_id in place_ids:
+            partitions[get_review_partition(place_id)].append(place_id)
+
+        reviews_by_place = {}
+        for partition, partition_place_ids in partitions.items():
+            table = self._read_review_partition(partition)
+            if table is None:
+                continue
+            table = table.filter(
+                pc.is_in(table["place_id"], value_set=pa.array(partition_place_ids))
+            )
+            reviews_by_place.update(table_to_reviews(table))
+
+        if fallback:
+            for place_id in place_ids - reviews_by_place.keys():
+                reviews_by_place[place_id] = self.fetch_review(place_id)
+        return reviews_by_place
+
+    def compact_reviews(self, place_ids=None) -> int:
+        """
+        Fold the reviews saved per place by save_review into the consolidated review store. Every partition with new
+        or updated places is rewritten once.
+        :param place_ids: Places whose reviews were saved again, e.g. by a pipeline run. Their stored reviews are
+        replaced and only their partitions are read. By default, the reviews of all places saved by save_review that
+        are not part of the store yet are added.
+        :return: Number of places added to or updated in the review store
+        """
+        import pyarrow as pa
+        import pyarrow.compute as pc
+
+        if place_ids is None:
+            candidate_place_ids = self._list_review_place_ids()
+            partitions = range(REVIEW_PARTITIONS)
+            updated_place_ids = set()
+        else:
+            candidate_place_ids = set(place_ids)
+            partitions = {
+                get_review_partition(place_id) for place_id in candidate_place_ids
+            }
+            updated_place_ids = candidate_place_ids
+
+        new_place_ids = defaultdict(list)
+        stored_place_ids = set()
+        for partition in partitions:
+            table = self._read_review_partition(partition, columns=["place_id"])
+            if table is not None:
+                stored_place_ids.update(table["place_id"].to_pylist())
+        for place_id in candidate_place_ids:
+            if place_id in updated_place_ids or place_id not in stored_place_ids:
+                new_place_ids[get_review_partition(place_id)].append(place_id)
+
+        for partition, place_ids in new_place_ids.items():
+            table = reviews_to_table(
+                {place_id: self.fetch_review(place_id) for place_id in place_ids}
+            )
+            stored_table = self._read_review_partition(partition)
+            if stored_table is not None:
+                # the previous reviews of updated places are replaced
+                stored_table = stored_table.filter(
+                    pc.invert(
+                        pc.is_in(
+                            stored_table["place_id"], value_set=pa.array(place_ids)
+                        )
+                    )
+                )
+                table = pa.concat_tables([stored_table, table])
+            self._write_review_partition(partition, table)
+
+        num_places = sum(len(place_ids) for place_ids in new_place_ids.values())
+        if num_places > 0:
+            log.info(
+                f"Added or updated reviews of {num_places} places in the review store"
+            )
+        return num_places
+
+    @abstractmethod
+    def _list_review_place_ids(self) -> list[str]:
+        """
+        List the place ids of all reviews saved per place by save_review
+        """
+        pass
+
+    @abstractmethod
+    def _read_review_partition(
+        self, partition: int, columns: list[str] = None
+    ) -> "pa.Table":
+        """
+        Read a partition of the review store
+        :param columns: Only read these columns (None = all columns)
+        :return: The partition or None if it does not exist
+        """
+        pass
+
+    @abstractmethod
+    def _write_review_partition(self, partition: int, table: "pa.Table") -> None:
+        """
+        Replace a partition of the review store
+        """
+        pass
+
     @abstractmethod
     def save_lookup_table(self, lookup_table: dict, step_name: str) -> None:
         """
@@ -163,6 +774,31 @@ class Repository(ABC):
         """
         pass
 
+    def flush_gpt_results(self) -> None:
+        """
+        Write results that are buffered by save_gpt_result and save_review
+        """
+        pass
+
+    def compact_results(self) -> None:
+        """
+        Reorganize the stored reviews and GPT results for faster access, e.g. by removing outdated versions
+        """
+        pass
+
+    def get_request_counts(self) -> dict:
+        """
+        Get the number of requests made to the storage backend and cache hits that saved a request, by type
+        """
+        return {}
+
+    def get_operation_latencies(self) -> dict:
+        """
+        Get the latencies of the requests made to the storage backend
+        :return: Number of calls, total and maximum latency in seconds by name of the operation
+        """
+        return {}
+
     @abstractmethod
     def load_lookup_table(self, step_name: str) -> dict:
         """
@@ -184,6 +820,15 @@ class Repository(ABC):
         """
         pass
 
+    def _compute_checksum(self, fileobj, block_size=2**20):
+        """
+        Compute the SHA-256 checksum of a binary file object, starting from its current position
+        """
+        sha256 = hashlib.sha256()
+        for block in iter(lambda: fileobj.read(block_size), b""):
+            sha256.update(block)
+        return sha256.hexdigest()
+
     def _get_current_time_as_string(self):
         """
         Get the current time as a string
@@ -196,10 +841,25 @@ class Repository(ABC):
         """
         return datetime.strptime(time, self.DATETIME_FORMAT)
 
+    def _load_cached(self, name: str, version: str, load):
+        """
+        Get an object from the model cache or load it
+        :param name: Name of the object in the cache, e.g. the file name of a model
+        :param version: Version of the saved object, e.g. its ETag
+        :param load: Function loading the object if it is not cached
+        """
+        obj = self.model_cache.get(name, version)
+        if obj is None:
+            obj = load()
+            self.model_cache.put(name, version, obj)
+        return obj
+
     @abstractmethod
     def load_ml_model(self, model_name: str):
         """
-        Load a ML model from a file with a given name
+        Load a ML model from a file with a given name. Loaded models are kept in the model cache, as long as the
+        file does not change they are returned without loading them again. The returned model is shared and must
+        not be modified.
 
         Args:
             model_name (str): File name
@@ -220,7 +880,7 @@ class Repository(ABC):
     @abstractmethod
     def load_classification_report(self, model_name: str):
         """
-        Load a given classification report to a file with a given name
+        Load a given classification report to a file with a given name, cached like the models
 
         Args:
             model_name (str): Model name that created the report
@@ -246,8 +906,51 @@ class Repository(ABC):
         pass
 
     @abstractmethod
-    def load_preprocessed_data(self, historical: bool = True):
+    def load_preprocessed_data(
+        self, historical: bool = True, columns: list[str] = None
+    ):
         """
         Load the preprocessed data from the given file
+        :param columns: Only load these columns (None = all columns)
         """
         pass
+
+    @abstractmethod
+    def save_preprocessed_data_chunks(self, chunks, historical: bool = True) -> int:
+        """
+        Save preprocessed data chunk by chunk, without holding all of it in memory. The previous preprocessed data
+        is only replaced once all chunks were written.
+        :param chunks: Iterator over dataframes of preprocessed data
+        :param historical: Save the preprocessed historical data instead of the preprocessed lead data
+        :return: Number of saved rows
+        """
+        pass
+
+    @abstractmethod
+    def get_feature_store_path(self, historical: bool = True):
+        """
+        Get the local directory of the FeatureStore, which is written next to the preprocessed data
+        :return: The directory or None if the repository has no feature store
+        """
+        pass
+
+    def load_feature_store(self, historical: bool = True):
+        """
+        Load the memory-mapped features of the preprocessed data
+        :return: The FeatureStore or None if there is none or the preprocessed data file changed since it was written
+        """
+        directory = self.get_feature_store_path(historical)
+        if directory is None or not FeatureStore.exists(directory):
+            log.info("No feature store found, preprocess the data first")
+            return None
+        feature_store = FeatureStore(directory)
+        source_path = self._resolve_data_path(
+            self.get_preprocessed_data_path(historical)
+        )
+        if feature_store.is_stale(source_path):
+            log.warning(
+                f"The feature store {directory} is outdated, {source_path} was written after it. Loading the "
+                f"preprocessed data instead, preprocess the data again to update the feature store."
+            )
+            return None
+        return feature_store
@@ -0,0 +1,185 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import botocore.exceptions
+
+from logger import get_logger
+
+log = get_logger()
+
+
+class S3DiskCache:
+    """
+    Read-through and write-through disk cache for S3 objects, keyed by bucket and key. Cached objects are validated
+    with a conditional GET (If-None-Match) against their ETag, so an unchanged object costs a request without
+    transferring its content. The size of the cache is limited by evicting the least recently used objects.
+
+    The cache can be shared by concurrent processes: Every version of an object is stored in its own file, named by
+    the hash of bucket, key and ETag, and a small pointer file maps the object to its latest version. All files are
+    written to temporary files first and then atomically renamed, so readers never see partially written files.
+    """
+
+    DOWNLOAD_BLOCK_SIZE = 2**20
+
+    def __init__(self, directory: str, max_size: int) -> None:
+        """
+        :param directory: Directory of the cache, created if it does not exist
+        :param max_size: Maximum size of the cached objects in bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        # estimate of the cache size, other processes may change the cache concurrently
+        self._size = self._get_cache_size()
+
+    def _get_entry_name(self, bucket: str, key: str) -> str:
+        return hashlib.sha256(f"{bucket}/{key}".encode("utf-8")).hexdigest()
+
+    def _get_data_path(self, entry_name: str, etag: str) -> str:
+        etag_hash = hashlib.sha256(etag.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.directory, f"{entry_name}-{etag_hash}.data")
+
+    def _get_cached_etag(self, entry_name: str) -> str:
+        try:
+            with open(os.path.join(self.directory, f"{entry_name}.etag")) as fp:
+                return fp.read()
+        except FileNotFoundError:
+            return None
+
+    def _atomic_write(self, path: str, write) -> int:
+        """
+        Write a file by writing a temporary file in the cache directory and renaming it
+        :param write: Function writing the content to the given binary file object
+        :return: Size of the written file
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                write(fp)
+                size = fp.tell()
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        return size
+
+    def _store(self, entry_name: str, etag: str, write) -> str:
+        """
+        Store a new version of an object and point the object to it
+        :return: Path of the cached data
+        """
+        data_path = self._get_data_path(entry_name, etag)
+        old_etag = self._get_cached_etag(entry_name)
+        self._size += self._atomic_write(data_path, write)
+        self._atomic_write(
+            os.path.join(self.directory, f"{entry_name}.etag"),
+            lambda fp: fp.write(etag.encode("utf-8")),
+        )
+        if old_etag is not None and old_etag != etag:
+            self._remove(self._get_data_path(entry_name, old_etag))
+        if self._size > self.max_size:
+            self._evict()
+        return data_path
+
+    def _remove(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            self._size -= size
+        except FileNotFoundError:
+            # removed by another process
+            pass
+
+    def _get_cache_size(self) -> int:
+        return sum(
+            entry.stat().st_size
+            for entry in os.scandir(self.directory)
+            if entry.name.endswith(".data")
+        )
+
+    def _evict(self) -> None:
+        """
+        Remove the least recently used objects until the cache is filled to 90% of its maximum size
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".data"):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        self._size = sum(size for _, size, _ in entries)
+
+        for _, _, path in sorted(entries):
+            if self._size <= 0.9 * self.max_size:
+                break
+            self._remove(path)
+        log.debug(f"Evicted S3 cache to {self._size / 2**20:.1f} MiB")
+
+    def get_path(self, client, bucket: str, key: str) -> str:
+        """
+        Get the path of the cached content of an S3 object, downloading it if it is not cached or changed on S3
+        :param client: boto3 S3 client
+        :return: Path of the cached content
+        :raises botocore.exceptions.ClientError: If the object cannot be read from S3, e.g. because it does not exist
+        """
+        entry_name = self._get_entry_name(bucket, key)
+        etag = self._get_cached_etag(entry_name)
+        request = {"Bucket": bucket, "Key": key}
+        if etag is not None and os.path.exists(self._get_data_path(entry_name, etag)):
+            request["IfNoneMatch"] = etag
+
+        try:
+            response = client.get_object(**request)
+        except botocore.exceptions.ClientError as e:
+            if "IfNoneMatch" in request and e.response.get("Error", {}).get("Code") in (
+                "304",
+                "NotModified",
+            ):
+                data_path = self._get_data_path(entry_name, etag)
+                try:
+                    # the modification time of the data determines the eviction order
+                    os.utime(data_path)
+                    return data_path
+                except FileNotFoundError:
+                    # evicted by another process in the meantime
+                    return self.get_path(client, bucket, key)
+            raise
+
+        def download(fp):
+            body = response["Body"]
+            for block in iter(lambda: body.read(self.DOWNLOAD_BLOCK_SIZE), b""):
+                fp.write(block)
+
+        return self._store(entry_name, response["ETag"], download)
+
+    def open(self, client, bucket: str, key: str):
+        """
+        Open the cached content of an S3 object for reading, see get_path()
+        :return: Binary file object
+        """
+        try:
+            return open(self.get_path(client, bucket, key), "rb")
+        except FileNotFoundError:
+            # evicted by another process before it was opened
+            return open(self.get_path(client, bucket, key), "rb")
+
+    def read(self, client, bucket: str, key: str) -> bytes:
+        """
+        Read the cached content of an S3 object, see get_path()
+        """
+        with self.open(client, bucket, key) as fp:
+            return fp.read()
+
+    def put(self, bucket: str, key: str, etag: str, data: bytes) -> None:
+        """
+        Store the content of an object that was just uploaded to S3
+        :param etag: ETag of the uploaded object, as returned by put_object
+        """
+        self._store(self._get_entry_name(bucket, key), etag, lambda fp: fp.write(data))
@@ -1,29 +1,145 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Sophie Heasman <sophieheasmann@gmail.com>
 
+import atexit
 import csv
 import hashlib
+import io
 import json
+import os
+import shutil
 import tempfile
-from datetime import datetime
+import threading
+import time
+from collections import Counter, OrderedDict
 from io import StringIO
+from typing import TYPE_CHECKING
 
 import boto3
+import botocore.config
 import botocore.exceptions
 import joblib
 import pandas as pd
 
-from config import AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY
+from config import (
+    AWS_ACCESS_KEY_ID,
+    AWS_SECRET_ACCESS_KEY,
+    S3_CONNECT_TIMEOUT,
+    S3_MAX_ATTEMPTS,
+    S3_MAX_POOL_CONNECTIONS,
+    S3_READ_TIMEOUT,
+)
 from logger import get_logger
 
-from .repository import Repository
+from .repository import (
+    PARQUET_COMPRESSION,
+    DataframeChunkWriter,
+    Repository,
+    get_storage_format,
+    iter_dataframe_chunks,
+    read_dataframe,
+    write_dataframe,
+)
+from .s3_cache import S3DiskCache
+
+if TYPE_CHECKING:
+    import pyarrow as pa
 
 log = get_logger()
-s3 = boto3.client(
-    "s3",
-    aws_access_key_id=AWS_ACCESS_KEY_ID,
-    aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
-)
+
+
+class S3ClientFactory:
+    """
+    Creates the boto3 S3 client lazily, once per process, and forwards attribute access to it, such that it can be
+    used like the client itself. boto3 clients are thread-safe, but must not be shared with forked processes, so a
+    forked process creates its own client on first use. The client uses a connection pool large enough for calls from
+    worker threads and the adaptive retry mode, which backs off when S3 throttles requests.
+
+    The latency of every S3 operation made by the client is recorded.
+    """
+
+    def __init__(
+        self,
+        max_pool_connections: int = S3_MAX_POOL_CONNECTIONS,
+        max_attempts: int = S3_MAX_ATTEMPTS,
+        connect_timeout: float = S3_CONNECT_TIMEOUT,
+        read_timeout: float = S3_READ_TIMEOUT,
+    ) -> None:
+        """
+        :param max_pool_connections: Maximum number of open connections to S3
+        :param max_attempts: Maximum number of attempts of a request, including the first one
+        :param connect_timeout: Timeout for establishing a connection in seconds
+        :param read_timeout: Timeout for reading from a connection in seconds
+        """
+        self.config = botocore.config.Config(
+            max_pool_connections=max_pool_connections,
+            retries={"max_attempts": max_attempts, "mode": "adaptive"},
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+        )
+        self._client = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._latencies = {}
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def get_client(self):
+        if self._client is None or self._pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._pid != os.getpid():
+                    session = boto3.session.Session(
+                        aws_access_key_id=AWS_ACCESS_KEY_ID,
+                        aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
+                    )
+                    client = session.client("s3", config=self.config)
+                    client.meta.events.register("before-call.s3", self._start_timer)
+                    client.meta.events.register("after-call.s3", self._stop_timer)
+                    self._latencies = {}
+                    self._pid = os.getpid()
+                    self._client = client
+        return self._client
+
+    def _reset_after_fork(self) -> None:
+        # a lock held by another thread while forking would never be released in the forked process
+        self._lock = threading.Lock()
+        self._client = None
+
+    def __getattr__(self, name):
+        return getattr(self.get_client(), name)
+
+    def _start_timer(self, context, **kwargs) -> None:
+        context["start_time"] = time.perf_counter()
+
+    def _stop_timer(self, context, model, **kwargs) -> None:
+        if "start_time" not in context:
+            return
+        latency = time.perf_counter() - context.pop("start_time")
+        with self._lock:
+            calls, total_time, max_time = self._latencies.get(model.name, (0, 0.0, 0.0))
+            self._latencies[model.name] = (
+                calls + 1,
+                total_time + latency,
+                max(max_time, latency),
+            )
+
+    def get_latencies(self) -> dict:
+        """
+        Get the latencies of the S3 operations made by the client of the current process, including retries
+        :return: Number of calls, total and maximum latency in seconds by name of the operation
+        """
+        with self._lock:
+            return {
+                operation: {
+                    "calls": calls,
+                    "total_time": total_time,
+                    "max_time": max_time,
+                }
+                for operation, (calls, total_time, max_time) in self._latencies.items()
+            }
+
+
+s3 = S3ClientFactory()
 
 
 def decode_s3_url(url):
@@ -37,24 +153,206 @@ def decode_s3_url(url):
     return bucket, obj_key
 
 
+class S3MultipartWriter(io.RawIOBase):
+    """
+    Writable binary file object uploading its content to S3 as a multipart upload. Parts are uploaded as soon as
+    part_size bytes have been written, so at most one part is held in memory. Content smaller than one part is
+    uploaded with a single put_object. The object is only created by commit(), which the context manager calls if no
+    exception occurred. Closing the writer otherwise, also when it is garbage-collected after an error, aborts the
+    upload, so that a partially written object never replaces an existing one.
+    """
+
+    # S3 requires all parts but the last one to be at least 5 MiB
+    PART_SIZE = 8 * 2**20
+
+    def __init__(self, bucket: str, key: str, part_size: int = PART_SIZE) -> None:
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self._buffer = bytearray()
+        self._position = 0
+        self._sha256 = hashlib.sha256()
+        self._upload_id = None
+        self._parts = []
+
+    @property
+    def checksum(self) -> str:
+        """
+        SHA-256 checksum of the content written so far
+        """
+        return self._sha256.hexdigest()
+
+    def writable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def write(self, data) -> int:
+        data = memoryview(data).cast("B")
+        self._buffer += data
+        self._position += len(data)
+        self._sha256.update(data)
+        while len(self._buffer) >= self.part_size:
+            self._upload_part(self._buffer[: self.part_size])
+            del self._buffer[: self.part_size]
+        return len(data)
+
+    def _upload_part(self, data) -> None:
+        if self._upload_id is None:
+            self._upload_id = s3.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key
+            )["UploadId"]
+        part_number = len(self._parts) + 1
+        response = s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self._upload_id,
+            PartNumber=part_number,
+            Body=bytes(data),
+        )
+        self._parts.append({"ETag": response["ETag"], "PartNumber": part_number})
+
+    def commit(self) -> None:
+        """
+        Complete the upload and create the object with the written content
+        :raises ValueError: If the writer was already closed
+        """
+        if self.closed:
+            raise ValueError(f"The upload to s3://{self.bucket}/{self.key} was closed")
+        if self._upload_id is None:
+            s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buffer))
+        else:
+            if len(self._buffer) > 0:
+                self._upload_part(self._buffer)
+            s3.complete_multipart_upload(
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self._upload_id,
+                MultipartUpload={"Parts": self._parts},
+            )
+        self._buffer = bytearray()
+        super().close()
+
+    def close(self) -> None:
+        # only commit() creates the object, the IOBase finalizer also calls close()
+        self.abort()
+
+    def abort(self) -> None:
+        """
+        Discard the written content without creating the object
+        """
+        if self.closed:
+            return
+        if self._upload_id is not None:
+            s3.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self._upload_id
+            )
+        self._buffer = bytearray()
+        super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is not None:
+            self.abort()
+        else:
+            self.commit()
+
+
+class S3RangeReader(io.RawIOBase):
+    """
+    Seekable binary file object reading an S3 object with ranged GET requests, such that only the requested parts
+    of the object are downloaded, e.g. the footer and the projected columns of a Parquet file. Wrap it in an
+    io.BufferedReader to avoid a request for every small read.
+    """
+
+    def __init__(self, bucket: str, key: str, size: int = None) -> None:
+        self.bucket = bucket
+        self.key = key
+        self.size = (
+            size
+            if size is not None
+            else s3.head_object(Bucket=bucket, Key=key)["ContentLength"]
+        )
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_CUR:
+            offset += self._position
+        elif whence == io.SEEK_END:
+            offset += self.size
+        self._position = max(offset, 0)
+        return self._position
+
+    def readinto(self, buffer) -> int:
+        end = min(self._position + len(buffer), self.size)
+        if end <= self._position:
+            return 0
+        data = s3.get_object(
+            Bucket=self.bucket,
+            Key=self.key,
+            Range=f"bytes={self._position}-{end - 1}",
+        )["Body"].read()
+        buffer[: len(data)] = data
+        self._position += len(data)
+        return len(data)
+
+
 class S3Repository(Repository):
     EVENTS_BUCKET = "amos--data--events"
     FEATURES_BUCKET = "amos--data--features"
     MODELS_BUCKET = "amos--models"
     DF_INPUT = f"s3://{EVENTS_BUCKET}/leads/enriched.csv"
-    DF_OUTPUT = f"s3://{EVENTS_BUCKET}/leads/enriched.csv"
+    # enriched leads of the production dataset
+    PRODUCTION_OUTPUT = f"s3://{EVENTS_BUCKET}/leads/enriched.csv"
+    DF_OUTPUT = PRODUCTION_OUTPUT
     DF_HISTORICAL_OUTPUT = (
         f"s3://{EVENTS_BUCKET}/historical_data/100k_historic_enriched.csv"
     )
     DF_PREDICTION_OUTPUT = f"s3://{EVENTS_BUCKET}/leads/leads_predicted_size.csv"
     DF_PREPROCESSED_INPUT = f"s3://{FEATURES_BUCKET}/preprocessed_data_files/"
     REVIEWS = f"s3://{EVENTS_BUCKET}/reviews/"
+    REVIEWS_STORE = f"s3://{EVENTS_BUCKET}/reviews_store/"
     SNAPSHOTS = f"s3://{EVENTS_BUCKET}/snapshots/"
+    BACKUPS = f"s3://{EVENTS_BUCKET}/backup/"
     LOOKUP_TABLES = f"s3://{EVENTS_BUCKET}/lookup_tables/"
     GPT_RESULTS = f"s3://{EVENTS_BUCKET}/gpt-results/"
     ML_MODELS = f"s3://{MODELS_BUCKET}/models/"
     CLASSIFICATION_REPORTS = f"s3://{MODELS_BUCKET}/classification_reports/"
 
+    # Size of the ranged requests used to read Parquet files
+    READ_BUFFER_SIZE = 2**20
+
+    # Number of file IDs whose GPT results are kept in memory
+    GPT_RESULTS_CACHE_SIZE = 10000
+    # Number of file IDs whose GPT results are buffered before they are written
+    GPT_RESULTS_BATCH_SIZE = 50
+
+    def __init__(self, storage_format: str = "csv", cache: S3DiskCache = None):
+        """
+        :param storage_format: One of STORAGE_FORMATS
+        :param cache: Disk cache for objects read from S3 (None = no cache)
+        """
+        super().__init__(storage_format)
+        self.cache = cache
+        self._chunk_file = None
+        self._gpt_results = OrderedDict()
+        self._pending_gpt_results = {}
+        self._request_counts = Counter()
+        # buffered GPT results must not be lost if the repository is used outside of the pipeline
+        atexit.register(self.flush_gpt_results)
+
+    def is_production_output(self) -> bool:
+        return self.DF_OUTPUT == self.PRODUCTION_OUTPUT
+
     def _download(self):
         """
         Download database from specified DF path
@@ -67,27 +365,101 @@ class S3Repository(Repository):
             )
             return
 
-        source = None
-        remote_dataset = None
-
         try:
-            bucket, obj_key = decode_s3_url(self.DF_INPUT)
-            remote_dataset = self._fetch_object_s3(bucket, obj_key)
+            self.df = self._read_dataframe_s3(self.get_input_path())
         except IndexError:
             log.error(
                 "S3 location has to be defined like this: s3://<BUCKET>/<OBJECT_KEY>"
             )
 
-        if remote_dataset is None or "Body" not in remote_dataset:
+    def _get_dataframe_source_s3(self, path: str):
+        """
+        Get a readable source for a data file on S3. CSV files are parsed while the body is streamed, Parquet files
+        are read with ranged requests, such that only the footer and the requested columns are downloaded.
+        :return: Binary file object or None if the file does not exist
+        """
+        bucket, obj_key = decode_s3_url(path)
+        try:
+            return self._open_object_s3(
+                bucket, obj_key, seekable=get_storage_format(path) == "parquet"
+            )
+        except botocore.exceptions.ClientError:
             log.error(f"Couldn't find dataset in S3 bucket {bucket} and key {obj_key}")
+            return None
+
+    def _read_dataframe_s3(self, path: str, columns: list[str] = None):
+        """
+        Read a data file from S3
+        :param columns: Only read these columns (None = all columns)
+        :return: The dataframe or None if the file does not exist
+        """
+        source = self._get_dataframe_source_s3(path)
+        if source is None:
+            return None
+        return read_dataframe(source, get_storage_format(path), columns)
+
+    def iter_dataframe(self, chunk_size: int):
+        """
+        Read the input dataframe from the specified DF path in chunks, parsing CSV files as the S3 body is streamed
+        """
+        input_path = self.get_input_path()
+        source = self._get_dataframe_source_s3(input_path)
+        if source is None:
             return
-        else:
-            source = remote_dataset["Body"]
 
-        try:
-            self.df = pd.read_csv(source)
-        except FileNotFoundError:
-            log.error("Error: Could not find input file for Pipeline.")
+        yield from iter_dataframe_chunks(
+            source, get_storage_format(input_path), chunk_size
+        )
+
+    def load_enriched_dataframe(
+        self, historical: bool = False, columns: list[str] = None
+    ):
+        """
+        Load the enriched data of the previous pipeline run from the output location
+        """
+        return self._read_dataframe_s3(
+            self._resolve_data_path(
+                self.DF_HISTORICAL_OUTPUT if historical else self.DF_OUTPUT
+            ),
+            columns,
+        )
+
+    def iter_enriched_dataframe(
+        self, chunk_size: int, historical: bool = False, columns: list[str] = None
+    ):
+        """
+        Read the enriched data of the previous pipeline run in chunks, parsing CSV files as the S3 body is streamed
+        """
+        data_path = self._resolve_data_path(
+            self.DF_HISTORICAL_OUTPUT if historical else self.DF_OUTPUT
+        )
+        source = self._get_dataframe_source_s3(data_path)
+        if source is None:
+            return
+
+        yield from iter_dataframe_chunks(
+            source, get_storage_format(data_path), chunk_size, columns
+        )
+
+    def _data_exists(self, path: str) -> bool:
+        bucket, obj_key = decode_s3_url(path)
+        return self._is_object_exists_on_S3(bucket, obj_key)
+
+    def _open_object_s3(self, bucket, key, seekable: bool = False):
+        """
+        Open an object on S3 for reading. If a disk cache is configured, the cached content is opened. Otherwise the
+        body is streamed, or read with ranged requests if random access is needed.
+        :param seekable: Whether the returned file object has to be seekable
+        :return: Binary file object
+        :raises botocore.exceptions.ClientError: If the object cannot be read, e.g. because it does not exist
+        """
+        if self.cache is not None:
+            return self.cache.open(s3, bucket, key)
+        if seekable:
+            return io.BufferedReader(
+                S3RangeReader(bucket, key), buffer_size=self.READ_BUFFER_SIZE
+            )
+        return s3.get_object(Bucket=bucket, Key=key)["Body"]
 
     def _fetch_object_s3(self, bucket, obj_key):
         """
@@ -96,7 +468,7 @@ class S3Repository(Repository):
         """
         obj = None
         try:
-            obj = s3.get_object(Bucket=bucket, Key=obj_key)
+            obj = {"Body": self._open_object_s3(bucket, obj_key)}
         except botocore.exceptions.ClientError as e:
             log.warning(
                 f"{e.response['Error']['Code']}: {e.response['Error']['Message']} (s3://{bucket}/{obj_key})"
@@ -120,62 +492,213 @@ class S3Repository(Repository):
         :param key: The key of the object in the S3 bucket
         :return: The contents of the file
         """
-        response = s3.get_object(Bucket=bucket, Key=key)
-        file_content = response["Body"].read().decode("utf-8")
-        return file_content
+        with self._open_object_s3(bucket, key) as fp:
+            return fp.read().decode("utf-8")
 
     def save_dataframe(self):
         """
         Save dataframe in df attribute in chosen output location
         """
-        bucket, obj_key = decode_s3_url(self.DF_OUTPUT)
+        bucket, obj_key = decode_s3_url(self.get_enriched_data_path())
         self._backup_data()
-        csv_buffer = StringIO()
-        self.df.to_csv(csv_buffer, index=False)
-        self._save_to_s3(csv_buffer.getvalue(), bucket, obj_key)
+        with S3MultipartWriter(bucket, obj_key) as fp:
+            write_dataframe(self.df, fp, self.storage_format)
         log.info(f"Successfully saved enriched leads to s3://{bucket}/{obj_key}")
 
+    def save_dataframe_chunk(self, df, first_chunk: bool = False):
+        """
+        Append a chunk of the enriched dataframe to a multipart upload of the output, whose parts are uploaded while
+        the chunks are written. The upload is completed by finish_dataframe_chunks().
+        """
+        if first_chunk or self._chunk_file is None:
+            if self._chunk_file is not None:
+                self._chunk_file.abort()
+            bucket, obj_key = decode_s3_url(self.get_enriched_data_path())
+            self._chunk_file = S3MultipartWriter(bucket, obj_key)
+            self._chunk_writer = DataframeChunkWriter(
+                self._chunk_file, self.storage_format
+            )
+        self._chunk_writer.write(df)
+
+    def finish_dataframe_chunks(self):
+        """
+        Complete the upload of the enriched chunks collected by save_dataframe_chunk() to the chosen output location
+        """
+        if self._chunk_file is None:
+            log.warning("No enriched chunks were saved, nothing to upload")
+            return
+        bucket, obj_key = decode_s3_url(self.get_enriched_data_path())
+        # the previous output is only replaced once the upload is completed
+        self._backup_data()
+        self._chunk_writer.close()
+        self._chunk_writer = None
+        self._chunk_file.commit()
+        self._chunk_file = None
+        log.info(f"Successfully saved enriched leads to s3://{bucket}/{obj_key}")
+
+    def abort_dataframe_chunks(self):
+        """
+        Abort the upload of the enriched chunks, the previous output is kept
+        """
+        if self._chunk_file is not None:
+            self._chunk_file.abort()
+        self._chunk_file = None
+        self._chunk_writer = None
+
     def save_prediction(self, df):
         """
         Save dataframe in df parameter in chosen output location
         """
         bucket, obj_key = decode_s3_url(self.DF_PREDICTION_OUTPUT)
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False)
-        self._save_to_s3(csv_buffer.getvalue(), bucket, obj_key)
+        with S3MultipartWriter(bucket, obj_key) as fp:
+            df.to_csv(fp, index=False)
         log.info(f"Successfully saved prediction result to s3://{bucket}/{obj_key}")
 
+    def save_prediction_chunks(self, chunks) -> int:
+        """
+        Upload predictions chunk by chunk as a multipart upload, which is only completed once all chunks were
+        written
+        """
+        bucket, obj_key = decode_s3_url(self.DF_PREDICTION_OUTPUT)
+        rows = 0
+        with S3MultipartWriter(bucket, obj_key) as fp:
+            writer = DataframeChunkWriter(fp, "csv")
+            try:
+                for chunk in chunks:
+                    writer.write(chunk)
+                    rows += len(chunk)
+            finally:
+                writer.close()
+        log.info(f"Saved {rows} predictions to s3://{bucket}/{obj_key}")
+        return rows
+
     def _save_to_s3(self, data, bucket, key):
-        s3.put_object(
+        response = s3.put_object(
             Bucket=bucket,
             Key=key,
             Body=data,
         )
+        if self.cache is not None:
+            self.cache.put(
+                bucket,
+                key,
+                response["ETag"],
+                data.encode("utf-8") if isinstance(data, str) else data,
+            )
 
     def _backup_data(self):
         """
-        Backup existing data to S3
+        Backup the existing enriched data with a server-side copy, without downloading it. Backups are content
+        addressed by the ETag of the data and recorded in a backup index, such that identical data is only backed up
+        once. Note that the ETag of an object uploaded in multiple parts depends on the part size, so identical data
+        uploaded with a different part size is backed up again.
         """
-        bucket, obj_key = decode_s3_url(self.DF_OUTPUT)
-        old_leads = self._fetch_object_s3(bucket, obj_key)
-        if old_leads is None or "Body" not in old_leads:
+        bucket, obj_key = decode_s3_url(self.get_enriched_data_path())
+        try:
+            head = s3.head_object(Bucket=bucket, Key=obj_key)
+        except botocore.exceptions.ClientError:
             return
 
-        old_hash = hashlib.md5(old_leads["Body"].read()).hexdigest()
-        backup_key = "backup/" + datetime.now().strftime(
-            "%Y/%m/%d/%H%M%S_" + old_hash + ".csv"
+        etag = head["ETag"].strip('"')
+        backup_bucket, backup_key = decode_s3_url(
+            f"{self.BACKUPS}objects/{etag}.{get_storage_format(obj_key)}"
         )
-        source = {"Bucket": bucket, "Key": obj_key}
+        index = self._load_backup_index()
+        entry = next((entry for entry in index if entry["backup"] == backup_key), None)
+        if entry is not None:
+            entry["last_backup_at"] = self._get_current_time_as_string()
+            log.info(
+                f"Identical backup already exists at s3://{backup_bucket}/{backup_key}"
+            )
+        else:
+            source = {"Bucket": bucket, "Key": obj_key}
+            if head.get("VersionId") not in (None, "null"):
+                source["VersionId"] = head["VersionId"]
+            try:
+                s3.copy(source, backup_bucket, backup_key)
+            except botocore.exceptions.ClientError as e:
+                log.warning(
+                    f"{e.response['Error']['Code']}: {e.response['Error']['Message']}"
+                    if "Error" in e.response
+                    else f"Error while backing up object s3://{bucket}/{obj_key}"
+                )
+                return
+            index.append(
+                {
+                    "etag": etag,
+                    "version_id": source.get("VersionId"),
+                    "source": obj_key,
+                    "backup": backup_key,
+                    "size": head["ContentLength"],
+                    "last_modified": head["LastModified"].strftime(
+                        self.DATETIME_FORMAT
+                    ),
+                    "created_at": self._get_current_time_as_string(),
+                    "last_backup_at": self._get_current_time_as_string(),
+                }
+            )
+            log.info(f"Successful backup to s3://{backup_bucket}/{backup_key}")
+        self._save_backup_index(index)
+
+    def _load_backup_index(self) -> list[dict]:
+        bucket, key = decode_s3_url(f"{self.BACKUPS}index.json")
         try:
-            s3.copy(source, bucket, backup_key)
-        except botocore.exceptions.ClientError as e:
-            log.warning(
-                f"{e.response['Error']['Code']}: {e.response['Error']['Message']}"
-                if "Error" in e.response
-                else f"Error while backing up object s3://{bucket}/{obj_key}. Object does not exist"
+            response = s3.get_object(Bucket=bucket, Key=key)
+        except botocore.exceptions.ClientError:
+            return []
+        return json.loads(response["Body"].read().decode("utf-8"))
+
+    def _save_backup_index(self, index: list[dict]) -> None:
+        bucket, key = decode_s3_url(f"{self.BACKUPS}index.json")
+        self._save_to_s3(json.dumps(index, indent=4), bucket, key)
+
+    def list_backups(self) -> list[dict]:
+        """
+        List the backups of the enriched data, most recent first
+        :return: Entries of the backup index, containing the ETag, source key, backup key, size and last modification
+        time of the backed up data
+        """
+        return sorted(
+            self._load_backup_index(),
+            key=lambda entry: entry["last_backup_at"],
+            reverse=True,
+        )
+
+    def restore_backup(self, etag: str) -> bool:
+        """
+        Restore a backup as the enriched data with a server-side copy. The current enriched data is backed up first.
+        :param etag: ETag of the backup, as returned by list_backups()
+        :return: Whether the backup was restored
+        """
+        entry = next(
+            (entry for entry in self._load_backup_index() if entry["etag"] == etag),
+            None,
+        )
+        if entry is None:
+            log.error(f"No backup with ETag {etag} found")
+            return False
+
+        backup_bucket, _ = decode_s3_url(self.BACKUPS)
+        bucket, obj_key = decode_s3_url(self.get_enriched_data_path())
+        # backups of another storage format cannot replace the enriched data
+        if get_storage_format(entry["backup"]) != get_storage_format(obj_key):
+            log.error(
+                f"Backup {entry['backup']} does not match the storage format {self.storage_format}"
             )
+            return False
 
-        log.info(f"Successful backup to s3://{bucket}/{backup_key}")
+        self._backup_data()
+        try:
+            s3.copy({"Bucket": backup_bucket, "Key": entry["backup"]}, bucket, obj_key)
+        except botocore.exceptions.ClientError as e:
+            log.error(
+                f"Could not restore backup s3://{backup_bucket}/{entry['backup']}: {str(e)}"
+            )
+            return False
+        log.info(
+            f"Restored backup s3://{backup_bucket}/{entry['backup']} to s3://{bucket}/{obj_key}"
+        )
+        return True
 
     def insert_data(self, data):
         """
@@ -188,25 +711,26 @@ class S3Repository(Repository):
         """
         Upload review to specified review path
         :param review: json contents of the review to be uploaded
+        :param force_refresh: Replace the reviews that are already saved for the place
         """
         # Write the data to a JSON file
         file_name = place_id + "_reviews.json"
         bucket, key = decode_s3_url(self.REVIEWS)
         key += file_name
 
-        try:
-            # HeadObject throws an exception if the file doesn't exist
-            s3.head_object(Bucket=bucket, Key=key)
-            log.info(f"The file with key '{key}' exists in the bucket '{bucket}'.")
-
-        except Exception as e:
-            log.info(
-                f"The file with key '{key}' does not exist in the bucket '{bucket}'."
-            )
-            # Upload the JSON string to S3
-            reviews_str = json.dumps(review)
-            s3.put_object(Body=reviews_str, Bucket=bucket, Key=key)
-            log.info("reviews uploaded to s3")
+        if not force_refresh:
+            try:
+                # HeadObject throws an exception if the file doesn't exist
+                s3.head_object(Bucket=bucket, Key=key)
+                log.info(f"The file with key '{key}' exists in the bucket '{bucket}'.")
+                return
+            except Exception as e:
+                log.info(
+                    f"The file with key '{key}' does not exist in the bucket '{bucket}'."
+                )
+        # Upload the JSON string to S3
+        self._save_to_s3(json.dumps(review), bucket, key)
+        log.info("reviews uploaded to s3")
 
     def fetch_review(self, place_id):
         """
@@ -218,26 +742,113 @@ class S3Repository(Repository):
         key += file_name
 
         try:
-            response = s3.get_object(Bucket=bucket, Key=key)
-            file_content = response["Body"].read().decode("utf-8")
-            json_content = json.loads(file_content)
-            return json_content
+            return json.loads(self._load_from_s3(bucket, key))
         except Exception as e:
             log.info(
                 f"No reviews in S3 for place with at s3://{bucket}/{key}. Error: {str(e)}"
             )
             return []
 
+    def _list_review_place_ids(self) -> list[str]:
+        bucket, prefix = decode_s3_url(self.REVIEWS)
+        suffix = "_reviews.json"
+        return [
+            key[len(prefix) : -len(suffix)]
+            for key in self._list_keys_s3(bucket, prefix)
+            if key.endswith(suffix) and "/" not in key[len(prefix) :]
+        ]
+
+    def _read_review_partition(
+        self, partition: int, columns: list[str] = None
+    ) -> "pa.Table":
+        bucket, key = decode_s3_url(f"{self.REVIEWS_STORE}part-{partition:02d}.parquet")
+        try:
+            source = self._open_object_s3(bucket, key, seekable=True)
+        except botocore.exceptions.ClientError:
+            return None
+        import pyarrow.parquet as pq
+
+        return pq.read_table(source, columns=columns, pre_buffer=False)
+
+    def _write_review_partition(self, partition: int, table: "pa.Table") -> None:
+        bucket, key = decode_s3_url(f"{self.REVIEWS_STORE}part-{partition:02d}.parquet")
+        import pyarrow.parquet as pq
+
+        with S3MultipartWriter(bucket, key) as fp:
+            pq.write_table(table, fp, compression=PARQUET_COMPRESSION)
+
     def create_snapshot(self, df, prefix, name):
-        full_path = f"{self.SNAPSHOTS}{prefix}{name}_snapshot.csv"
+        full_path = f"{self.SNAPSHOTS}{prefix}{name}_snapshot.pkl"
         bucket, key = decode_s3_url(full_path)
 
-        csv_buffer = StringIO()
-        df.to_csv(csv_buffer, index=False)
-        self._save_to_s3(csv_buffer.getvalue(), bucket, key)
+        with S3MultipartWriter(bucket, key) as fp:
+            df.to_pickle(fp)
+        return fp.checksum
+
+    def load_snapshot(self, prefix, name, checksum=None):
+        full_path = f"{self.SNAPSHOTS}{prefix}{name}_snapshot.pkl"
+        bucket, key = decode_s3_url(full_path)
+
+        try:
+            with tempfile.TemporaryFile() as fp:
+                s3.download_fileobj(Fileobj=fp, Bucket=bucket, Key=key)
+                fp.seek(0)
+                if checksum is not None and self._compute_checksum(fp) != checksum:
+                    log.error(
+                        f"Checksum of snapshot s3://{bucket}/{key} does not match!"
+                    )
+                    return None
+                fp.seek(0)
+                return pd.read_pickle(fp)
+        except botocore.exceptions.ClientError as e:
+            log.error(f"Could not load snapshot s3://{bucket}/{key}: {str(e)}")
+            return None
+
+    def save_snapshot_manifest(self, manifest: dict, prefix):
+        bucket, key = decode_s3_url(f"{self.SNAPSHOTS}{prefix}manifest.json")
+        self._save_to_s3(json.dumps(manifest, indent=4), bucket, key)
+
+    def load_snapshot_manifest(self, prefix) -> dict:
+        bucket, key = decode_s3_url(f"{self.SNAPSHOTS}{prefix}manifest.json")
+        manifest = self._fetch_object_s3(bucket, key)
+        if manifest is None or "Body" not in manifest:
+            return None
+        return json.loads(manifest["Body"].read().decode("utf-8"))
+
+    def _list_keys_s3(self, bucket, prefix):
+        """
+        List the keys of all objects in the bucket starting with prefix
+        """
+        paginator = s3.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"]
+
+    def get_snapshot_runs(self) -> list[str]:
+        bucket, snapshots_key = decode_s3_url(self.SNAPSHOTS)
+        runs = set()
+        for key in self._list_keys_s3(bucket, snapshots_key):
+            # keys have the form snapshots/<YYYY>/<mm>/<dd>/<HHMMSS>/<file>
+            run_path = key[len(snapshots_key) :].split("/")[:-1]
+            if len(run_path) == 4:
+                runs.add("/".join(run_path) + "/")
+        return sorted(runs)
 
     def clean_snapshots(self, prefix):
-        pass
+        bucket, key = decode_s3_url(f"{self.SNAPSHOTS}{prefix}")
+        keys = list(self._list_keys_s3(bucket, key))
+        # delete_objects accepts at most 1000 keys per request
+        for i in range(0, len(keys), 1000):
+            s3.delete_objects(
+                Bucket=bucket,
+                Delete={"Objects": [{"Key": k} for k in keys[i : i + 1000]]},
+            )
+
+    def save_run_report(self, report: dict, prefix):
+        full_path = f"{self.SNAPSHOTS}{prefix}run_report.json"
+        bucket, key = decode_s3_url(full_path)
+        self._save_to_s3(json.dumps(report, indent=4), bucket, key)
+        log.info(f"Saved run report to s3://{bucket}/{key}")
 
     def save_lookup_table(self, lookup_table: dict, step_name: str) -> None:
         full_path = f"{self.LOOKUP_TABLES}{step_name}.csv"
@@ -288,65 +899,82 @@ class S3Repository(Repository):
             lookup_table[hashed_data] = other_columns
         return lookup_table
 
-    def fetch_gpt_result(self, file_id, operation_name):
+    def _load_gpt_results(self, file_id) -> dict:
         """
-        Fetches the GPT result for a given file ID and operation name from S3
+        Load all GPT results of a file ID, served from the in-process LRU cache if possible. A cache miss costs a
+        single GET request, a missing object is treated as file without results.
+        :return: GPT results by operation name
         """
-        # Define the file name and path
-        file_name = f"{file_id}_gpt_result.json"
-        full_url_path = f"{self.GPT_RESULTS}{file_name}"
-        bucket, key = decode_s3_url(full_url_path)
+        if file_id in self._gpt_results:
+            self._gpt_results.move_to_end(file_id)
+            self._request_counts["gpt_results_cache_hit"] += 1
+            return self._gpt_results[file_id]
 
-        if not self._is_object_exists_on_S3(bucket, key):
-            return None
-        # Read data from s3
-        existing_data = json.loads(self._load_from_s3(bucket, key))
+        bucket, key = decode_s3_url(f"{self.GPT_RESULTS}{file_id}_gpt_result.json")
+        self._request_counts["gpt_results_get"] += 1
+        try:
+            gpt_results = json.loads(self._load_from_s3(bucket, key))
+        except botocore.exceptions.ClientError as e:
+            if e.response.get("Error", {}).get("Code") not in ("NoSuchKey", "404"):
+                log.warning(f"Could not load GPT results s3://{bucket}/{key}: {e}")
+                return {}
+            gpt_results = {}
+        self._cache_gpt_results(file_id, gpt_results)
+        return gpt_results
 
-        # check if the element with the operation name exists
-        if operation_name in existing_data:
-            return existing_data[operation_name]
-        else:
-            return None
+    def _cache_gpt_results(self, file_id, gpt_results: dict) -> None:
+        self._gpt_results[file_id] = gpt_results
+        self._gpt_results.move_to_end(file_id)
+        while len(self._gpt_results) > self.GPT_RESULTS_CACHE_SIZE:
+            self._gpt_results.popitem(last=False)
 
-    def save_gpt_result(self, gpt_result, file_id, operation_name, force_refresh=False):
+    def fetch_gpt_result(self, file_id, operation_name):
         """
-        Saves the GPT result for a given file ID and operation name on S3
+        Fetches the GPT result for a given file ID and operation name from S3
         """
-        # Define the file name and path
-        file_name = f"{file_id}_gpt_result.json"
-        full_url_path = f"{self.GPT_RESULTS}{file_name}"
-        bucket, key = decode_s3_url(full_url_path)
+        return self._load_gpt_results(file_id).get(operation_name)
 
-        # Get current date and time
-        current_time = self._get_current_time_as_string()
+    def save_gpt_result(self, gpt_result, file_id, operation_name, force_refresh=False):
+        """
+        Saves the GPT result for a given file ID and operation name on S3. Results are buffered and coalesced by file
+        ID, such that all operations of a file ID are written with a single PUT request once GPT_RESULTS_BATCH_SIZE
+        file IDs are buffered or flush_gpt_results() is called.
+        """
+        data_to_save = {
+            "result": gpt_result,
+            "last_update_date": self._get_current_time_as_string(),
+        }
+        if force_refresh:
+            gpt_results = {operation_name: data_to_save}
+        else:
+            gpt_results = self._load_gpt_results(file_id) | {
+                operation_name: data_to_save
+            }
+        self._cache_gpt_results(file_id, gpt_results)
+        self._pending_gpt_results[file_id] = gpt_results
 
-        # Prepare the data to be saved
-        data_to_save = {"result": gpt_result, "last_update_date": current_time}
+        if len(self._pending_gpt_results) >= self.GPT_RESULTS_BATCH_SIZE:
+            self.flush_gpt_results()
 
-        # Check if the file already exists
-        if self._is_object_exists_on_S3(bucket, key) and not force_refresh:
-            # Load the existing data
-            existing_data = json.loads(self._load_from_s3(bucket, key))
+    def flush_gpt_results(self) -> None:
+        for file_id, gpt_results in self._pending_gpt_results.items():
+            bucket, key = decode_s3_url(f"{self.GPT_RESULTS}{file_id}_gpt_result.json")
+            self._request_counts["gpt_results_put"] += 1
+            self._save_to_s3(json.dumps(gpt_results), bucket, key)
+        self._pending_gpt_results = {}
 
-            # Update the existing data with the new result
-            existing_data[operation_name] = data_to_save
+    def get_request_counts(self) -> dict:
+        return dict(self._request_counts)
 
-            # Save the updated data back to S3
-            self._save_to_s3(json.dumps(existing_data), bucket, key)
-        else:
-            # Save the new result to S3
-            self._save_to_s3(json.dumps({operation_name: data_to_save}), bucket, key)
+    def get_operation_latencies(self) -> dict:
+        return s3.get_latencies() if isinstance(s3, S3ClientFactory) else {}
 
     def load_ml_model(self, model_name: str):
         file_name = f"{model_name}"
         bucket, key = decode_s3_url(self.ML_MODELS)
         key += file_name
         try:
-            with tempfile.TemporaryFile() as fp:
-                s3.download_fileobj(Fileobj=fp, Bucket=bucket, Key=key)
-                fp.seek(0)
-                model = joblib.load(fp)
-            return model
+            return self._load_joblib_s3(bucket, key)
         except Exception as e:
             log.error(f"Error loading model '{model_name}': {str(e)}")
             return None
@@ -355,10 +983,7 @@ class S3Repository(Repository):
         full_path = f"{self.ML_MODELS}{model_name}"
         bucket, key = decode_s3_url(full_path)
         try:
-            with tempfile.TemporaryFile() as fp:
-                joblib.dump(model, fp)
-                fp.seek(0)
-                s3.upload_fileobj(fp, bucket, key)
+            self._save_joblib_s3(model, bucket, key)
         except Exception as e:
             log.error(f"Could not save model for '{model_name}' to S3: {str(e)}")
 
@@ -367,11 +992,7 @@ class S3Repository(Repository):
         bucket, key = decode_s3_url(file_path)
 
         try:
-            with tempfile.TemporaryFile() as fp:
-                s3.download_fileobj(Fileobj=fp, Bucket=bucket, Key=key)
-                fp.seek(0)
-                report = joblib.load(fp)
-            return report
+            return self._load_joblib_s3(bucket, key)
         except Exception as e:
             log.error(f"Error loading model '{model_name}': {str(e)}")
             return None
@@ -381,13 +1002,50 @@ class S3Repository(Repository):
         bucket, key = decode_s3_url(file_path)
 
         try:
-            with tempfile.TemporaryFile() as fp:
-                joblib.dump(report, fp)
-                fp.seek(0)
-                s3.upload_fileobj(fp, bucket, key)
+            self._save_joblib_s3(report, bucket, key)
         except Exception as e:
             log.error(f"Could not save report for '{model_name}' to S3: {str(e)}")
 
+    def _load_joblib_s3(self, bucket, key):
+        """
+        Load a model or report through the model cache, which is validated by the ETag of the object. With a disk
+        cache, the cached file is validated by a conditional GET and a changed object is memory-mapped from the
+        cached file. Otherwise a HEAD request validates the cached object and a changed object is downloaded.
+        """
+        name = f"s3://{bucket}/{key}"
+        if self.cache is not None:
+            path = self.cache.get_path(s3, bucket, key)
+
+            def load_cached_file():
+                try:
+                    return joblib.load(path, mmap_mode=self.MODEL_MMAP_MODE)
+                except FileNotFoundError:
+                    # evicted by another process before it was loaded
+                    with self.cache.open(s3, bucket, key) as fp:
+                        return joblib.load(fp)
+
+            # the path of the cached file depends on the ETag of the object
+            return self._load_cached(name, path, load_cached_file)
+
+        etag = s3.head_object(Bucket=bucket, Key=key)["ETag"]
+
+        def download():
+            # fails if the object was changed after the HEAD request
+            body = s3.get_object(Bucket=bucket, Key=key, IfMatch=etag)["Body"]
+            with tempfile.TemporaryFile() as fp:
+                shutil.copyfileobj(body, fp, self.READ_BUFFER_SIZE)
+                fp.seek(0)
+                return joblib.load(fp)
+
+        return self._load_cached(name, etag, download)
+
+    def _save_joblib_s3(self, obj, bucket, key) -> None:
+        with tempfile.TemporaryFile() as fp:
+            joblib.dump(obj, fp)
+            fp.seek(0)
+            s3.upload_fileobj(fp, bucket, key)
+        self.model_cache.invalidate(f"s3://{bucket}/{key}")
+
     def get_preprocessed_data_path(self, historical: bool = True):
         file_name = (
             "historical_preprocessed_data.csv"
@@ -395,29 +1053,41 @@ class S3Repository(Repository):
             else "preprocessed_data.csv"
         )
         file_path = self.DF_PREPROCESSED_INPUT + file_name
-        return file_path
+        return self._get_data_path(file_path)
 
-    def load_preprocessed_data(self, historical: bool = True):
-        file_path = self.get_preprocessed_data_path(historical)
-
-        source = None
-        remote_dataset = None
+    def load_preprocessed_data(
+        self, historical: bool = True, columns: list[str] = None
+    ):
+        file_path = self._resolve_data_path(self.get_preprocessed_data_path(historical))
 
         try:
-            bucket, obj_key = decode_s3_url(file_path)
-            remote_dataset = self._fetch_object_s3(bucket, obj_key)
+            return self._read_dataframe_s3(file_path, columns)
         except IndexError:
             log.error(
                 "S3 location has to be defined like this: s3://<BUCKET>/<OBJECT_KEY>"
             )
 
-        if remote_dataset is None or "Body" not in remote_dataset:
-            log.error(f"Couldn't find dataset in S3 bucket {bucket} and key {obj_key}")
-            return
-        else:
-            source = remote_dataset["Body"]
+    def get_feature_store_path(self, historical: bool = True):
+        """
+        The feature store has to be on a local disk to be memory-mapped, the preprocessed data on S3 is read instead
+        """
+        return None
 
-        try:
-            return pd.read_csv(source)
-        except FileNotFoundError:
-            log.error("Error: Could not find input file for Pipeline.")
+    def save_preprocessed_data_chunks(self, chunks, historical: bool = True) -> int:
+        """
+        Upload preprocessed data chunk by chunk as a multipart upload, which is only completed once all chunks were
+        written
+        """
+        file_path = self.get_preprocessed_data_path(historical)
+        bucket, obj_key = decode_s3_url(file_path)
+        rows = 0
+        with S3MultipartWriter(bucket, obj_key) as fp:
+            writer = DataframeChunkWriter(fp, get_storage_format(file_path))
+            try:
+                for chunk in chunks:
+                    writer.write(chunk)
+                    rows += len(chunk)
+            finally:
+                writer.close()
+        log.info(f"Saved {rows} rows of preprocessed data to s3://{bucket}/{obj_key}")
+        return rows
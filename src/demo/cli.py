@@ -0,0 +1,351 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+"""
+Non-interactive command line interface for scheduled and batch jobs. Every demo has a subcommand taking all of its
+choices as arguments. The exit code is 0 if the command succeeded and 1 if it failed.
+
+Usage:
+    python main.py enrich --config run_all_steps.json --limit 1000 --chunk-size 500
+    python main.py preprocess --historical --format parquet
+    python main.py preprocess --historical --chunk-size 100000
+    python main.py train --model-type LightGBM --epochs 1 --workers 4
+    python main.py search --model-type LightGBM --method halving --trials 27 --processes 4 --workers 2
+    python main.py predict --model-name "lightgbm_epochs(1)_f1(0.6375)_numclasses(5)_model.pkl"
+    python main.py predict --model-name "xgb_epochs(1)_f1(0.6)_numclasses(5)_model.pkl" --chunk-size 50000
+    python main.py serve --model-name "lightgbm_epochs(1)_f1(0.6375)_numclasses(5)_model.pkl" --port 8000
+    python main.py compact
+"""
+
+import argparse
+import os
+
+from bdc.pipeline import Pipeline
+from database import get_database
+from database.leads import STORAGE_FORMATS
+from demo.demos import predict_merchant_size
+from demo.pipeline_utils import DEFAULT_PIPELINE_PATH, get_pipeline_config_from_json
+from logger import get_logger
+
+log = get_logger()
+
+EXIT_SUCCESS = 0
+EXIT_FAILURE = 1
+
+
+def _config_path(value: str) -> str:
+    # config files are resolved before main.py changes the working directory
+    return os.path.abspath(value) if os.path.isfile(value) else value
+
+
+def create_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument(
+        "--format",
+        choices=STORAGE_FORMATS,
+        help="Format of the written lead data, defaults to STORAGE_FORMAT",
+    )
+    # the enrichment is bound by the external APIs and does not use the threads of the numerical libraries
+    workers = argparse.ArgumentParser(add_help=False)
+    workers.add_argument(
+        "--workers",
+        type=int,
+        help="Number of threads of the numerical libraries, limit it when running several jobs in parallel",
+    )
+
+    parser = argparse.ArgumentParser(
+        prog="main.py", description="Run the sales lead pipeline non-interactively"
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    enrich = subparsers.add_parser(
+        "enrich", parents=[common], help="Enrich the leads with a pipeline config"
+    )
+    enrich.add_argument(
+        "--config",
+        type=_config_path,
+        required=True,
+        help=f"Path of a pipeline JSON config or name of a config in {DEFAULT_PIPELINE_PATH}",
+    )
+    enrich.add_argument("--limit", type=int, help="Maximum number of leads to enrich")
+    enrich.add_argument(
+        "--chunk-size", type=int, help="Stream the leads through the steps in chunks"
+    )
+    enrich.add_argument(
+        "--resume", metavar="RUN_ID", help="Resume a failed run from its snapshots"
+    )
+    enrich.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only enrich new leads and leads with expired data",
+    )
+
+    preprocess = subparsers.add_parser(
+        "preprocess", parents=[common, workers], help="Preprocess the enriched leads"
+    )
+    preprocess.add_argument(
+        "--historical",
+        action="store_true",
+        help="Preprocess the historical data instead of the lead data",
+    )
+    preprocess.add_argument(
+        "--filter-null-data",
+        action=argparse.BooleanOptionalAction,
+        default=True,
+        help="Filter out the API-irrelevant data",
+    )
+    preprocess.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Preprocess the leads out-of-core in chunks, for data that does not fit into memory",
+    )
+
+    train = subparsers.add_parser(
+        "train",
+        parents=[common, workers],
+        help="Train a model on the preprocessed data",
+    )
+    train.add_argument(
+        "--model-type",
+        default="RandomForest",
+        help="One of RandomForest, XGBoost, NaiveBayes, KNN, AdaBoost, LightGBM",
+    )
+    train.add_argument("--model-name", help="Continue with a saved model")
+    train.add_argument("--epochs", type=int, default=1)
+    train.add_argument(
+        "--limit-classes",
+        action="store_true",
+        help="Use 3 classes ({XS}, {S, M, L}, {XL}) instead of 5",
+    )
+    train.add_argument("--features", nargs="+", help="Train on a subset of features")
+    train.add_argument(
+        "--sparse",
+        action="store_true",
+        help="Train on a sparse feature matrix (RandomForest, XGBoost, LightGBM)",
+    )
+
+    search = subparsers.add_parser(
+        "search",
+        parents=[common, workers],
+        help="Search the hyperparameters of a model type and save the best model",
+    )
+    search.add_argument(
+        "--model-type",
+        default="LightGBM",
+        help="One of RandomForest, XGBoost, NaiveBayes, KNN, AdaBoost, LightGBM",
+    )
+    search.add_argument("--method", choices=["random", "halving"], default="random")
+    search.add_argument(
+        "--trials", type=int, default=16, help="Number of sampled configurations"
+    )
+    search.add_argument(
+        "--processes",
+        type=int,
+        help="Number of trials that run in parallel, defaults to the number of CPUs divided by --workers",
+    )
+
+    predict = subparsers.add_parser(
+        "predict",
+        parents=[common, workers],
+        help="Predict the merchant size of the enriched leads",
+    )
+    predict.add_argument("--model-name", required=True, help="File name of the model")
+    predict.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Number of leads that are preprocessed and predicted at a time",
+    )
+
+    serve = subparsers.add_parser(
+        "serve",
+        parents=[common, workers],
+        help="Serve online predictions of single leads over HTTP until interrupted",
+    )
+    serve.add_argument("--model-name", required=True, help="File name of the model")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    serve.add_argument(
+        "--max-wait-ms",
+        type=float,
+        default=5,
+        help="Maximum time a request waits to be predicted together with other requests",
+    )
+    serve.add_argument(
+        "--max-batch-size",
+        type=int,
+        default=256,
+        help="Maximum number of leads predicted together",
+    )
+
+    subparsers.add_parser(
+        "compact",
+        help="Compact the stored reviews and GPT results, e.g. as a periodic maintenance job",
+    )
+
+    return parser
+
+
+def parse_args(argv: list[str] = None) -> argparse.Namespace:
+    """
+    :param argv: Command line arguments without the program name, defaults to sys.argv[1:]
+    :raises SystemExit: With exit code 2 if the arguments are invalid
+    """
+    return create_parser().parse_args(argv)
+
+
+def enrich(args: argparse.Namespace) -> bool:
+    if os.path.isabs(args.config):
+        config_path, config_name = os.path.split(args.config)
+    else:
+        config_path, config_name = DEFAULT_PIPELINE_PATH, args.config
+    steps = get_pipeline_config_from_json(config_name, config_path=config_path)
+
+    if args.limit is not None and get_database().is_production_output():
+        log.error(
+            f"Error: The output cannot be limited when uploading to {get_database().DF_OUTPUT}, run without --limit!"
+        )
+        return False
+
+    pipeline = Pipeline(
+        steps=steps,
+        limit=args.limit,
+        chunk_size=args.chunk_size,
+        resume_run_id=args.resume,
+        incremental=args.incremental,
+    )
+    return pipeline.run()
+
+
+def preprocess(args: argparse.Namespace) -> bool:
+    from preprocessing import Preprocessing
+
+    preprocessor = Preprocessing(
+        filter_null_data=args.filter_null_data, historical_bool=args.historical
+    )
+    if args.chunk_size is not None:
+        preprocessor.preprocess_in_chunks(args.chunk_size)
+        return True
+    preprocessor.load_data()
+    preprocessor.implement_preprocessing_pipeline()
+    preprocessor.save_preprocessed_data()
+    return True
+
+
+def train(args: argparse.Namespace) -> bool:
+    from evp import EstimatedValuePredictor, load_training_data
+    from evp.predictors import Predictors
+
+    if args.model_type not in Predictors.__members__:
+        log.error(
+            f"Error: Unknown model type {args.model_type}, has to be one of {list(Predictors.__members__)}!"
+        )
+        return False
+
+    evp = EstimatedValuePredictor(
+        data=load_training_data(),
+        model_type=Predictors[args.model_type],
+        model_name=args.model_name,
+        limit_classes=args.limit_classes,
+        selected_features=args.features,
+        sparse=args.sparse,
+    )
+    evp.train(epochs=args.epochs)
+    evp.save_model()
+    return True
+
+
+def search(args: argparse.Namespace) -> bool:
+    from evp import HyperparameterSearch, load_training_data
+    from evp.predictors import Predictors
+
+    if args.model_type not in Predictors.__members__:
+        log.error(
+            f"Error: Unknown model type {args.model_type}, has to be one of {list(Predictors.__members__)}!"
+        )
+        return False
+
+    hyperparameter_search = HyperparameterSearch(
+        load_training_data(),
+        Predictors[args.model_type],
+        method=args.method,
+        num_trials=args.trials,
+        processes=args.processes,
+        threads=args.workers or 1,
+    )
+    result = hyperparameter_search.run()
+    log.info(
+        f"Best configuration {result['params']} with validation F1 {result['f1']:.4f} after "
+        f"{len(result['trials'])} trials in {result['seconds']:.1f} s"
+    )
+    model_name = hyperparameter_search.save_best_model(result)
+    log.info(f"Saved the best model as {model_name}")
+    return True
+
+
+def predict(args: argparse.Namespace) -> bool:
+    return predict_merchant_size(
+        args.model_name, chunk_size=args.chunk_size, workers=args.workers
+    )
+
+
+def serve(args: argparse.Namespace) -> bool:
+    from evp.service import PredictionService, create_http_server
+
+    with PredictionService(
+        args.model_name,
+        max_wait_ms=args.max_wait_ms,
+        max_batch_size=args.max_batch_size,
+        workers=args.workers,
+    ) as service:
+        server = create_http_server(service, args.host, args.port)
+        log.info(
+            f"Serving predictions of {args.model_name} on http://{args.host}:{server.server_port}/predict"
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
+        log.info(f"Latencies of the served requests: {service.get_metrics()}")
+    return True
+
+
+def compact(args: argparse.Namespace) -> bool:
+    database = get_database()
+    database.compact_results()
+    # fold the reviews of all places, including those saved outside of the pipeline, into the review store
+    database.compact_reviews()
+    return True
+
+
+COMMANDS = {
+    "enrich": enrich,
+    "preprocess": preprocess,
+    "train": train,
+    "search": search,
+    "predict": predict,
+    "serve": serve,
+    "compact": compact,
+}
+
+
+def run_command(args: argparse.Namespace) -> int:
+    """
+    Run a parsed command
+    :return: Exit code of the command
+    """
+    # create the database with the requested format before any command uses it
+    get_database(storage_format=getattr(args, "format", None))
+
+    try:
+        succeeded = COMMANDS[args.command](args)
+    except Exception as e:
+        log.exception(f"Error: Command {args.command} failed! {e}")
+        return EXIT_FAILURE
+
+    if not succeeded:
+        log.error(f"Error: Command {args.command} failed!")
+        return EXIT_FAILURE
+    log.info(f"Command {args.command} finished successfully")
+    return EXIT_SUCCESS
@@ -7,12 +7,10 @@
 # SPDX-FileCopyrightText: 2023 Ahmed Sheta <ahmed.sheta@fau.de>
 
 
-import re
 import warnings
+from typing import TYPE_CHECKING
 
 import pandas as pd
-import xgboost as xgb
-from sklearn.metrics import classification_report
 
 from bdc.pipeline import Pipeline
 from config import DATABASE_TYPE
@@ -29,10 +27,12 @@ from demo.pipeline_utils import (
     get_pipeline_config_from_json,
     get_pipeline_initial_steps,
 )
-from evp import EstimatedValuePredictor
-from evp.predictors import MerchantSizeByDPV, Predictors
 from logger import get_logger
-from preprocessing import Preprocessing
+
+# The models and the preprocessing import xgboost, lightgbm and sklearn, which take long to import. They are only
+# imported by the demos using them, so the demo menu starts quickly.
+if TYPE_CHECKING:
+    from evp import EstimatedValuePredictor
 
 warnings.simplefilter(action="ignore", category=pd.errors.PerformanceWarning)
 warnings.simplefilter(action="ignore", category=FutureWarning)
@@ -49,7 +49,10 @@ OUTPUT_FILE_BDC = "../data/collected_data.json"
 
 # evp demo
 def evp_demo():
-    data = get_database().load_preprocessed_data()
+    from evp import EstimatedValuePredictor, load_training_data
+    from evp.predictors import Predictors
+
+    data = load_training_data()
 
     model_type_choices = [e for e in Predictors]
     print("Which model type do you want to load")
@@ -112,7 +115,11 @@ def evp_demo():
             print("Invalid choice")
 
 
-def test_evp_model(evp: EstimatedValuePredictor):
+def test_evp_model(evp: "EstimatedValuePredictor"):
+    from sklearn.metrics import classification_report
+
+    from evp.predictors import MerchantSizeByDPV
+
     predictions = evp.predict(evp.X_test)
     if len(predictions) == 1 and predictions[0] == MerchantSizeByDPV.Invalid:
         log.info("Untrained model results in no displayable data")
@@ -122,7 +129,9 @@ def test_evp_model(evp: EstimatedValuePredictor):
     print(classification_report(true_labels, predictions))
 
 
-def predict_single_lead(evp: EstimatedValuePredictor):
+def predict_single_lead(evp: "EstimatedValuePredictor"):
+    from evp.predictors import MerchantSizeByDPV
+
     leads = evp.X_test
     lead_id = get_int_input(
         f"Choose a lead_id in range [0, {len(leads) - 1}]\n", range(len(leads))
@@ -194,10 +203,7 @@ def pipeline_demo():
     limit = get_int_input("Set limit for data points to be processed (0=No limit)\n")
     limit = limit if limit > 0 else None
 
-    if (
-        limit is not None
-        and get_database().DF_OUTPUT == "s3://amos--data--events/leads/enriched.csv"
-    ):
+    if limit is not None and get_database().is_production_output():
         if get_yes_no_input(
             f"The output cannot be limited when uploading to {get_database().DF_OUTPUT}.\nThe limit will be removed, and the pipeline will be executed on the full database.\n\nWould you like to continue? (y/n)\n"
         ):
@@ -205,6 +211,27 @@ def pipeline_demo():
         else:
             return
 
+    chunk_size = get_int_input(
+        "Set chunk size for streaming the leads through the pipeline (0=Process all leads at once)\n"
+    )
+    chunk_size = chunk_size if chunk_size > 0 else None
+
+    resume_run_id = None
+    incremental = chunk_size is None and get_yes_no_input(
+        "Only enrich new leads and leads with expired data (incremental run)? (y/N)\n"
+    )
+    if chunk_size is None and not incremental:
+        snapshot_runs = get_database().get_snapshot_runs()
+        if len(snapshot_runs) > 0 and get_yes_no_input(
+            "Do you want to resume a previous pipeline run from its snapshots? (y/N)\n"
+        ):
+            choice = get_multiple_choice(
+                "Please enter the index of the run to resume:\n",
+                snapshot_runs + ["Exit"],
+            )
+            if choice != "Exit":
+                resume_run_id = choice
+
     steps_info = "\n".join([str(step) for step in steps])
     log.info(
         f"Running Pipeline with steps:\n{steps_info}\ninput_location={get_database().get_input_path()}\noutput_location={get_database().get_enriched_data_path()}"
@@ -213,12 +240,17 @@ def pipeline_demo():
     pipeline = Pipeline(
         steps=steps,
         limit=limit,
+        chunk_size=chunk_size,
+        resume_run_id=resume_run_id,
+        incremental=incremental,
     )
 
     pipeline.run()
 
 
 def preprocessing_demo():
+    from preprocessing import Preprocessing
+
     if get_yes_no_input("Filter out the API-irrelevant data? (y/n)\n"):
         filter_bool = True
     else:
@@ -234,77 +266,18 @@ def preprocessing_demo():
         filter_null_data=filter_bool, historical_bool=historical_bool
     )
 
-    preprocessor.preprocessed_df = pd.read_csv(preprocessor.data_path)
+    preprocessor.load_data()
 
     df = preprocessor.implement_preprocessing_pipeline()
     preprocessor.save_preprocessed_data()
 
 
 def predict_MerchantSize_on_lead_data_demo():
-    import os
-    import sys
-
-    import pandas as pd
-
     log.info(
         "Note: In case of running locally, enriched data must be located at src/data/leads_enriched.csv\nIn case of running on S3, enriched data must be located at s3://amos--data--events/leads/enriched.csv"
     )
 
-    ######################### preprocessing the leads ##################################
-    S3_bool = DATABASE_TYPE == "S3"
-    current_dir = os.path.dirname(__file__) if "__file__" in locals() else os.getcwd()
-    parent_dir = os.path.join(current_dir, "..")
-    sys.path.append(parent_dir)
-    from database import get_database
-    from preprocessing import Preprocessing
-
-    db = get_database()
-
-    log.info(f"Preprocessing the leads...")
-    preprocessor = Preprocessing(filter_null_data=False, historical_bool=False)
-    preprocessor.preprocessed_df = pd.read_csv(preprocessor.data_path)
-    df = preprocessor.implement_preprocessing_pipeline()
-    preprocessor.save_preprocessed_data()
-
-    ############################## adapting the preprocessing files ###########################
-    log.info(f"Adapting the leads' preprocessed data for the ML model...")
-    # load the data from the CSV files
-    historical_preprocessed_data = db.load_preprocessed_data(historical=True)
-    unlabeled_preprocessed_data = db.load_preprocessed_data(historical=False)
-
-    historical_columns_order = historical_preprocessed_data.columns
-
-    missing_columns = set(historical_columns_order) - set(
-        unlabeled_preprocessed_data.columns
-    )
-    unlabeled_preprocessed_data[list(missing_columns)] = 0
-
-    for column in unlabeled_preprocessed_data.columns:
-        if column not in historical_columns_order:
-            unlabeled_preprocessed_data = unlabeled_preprocessed_data.drop(
-                column, axis=1
-            )
-
-    # reorder columns
-    unlabeled_preprocessed_data = unlabeled_preprocessed_data[historical_columns_order]
-    unlabeled_preprocessed_data.to_csv(
-        preprocessor.preprocessed_data_output_path,
-        index=False,
-    )
-    log.info(
-        f"Saving the adapted preprocessed data at {preprocessor.preprocessed_data_output_path}"
-    )
-
-    # check if columns in both dataframe are in same order and same number
-    assert list(unlabeled_preprocessed_data.columns) == list(
-        historical_preprocessed_data.columns
-    ), "Column names are different"
-
-    ####################### Applying ML model on lead data ####################################
-
-    bucket_name = "amos--models"
-
-    if S3_bool:
+    if DATABASE_TYPE == "S3":
         model_name = get_string_input(
             "Provide model file name in amos--models/models S3 Bucket\nInput example: lightgbm_epochs(1)_f1(0.6375)_numclasses(5)_model.pkl\n"
         )
@@ -312,45 +285,26 @@ def predict_MerchantSize_on_lead_data_demo():
         model_name = get_string_input(
             "Provide model file name in data/models local directory\nInput example: lightgbm_epochs(1)_f1(0.6375)_numclasses(5)_model.pkl\n"
         )
-    model_name = model_name.strip()
-    xgb_bool = False
-    if model_name.lower().startswith("xgb"):
-        xgb_bool = True
-
-    def check_classification_task(string):
-        match = re.search(r"numclasses\((\d+)\)", string)
-        if match:
-            last_number = int(match.group(1))
-            if last_number == 3:
-                return True
-            else:
-                False
-
-    classification_task_3 = check_classification_task(model_name)
-
-    try:
-        model = db.load_ml_model(model_name)
-        log.info(f"Loaded the model {model_name}!")
-    except:
-        log.error("No model found with the given name!")
-        return
+    predict_merchant_size(model_name)
 
-    df = pd.read_csv(preprocessor.preprocessed_data_output_path)
-    input = df.drop("MerchantSizeByDPV", axis=1)
-    if xgb_bool:
-        input = xgb.DMatrix(input)
 
-    predictions = model.predict(input)
-    if classification_task_3:
-        size_mapping = {0: "XS", 1: "{S, M, L}", 2: "XL"}
-    else:
-        size_mapping = {0: "XS", 1: "S", 2: "M", 3: "L", 4: "XL"}
-    remapped_predictions = [size_mapping[prediction] for prediction in predictions]
-
-    enriched_data = pd.read_csv(preprocessor.data_path)
-
-    # first 5 columns: Last Name,First Name,Company / Account,Phone,Email,
-    raw_data = enriched_data.iloc[:, :5]
-    raw_data["PredictedMerchantSize"] = remapped_predictions
+def predict_merchant_size(
+    model_name: str, chunk_size: int = None, workers: int = None
+) -> bool:
+    """
+    Predict the merchant size of the enriched leads with a trained model and save the predictions. The leads are
+    preprocessed with the transformer the model was trained with and scored in chunks, see BatchScorer.
+    :param model_name: File name of the model, e.g. lightgbm_epochs(1)_f1(0.6375)_numclasses(5)_model.pkl
+    :param chunk_size: Number of leads that are preprocessed and predicted at a time
+    :param workers: Number of threads of the model, defaults to the number of CPUs
+    :return: Whether the predictions were saved
+    """
+    from evp.scoring import DEFAULT_SCORING_CHUNK_SIZE, BatchScorer
 
-    db.save_prediction(raw_data)
+    try:
+        scorer = BatchScorer(model_name, workers=workers)
+    except ValueError as e:
+        log.error(str(e))
+        return False
+    scorer.score(chunk_size or DEFAULT_SCORING_CHUNK_SIZE)
+    return True
@@ -8,73 +8,59 @@ from logger import get_logger
 
 log = get_logger()
 
-from bdc.steps import (
-    AnalyzeEmails,
-    GooglePlaces,
-    GooglePlacesDetailed,
-    GPTReviewSentimentAnalyzer,
-    GPTSummarizer,
-    HashGenerator,
-    PreprocessPhonenumbers,
-    RegionalAtlas,
-    SearchOffeneRegister,
-    SmartReviewInsightsEnhancer,
-)
+from bdc.steps import get_step_class
 
 DEFAULT_PIPELINE_PATH = os.path.join(os.path.dirname(__file__), "pipeline_configs/")
 
-STEP_STR_TO_CLASS = {
-    "HashGenerator": HashGenerator,
-    "AnalyzeEmails": AnalyzeEmails,
-    "GooglePlaces": GooglePlaces,
-    "GooglePlacesDetailed": GooglePlacesDetailed,
-    "GPTReviewSentimentAnalyzer": GPTReviewSentimentAnalyzer,
-    "GPTSummarizer": GPTSummarizer,
-    "PreprocessPhonenumbers": PreprocessPhonenumbers,
-    "RegionalAtlas": RegionalAtlas,
-    "SearchOffeneRegister": SearchOffeneRegister,
-    "SmartReviewInsightsEnhancer": SmartReviewInsightsEnhancer,
-}
-
 # Please do not write following lists! Use the functions below instead.
+# The steps are referenced by class name, so their modules are only imported when the steps are requested.
 _additional_pipeline_steps = [
-    (SearchOffeneRegister, "Search OffeneRegister", "(will take a long time)"),
-    (PreprocessPhonenumbers, "Phone Number Validation", ""),
+    ("SearchOffeneRegister", "Search OffeneRegister", "(will take a long time)"),
+    ("PreprocessPhonenumbers", "Phone Number Validation", ""),
     (
-        GooglePlaces,
+        "GooglePlaces",
         "Google API",
         "(will use token and generate cost!)",
     ),
     (
-        GooglePlacesDetailed,
+        "GooglePlacesDetailed",
         "Google API Detailed",
         "(will use token and generate cost!)",
     ),
     (
-        GPTReviewSentimentAnalyzer,
+        "GPTReviewSentimentAnalyzer",
         "openAI GPT Sentiment Analyzer",
         "(will use token and generate cost!)",
     ),
     (
-        GPTSummarizer,
+        "GPTSummarizer",
         "openAI GPT Summarizer",
         "(will use token and generate cost!)",
     ),
     (
-        SmartReviewInsightsEnhancer,
+        "SmartReviewInsightsEnhancer",
         "Smart Review Insights",
         "(will take looong time!)",
     ),
-    (RegionalAtlas, "Regionalatlas", ""),
+    ("RegionalAtlas", "Regionalatlas", ""),
 ]
 
 _initial_pipeline_steps = [
-    (HashGenerator, "Hash Generator", ""),
-    (AnalyzeEmails, "Analyze Emails", ""),
+    ("HashGenerator", "Hash Generator", ""),
+    ("AnalyzeEmails", "Analyze Emails", ""),
 ]
 # Please do not write above lists! Use the functions below instead.
 
 
+def _resolve_steps(steps: list) -> list:
+    """
+    Replace the class names of the steps by the step classes, importing the step modules
+    """
+    return [
+        (get_step_class(step_name), desc, warning) for step_name, desc, warning in steps
+    ]
+
+
 def get_pipeline_steps() -> list:
     """
     Returns a copy of the pipeline steps, which includes both the initial pipeline steps
@@ -83,7 +69,7 @@ def get_pipeline_steps() -> list:
     Returns:
         list: A copy of the pipeline steps.
     """
-    return (_initial_pipeline_steps + _additional_pipeline_steps).copy()
+    return _resolve_steps(_initial_pipeline_steps + _additional_pipeline_steps)
 
 
 def get_pipeline_initial_steps() -> list:
@@ -93,7 +79,7 @@ def get_pipeline_initial_steps() -> list:
     Returns:
         list: A copy of the initial pipeline steps.
     """
-    return _initial_pipeline_steps.copy()
+    return _resolve_steps(_initial_pipeline_steps)
 
 
 def get_pipeline_additional_steps() -> list:
@@ -103,7 +89,7 @@ def get_pipeline_additional_steps() -> list:
     Returns:
         list: A copy of the additional pipeline steps.
     """
-    return _additional_pipeline_steps.copy()
+    return _resolve_steps(_additional_pipeline_steps)
 
 
 def get_all_available_pipeline_json_configs(
@@ -137,7 +123,10 @@ def get_pipeline_config_from_json(
         for step in steps_json["config"]["steps"]:
             log.info(f"Adding step {step}")
             steps.append(
-                (STEP_STR_TO_CLASS[step["name"]](force_refresh=step["force_refresh"]))
+                get_step_class(step["name"])(
+                    force_refresh=step["force_refresh"],
+                    freshness_days=step.get("freshness_days"),
+                )
             )
 
         return steps
@@ -3,3 +3,6 @@
 
 from .evp import *
 from .predictors import *
+from .scoring import *
+from .search import *
+from .service import *
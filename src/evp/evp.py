@@ -1,13 +1,18 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Felix Zailskas <felixzailskas@gmail.com>
 
+from functools import cached_property
+
 import lightgbm as lgb
 import numpy as np
 import pandas as pd
+import scipy.sparse
 import xgboost as xgb
 from sklearn.model_selection import train_test_split
 from sklearn.utils import class_weight
 
+from database import get_database
+from database.leads import FeatureStore
 from evp.predictors import (
     XGB,
     AdaBoost,
@@ -20,12 +25,94 @@ from evp.predictors import (
     RandomForest,
 )
 from logger import get_logger
+from preprocessing.transformer import get_transformer_name, load_transformer
 
 log = get_logger()
 
 
 SEED = 42
 
+# Models that are trained on sparse feature matrices without converting them to dense arrays
+SPARSE_PREDICTORS = [Predictors.RandomForest, Predictors.XGBoost, Predictors.LightGBM]
+
+
+def to_csr_matrix(features) -> scipy.sparse.csr_matrix:
+    """
+    Convert features to a float32 CSR matrix, column by column, so that no dense copy of all features is created
+    :param features: Dataframe or float32 array, e.g. the features of a FeatureStore
+    """
+    if isinstance(features, np.ndarray):
+        return scipy.sparse.csr_matrix(features, dtype=np.float32)
+    if not all(isinstance(dtype, pd.SparseDtype) for dtype in features.dtypes):
+        features = features.astype(pd.SparseDtype(np.float32, 0))
+    return features.sparse.to_coo().tocsr().astype(np.float32)
+
+
+def split_indices(num_rows: int, val_size=0.1, test_size=0.1) -> tuple:
+    """
+    Split the rows into the training, validation and test sets of EstimatedValuePredictor
+    :return: Row indices of the training, validation and test set
+    """
+    train, temp = train_test_split(
+        np.arange(num_rows), test_size=val_size + test_size, random_state=42
+    )
+    val, test = train_test_split(
+        temp, test_size=test_size / (val_size + test_size), random_state=42
+    )
+    return train, val, test
+
+
+def load_training_data():
+    """
+    Load the preprocessed historical data for training. The memory-mapped FeatureStore is used if there is one.
+    :return: FeatureStore or dataframe of the preprocessed data
+    """
+    feature_store = get_database().load_feature_store(historical=True)
+    if feature_store is not None:
+        return feature_store
+    return get_database().load_preprocessed_data()
+
+
+def create_classifier(
+    model_type: Predictors, model_name: str = None, class_weight=None, **model_args
+) -> Classifier:
+    """
+    :param model_type: Type of the classifier
+    :param model_name: File name of a saved model to continue with
+    :param class_weight: Weights of the class labels, only used by the RandomForest
+    :param model_args: Hyperparameters of the classifier, e.g. num_leaves of the LightGBM
+    :return: The classifier or None if the model type is not supported
+    """
+    match model_type:
+        case Predictors.RandomForest:
+            return RandomForest(
+                model_name=model_name, class_weight=class_weight, **model_args
+            )
+        case Predictors.XGBoost:
+            return XGB(model_name=model_name, **model_args)
+        case Predictors.NaiveBayes:
+            return NaiveBayesClassifier(model_name=model_name, **model_args)
+        case Predictors.KNN:
+            return KNNClassifier(model_name=model_name, **model_args)
+        case Predictors.AdaBoost:
+            return AdaBoost(model_name=model_name, **model_args)
+        case Predictors.LightGBM:
+            return LightGBM(model_name=model_name, **model_args)
+        case default:
+            log.error(
+                f"Error: EVP initialized with unsupported model type {model_type}!"
+            )
+            return None
+
+
+def compute_class_weights(labels: np.ndarray) -> dict:
+    """
+    :return: Balanced weights of the class labels, to tackle the class imbalance
+    """
+    classes = np.unique(labels)
+    weights = class_weight.compute_class_weight("balanced", classes=classes, y=labels)
+    return dict(zip(classes, weights))
+
 
 class EstimatedValuePredictor:
     lead_classifier: Classifier
@@ -40,71 +127,88 @@ class EstimatedValuePredictor:
         model_name: str = None,
         limit_classes: bool = False,
         selected_features: list = None,
+        sparse: bool = False,
         **model_args,
     ) -> None:
+        """
+        :param data: Preprocessed leads including the class labels. Either a dataframe, whose features may be sparse
+        columns, or a FeatureStore, whose memory-mapped features are split into the data sets by row index. The rows
+        of a data set are only copied into memory when the set is used, e.g. the validation set is never copied for
+        training.
+        :param sparse: Train on a sparse feature matrix. Most of the features are one-hot encodings, which take a
+        fraction of the memory as sparse matrix. Only used for the models in SPARSE_PREDICTORS.
+        """
         self.df = data
         self.num_classes = 5
-        features = self.df.drop("MerchantSizeByDPV", axis=1)
-        if selected_features is not None:
-            features = features[selected_features]
-        features = features.to_numpy()
+        # columns of the features that are selected when the rows of a data set are copied out of the feature store
+        self._feature_columns = None
+        if isinstance(data, FeatureStore):
+            features = data.features
+            if selected_features is not None:
+                self._feature_columns = [
+                    data.columns.index(col) for col in selected_features
+                ]
+            self.class_labels = data.labels
+        else:
+            features = data.drop("MerchantSizeByDPV", axis=1)
+            if selected_features is not None:
+                features = features[selected_features]
+            self.class_labels = data["MerchantSizeByDPV"].to_numpy()
+        if sparse and model_type not in SPARSE_PREDICTORS:
+            log.warning(
+                f"{model_type.value} does not support sparse features, training on dense features"
+            )
+            sparse = False
+        if sparse:
+            features = to_csr_matrix(self._select_columns(features))
+            self._feature_columns = None
+        elif isinstance(features, pd.DataFrame):
+            # the models use float32 internally, float64 features would only double the memory
+            features = features.to_numpy(np.float32)
         if limit_classes:
             self.num_classes = 3
-            self.df["new_labels"] = np.where(
-                self.df["MerchantSizeByDPV"] == 0,
-                0,
-                np.where(self.df["MerchantSizeByDPV"] == 4, 2, 1),
+            self.class_labels = np.where(
+                self.class_labels == 0, 0, np.where(self.class_labels == 4, 2, 1)
             )
-            self.df = self.df.drop("MerchantSizeByDPV", axis=1)
-            self.df = self.df.rename(columns={"new_labels": "MerchantSizeByDPV"})
-        self.class_labels = self.df["MerchantSizeByDPV"].to_numpy()
-        # split the data into training (80%), validation (10%), and testing (10%) sets
-        self.X_train, X_temp, self.y_train, y_temp = train_test_split(
-            features, self.class_labels, test_size=val_size + test_size, random_state=42
-        )
-        self.X_val, self.X_test, self.y_val, self.y_test = train_test_split(
-            X_temp, y_temp, test_size=val_size / (val_size + test_size), random_state=42
+        # split the data into training (80%), validation (10%), and testing (10%) sets, the features of a set are
+        # copied on first use by X_train, X_val and X_test
+        self._features = features
+        self.train_indices, self.val_indices, self.test_indices = split_indices(
+            features.shape[0], val_size=val_size, test_size=test_size
         )
+        self.y_train = self.class_labels[self.train_indices]
+        self.y_val = self.class_labels[self.val_indices]
+        self.y_test = self.class_labels[self.test_indices]
         self.model_type = model_type
-        if model_type == Predictors.XGBoost:
-            self.dtrain_xgb = xgb.DMatrix(self.X_train, label=self.y_train)
-            self.dtest_xgb = xgb.DMatrix(self.X_test, label=self.y_test)
 
-        # Class weights to tackle the class imbalance
-        class_weights = class_weight.compute_class_weight(
-            "balanced", classes=np.unique(self.y_train), y=self.y_train
+        self.class_weight_dict = compute_class_weights(self.y_train)
+
+        self.lead_classifier = create_classifier(
+            model_type,
+            model_name=model_name,
+            class_weight=self.class_weight_dict,
+            **model_args,
         )
-        self.class_weight_dict = dict(zip(np.unique(self.y_train), class_weights))
-
-        match model_type:
-            case Predictors.RandomForest:
-                self.lead_classifier = RandomForest(
-                    model_name=model_name,
-                    class_weight=self.class_weight_dict,
-                    **model_args,
-                )
-            case Predictors.XGBoost:
-                self.lead_classifier = XGB(
-                    model_name=model_name,
-                    **model_args,
-                )
-            case Predictors.NaiveBayes:
-                self.lead_classifier = NaiveBayesClassifier(
-                    model_name=model_name,
-                    **model_args,
-                )
-            case Predictors.KNN:
-                self.lead_classifier = KNNClassifier(
-                    model_name=model_name, **model_args
-                )
-            case Predictors.AdaBoost:
-                self.lead_classifier = AdaBoost(model_name=model_name, **model_args)
-            case Predictors.LightGBM:
-                self.lead_classifier = LightGBM(model_name=model_name, **model_args)
-            case default:
-                log.error(
-                    f"Error: EVP initialized with unsupported model type {model_type}!"
-                )
+
+    @cached_property
+    def X_train(self):
+        return self._get_rows(self.train_indices)
+
+    @cached_property
+    def X_val(self):
+        return self._get_rows(self.val_indices)
+
+    @cached_property
+    def X_test(self):
+        return self._get_rows(self.test_indices)
+
+    def _get_rows(self, indices: np.ndarray):
+        return self._select_columns(self._features[indices])
+
+    def _select_columns(self, features):
+        if self._feature_columns is None:
+            return features
+        return features[:, self._feature_columns]
 
     def train(self, epochs=1, batch_size=None) -> None:
         self.lead_classifier.train(
@@ -116,8 +220,20 @@ class EstimatedValuePredictor:
             batch_size=batch_size,
         )
 
-    def save_model(self) -> None:
-        self.lead_classifier.save(num_classes=self.num_classes)
+    def save_model(self) -> str:
+        """
+        :return: File name of the saved model
+        """
+        model_name = self.lead_classifier.save(num_classes=self.num_classes)
+        # new leads have to be transformed like the training data, which was preprocessed with the latest transformer
+        transformer = load_transformer()
+        if transformer is not None:
+            get_database().save_ml_model(transformer, get_transformer_name(model_name))
+        else:
+            log.warning(
+                f"No preprocessing transformer found, model {model_name} is saved without it"
+            )
+        return model_name
 
     def predict(self, X) -> list[MerchantSizeByDPV]:
         # use the models to predict required values
@@ -129,7 +245,9 @@ class EstimatedValuePredictor:
             log.error("Cannot make predictions with untrained model!")
             return [MerchantSizeByDPV.Invalid]
         if self.model_type == Predictors.XGBoost:
-            merchant_size = self.lead_classifier.predict(self.dtest_xgb)
+            if not scipy.sparse.issparse(X):
+                X = np.asarray(X)
+            merchant_size = self.lead_classifier.predict(xgb.DMatrix(X))
         else:
             merchant_size = self.lead_classifier.predict(X)
         return merchant_size
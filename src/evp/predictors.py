@@ -6,6 +6,7 @@ from enum import Enum
 
 import lightgbm as lgb
 import xgboost as xgb
+from sklearn.base import clone
 from sklearn.ensemble import AdaBoostClassifier, RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report, f1_score
 from sklearn.naive_bayes import BernoulliNB
@@ -60,7 +61,8 @@ class Classifier(ABC):
     ) -> None:
         log.info(f"Training {type(self).__name__} for {epochs} epochs")
 
-        self.model.fit(X_train, y_train)
+        # a loaded model is shared through the model cache, it is trained as a new model instead of in place
+        self.model = clone(self.model).fit(X_train, y_train)
 
         y_pred = self.model.predict(X_test)
         f1_test = f1_score(y_test, y_pred, average="weighted")
@@ -73,7 +75,10 @@ class Classifier(ABC):
         self.epochs = epochs
         self.f1_test = f1_test
 
-    def save(self, num_classes: int = 5) -> None:
+    def save(self, num_classes: int = 5) -> str:
+        """
+        :return: File name of the saved model
+        """
         model_type = type(self).__name__
         try:
             f1_string = f"{self.f1_test:.4f}"
@@ -84,8 +89,13 @@ class Classifier(ABC):
         get_database().save_classification_report(
             self.classification_report, model_name
         )
+        return model_name
 
     def load(self, model_name: str) -> None:
+        """
+        Load a saved model and its classification report. Both are served from the model cache of the database if
+        they were loaded before, so loading the same model again in a long-running process is almost instant.
+        """
         loaded_model = get_database().load_ml_model(model_name)
         loaded_classification_report = get_database().load_classification_report(
             model_name
@@ -105,9 +115,11 @@ class RandomForest(Classifier):
         n_estimators=100,
         class_weight=None,
         random_state=42,
+        max_depth=None,
     ) -> None:
         super().__init__()
         self.random_state = random_state
+        self.max_depth = max_depth
         self.model = None
         if model_name is not None:
             self.load(model_name)
@@ -125,6 +137,7 @@ class RandomForest(Classifier):
         self.model = RandomForestClassifier(
             n_estimators=n_estimators,
             class_weight=class_weight,
+            max_depth=self.max_depth,
             random_state=self.random_state,
         )
 
@@ -213,11 +226,15 @@ class XGB(Classifier):
         model_name: str = None,
         num_rounds=2000,
         random_state=42,
+        max_depth=3,
+        learning_rate=0.1,
     ) -> None:
         super().__init__()
         self.random_state = random_state
         self.model = None
         self.num_rounds = num_rounds
+        self.max_depth = max_depth
+        self.learning_rate = learning_rate
         if model_name is not None:
             self.load(model_name)
             if self.model is None:
@@ -232,8 +249,8 @@ class XGB(Classifier):
         self.params = {
             "objective": "multi:softmax",
             "num_class": 5,
-            "max_depth": 3,
-            "learning_rate": 0.1,
+            "max_depth": self.max_depth,
+            "learning_rate": self.learning_rate,
             "eval_metric": "mlogloss",
         }
 
@@ -312,11 +329,15 @@ class LightGBM(Classifier):
         model_name: str = None,
         num_leaves=1000,
         random_state=42,
+        learning_rate=0.05,
+        n_estimators=100,
     ) -> None:
         super().__init__()
         self.random_state = random_state
         self.model = None
         self.num_leaves = num_leaves
+        self.learning_rate = learning_rate
+        self.n_estimators = n_estimators
         if model_name is not None:
             self.load(model_name)
             if self.model is None:
@@ -335,7 +356,8 @@ class LightGBM(Classifier):
             "num_class": 5,
             "num_leaves": self.num_leaves,
             "max_depth": -1,
-            "learning_rate": 0.05,
+            "learning_rate": self.learning_rate,
+            "n_estimators": self.n_estimators,
             "feature_fraction": 0.9,
         }
         self.model = lgb.LGBMClassifier(**self.params_lgb)
@@ -348,7 +370,7 @@ class LightGBM(Classifier):
     ) -> None:
         log.info("Training LightGBM")
 
-        self.model.fit(X_train, y_train)
+        self.model = clone(self.model).fit(X_train, y_train)
 
         # inference
         y_pred = self.model.predict(X_test)
@@ -0,0 +1,165 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import copy
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+
+from database import get_database
+from logger import get_logger
+from preprocessing.transformer import load_transformer
+
+log = get_logger()
+
+# Identity columns of the leads that are saved together with their predicted merchant size
+LEAD_ID_COLUMNS = ["Last Name", "First Name", "Company / Account", "Phone", "Email"]
+PREDICTION_COLUMN = "PredictedMerchantSize"
+
+# Default number of leads that are preprocessed and predicted at a time
+DEFAULT_SCORING_CHUNK_SIZE = 50_000
+
+# Merchant sizes by predicted class, for models trained on all 5 classes and on 3 classes (limit_classes)
+SIZE_LABELS = {
+    5: np.array(["XS", "S", "M", "L", "XL"], dtype=object),
+    3: np.array(["XS", "{S, M, L}", "XL"], dtype=object),
+}
+
+
+def get_num_classes(model_name: str) -> int:
+    """
+    :param model_name: File name of a model saved by Classifier.save
+    :return: Number of classes the model was trained on, 5 if the model name does not contain it
+    """
+    match = re.search(r"numclasses\((\d+)\)", model_name)
+    return int(match.group(1)) if match else 5
+
+
+class BatchScorer:
+    """
+    Predict the merchant size of all leads in batches. The enriched lead data is read in chunks, every chunk is
+    transformed with the preprocessing transformer of the model directly into a float32 feature matrix and
+    predicted by the model, which is loaded only once. The predictions are written chunk by chunk together with
+    the identity columns of the leads, so the memory usage does not depend on the number of leads.
+
+    The models predict with multiple threads (workers), while the next chunk is read and preprocessed in the
+    background.
+    """
+
+    def __init__(self, model_name: str, workers: int = None) -> None:
+        """
+        :param model_name: File name of the model, e.g. lightgbm_epochs(1)_f1(0.6375)_numclasses(5)_model.pkl
+        :param workers: Number of threads of the model, defaults to the number of CPUs
+        :raises ValueError: If the model or its preprocessing transformer cannot be loaded
+        """
+        self.model_name = model_name.strip()
+        self.workers = workers or os.cpu_count()
+        self.transformer = load_transformer(self.model_name)
+        if self.transformer is None:
+            raise ValueError(
+                "No preprocessing transformer found, preprocess the historical data first!"
+            )
+        self.model = get_database().load_ml_model(self.model_name)
+        if self.model is None:
+            raise ValueError(f"No model found with the name {self.model_name}!")
+        log.info(f"Loaded the model {self.model_name}!")
+        self.size_labels = SIZE_LABELS[get_num_classes(self.model_name)]
+        self._set_threads()
+
+    def _set_threads(self) -> None:
+        # the loaded model is shared with other scorers by the model cache, so the threads are set on a copy
+        if isinstance(self.model, xgb.Booster):
+            self.model = self.model.copy()
+            self.model.set_param({"nthread": self.workers})
+        elif "n_jobs" in self.model.get_params():
+            # RandomForest, KNN and LightGBM predict with n_jobs threads, the shallow copy shares the fitted model
+            self.model = copy.copy(self.model)
+            self.model.set_params(n_jobs=self.workers)
+
+    def get_input_columns(self) -> list[str]:
+        """
+        :return: Columns of the enriched data that are read for scoring
+        """
+        return (
+            self.transformer.numerical_columns
+            + self.transformer.categorical_columns
+            + self.transformer.multi_label_columns
+            + LEAD_ID_COLUMNS
+        )
+
+    def predict(self, leads: pd.DataFrame) -> np.ndarray:
+        """
+        :param leads: Enriched leads
+        :return: Predicted merchant size of every lead, e.g. "XS"
+        """
+        return self._predict_features(self._transform(leads))
+
+    def score(self, chunk_size: int = DEFAULT_SCORING_CHUNK_SIZE) -> dict:
+        """
+        Predict the merchant size of the enriched lead data and save the predictions
+        :param chunk_size: Number of leads that are preprocessed and predicted at a time
+        :return: Number of scored leads, duration in seconds and throughput in leads per second
+        """
+        start = time.perf_counter()
+        chunks = get_database().iter_enriched_dataframe(
+            chunk_size, historical=False, columns=self.get_input_columns()
+        )
+
+        def score_chunks():
+            scored = False
+            for leads, features in self._prefetch_features(chunks):
+                yield self._to_predictions(leads, self._predict_features(features))
+                scored = True
+            if not scored:
+                # the prediction file gets its header even without leads
+                yield pd.DataFrame(columns=LEAD_ID_COLUMNS + [PREDICTION_COLUMN])
+
+        rows = get_database().save_prediction_chunks(score_chunks())
+        seconds = time.perf_counter() - start
+        leads_per_second = rows / seconds if seconds > 0 else 0.0
+        log.info(
+            f"Scored {rows} leads in {seconds:.2f} s ({leads_per_second:.0f} leads/s)"
+        )
+        return {
+            "leads": rows,
+            "seconds": seconds,
+            "leads_per_second": leads_per_second,
+        }
+
+    def _prefetch_features(self, chunks):
+        # the next chunk is read and preprocessed in a background thread while the model predicts the current chunk,
+        # the models release the GIL while predicting
+        chunks = iter(chunks)
+
+        def next_chunk():
+            leads = next(chunks, None)
+            return None if leads is None else (leads, self._transform(leads))
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(next_chunk)
+            while (item := future.result()) is not None:
+                future = executor.submit(next_chunk)
+                yield item
+
+    def _transform(self, leads: pd.DataFrame):
+        return self.transformer.transform_array(leads)
+
+    def _predict_features(self, features) -> np.ndarray:
+        if features.shape[0] == 0:
+            return np.empty(0, dtype=object)
+        if isinstance(self.model, xgb.Booster):
+            features = xgb.DMatrix(features, nthread=self.workers)
+        classes = np.asarray(self.model.predict(features)).astype(int)
+        return self.size_labels[classes]
+
+    def _to_predictions(
+        self, leads: pd.DataFrame, predictions: np.ndarray
+    ) -> pd.DataFrame:
+        df = leads.reindex(columns=LEAD_ID_COLUMNS)
+        df[PREDICTION_COLUMN] = predictions
+        return df
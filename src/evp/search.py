@@ -0,0 +1,287 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import itertools
+import math
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from database.leads import FeatureStore, FeatureStoreWriter
+from evp.evp import (
+    SEED,
+    EstimatedValuePredictor,
+    compute_class_weights,
+    create_classifier,
+    split_indices,
+)
+from evp.predictors import XGB, Classifier, Predictors
+from logger import get_logger
+
+log = get_logger()
+
+SEARCH_METHODS = ["random", "halving"]
+
+# Candidate values of the hyperparameters of every model type, which are passed to the classifier of a trial
+SEARCH_SPACES = {
+    Predictors.RandomForest: {
+        "n_estimators": [50, 100, 200, 400],
+        "max_depth": [None, 10, 20, 40],
+    },
+    Predictors.XGBoost: {
+        "num_rounds": [100, 200, 500, 1000],
+        "max_depth": [3, 4, 6, 8],
+        "learning_rate": [0.03, 0.05, 0.1, 0.2],
+    },
+    Predictors.NaiveBayes: {},
+    Predictors.KNN: {
+        "n_neighbors": [5, 10, 20, 40],
+        "weights": ["uniform", "distance"],
+    },
+    Predictors.AdaBoost: {
+        "n_estimators": [25, 50, 100, 200],
+    },
+    Predictors.LightGBM: {
+        "num_leaves": [31, 127, 511, 1000],
+        "learning_rate": [0.03, 0.05, 0.1],
+        "n_estimators": [100, 200, 400],
+    },
+}
+
+DEFAULT_TRIALS = 16
+# Successive halving keeps the best 1 / HALVING_FACTOR of the configurations after every rung and trains them on
+# HALVING_FACTOR times as many leads
+HALVING_FACTOR = 3
+# Minimum number of leads the configurations are trained on in the first rungs of the successive halving
+MIN_HALVING_LEADS = 1000
+
+
+def _limit_threads(classifier: Classifier, threads: int) -> None:
+    if isinstance(classifier, XGB):
+        classifier.params["nthread"] = threads
+    elif "n_jobs" in classifier.model.get_params():
+        # RandomForest, KNN and LightGBM train with n_jobs threads
+        classifier.model.set_params(n_jobs=threads)
+
+
+def run_trial(
+    feature_store_directory: str,
+    model_type: Predictors,
+    params: dict,
+    train_indices: np.ndarray,
+    val_indices: np.ndarray,
+    threads: int,
+) -> dict:
+    """
+    Train a classifier with one configuration of hyperparameters and evaluate it on the validation set. Trials are
+    run in worker processes, which memory-map the same feature store, so the features are shared through the page
+    cache instead of being copied into every process.
+    :param train_indices: Sorted rows of the feature store the classifier is trained on
+    :param threads: Number of threads of the classifier
+    :return: Weighted F1 score on the validation set and training time in seconds
+    """
+    feature_store = FeatureStore(feature_store_directory)
+    start = time.perf_counter()
+    # only the rows of the trial are copied out of the memory-mapped features
+    X_train = feature_store.features[train_indices]
+    y_train = feature_store.labels[train_indices]
+    X_val = feature_store.features[val_indices]
+    y_val = feature_store.labels[val_indices]
+
+    classifier = create_classifier(
+        model_type, class_weight=compute_class_weights(y_train), **params
+    )
+    _limit_threads(classifier, threads)
+    classifier.train(X_train, y_train, X_val, y_val)
+    return {"f1": float(classifier.f1_test), "seconds": time.perf_counter() - start}
+
+
+class HyperparameterSearch:
+    """
+    Search the hyperparameters of a model type in SEARCH_SPACES, either by random search or by successive halving.
+
+    Random search trains every sampled configuration on the whole training set. Successive halving trains all
+    configurations on a sample of the training set first and only trains the best 1 / halving_factor of them on
+    halving_factor times as many leads in the next rung, until the remaining configurations are trained on the whole
+    training set. Every trial is evaluated on the validation set of EstimatedValuePredictor, the test set is only
+    used for the model that is saved.
+
+    The trials run in a pool of processes with a bounded number of threads each, so that trials do not compete for
+    the cores. All processes memory-map one feature store with the training data: the FeatureStore of the data or,
+    for a dataframe, a temporary feature store that is written once.
+    """
+
+    def __init__(
+        self,
+        data,
+        model_type: Predictors,
+        method: str = "random",
+        num_trials: int = DEFAULT_TRIALS,
+        processes: int = None,
+        threads: int = 1,
+        halving_factor: int = HALVING_FACTOR,
+        seed: int = SEED,
+    ) -> None:
+        """
+        :param data: Preprocessed leads including the class labels, a dataframe or a FeatureStore
+        :param method: One of SEARCH_METHODS
+        :param num_trials: Number of sampled configurations, at most the number of configurations in the search space
+        :param processes: Number of trials that run in parallel, defaults to the number of CPUs divided by threads.
+        With 1 the trials run in this process.
+        :param threads: Number of threads of every trial
+        :raises ValueError: If the method is unknown
+        """
+        if method not in SEARCH_METHODS:
+            raise ValueError(
+                f"Unknown search method {method}, has to be one of {SEARCH_METHODS}"
+            )
+        self.data = data
+        self.model_type = model_type
+        self.method = method
+        self.num_trials = num_trials
+        self.threads = threads
+        self.processes = processes or max(1, (os.cpu_count() or 1) // threads)
+        self.halving_factor = halving_factor
+        self.seed = seed
+
+    def sample_configurations(self) -> list[dict]:
+        """
+        :return: Distinct configurations of the hyperparameters, sampled from the search space of the model type
+        """
+        space = SEARCH_SPACES[self.model_type]
+        grid = [
+            dict(zip(space.keys(), values))
+            for values in itertools.product(*space.values())
+        ]
+        rng = np.random.default_rng(self.seed)
+        selected = rng.choice(
+            len(grid), size=min(self.num_trials, len(grid)), replace=False
+        )
+        return [grid[i] for i in selected]
+
+    def get_rungs(self, num_configurations: int, num_train: int) -> list[tuple]:
+        """
+        :return: Number of configurations and number of training leads of every rung
+        """
+        if self.method == "random":
+            return [(num_configurations, num_train)]
+        num_rungs = 1
+        while self.halving_factor**num_rungs <= num_configurations:
+            num_rungs += 1
+        return [
+            (
+                math.ceil(num_configurations / self.halving_factor**rung),
+                max(
+                    min(MIN_HALVING_LEADS, num_train),
+                    num_train // self.halving_factor ** (num_rungs - 1 - rung),
+                ),
+            )
+            for rung in range(num_rungs)
+        ]
+
+    def run(self) -> dict:
+        """
+        Run the trials of the search
+        :return: Best configuration ("params") and its validation F1 score ("f1"), every trial with its rung,
+        configuration, number of training leads, F1 score and training time in seconds ("trials") and the duration of
+        the search in seconds ("seconds")
+        """
+        start = time.perf_counter()
+        candidates = self.sample_configurations()
+        trials = []
+        with self._get_feature_store_directory() as directory, self._create_executor() as executor:
+            train, val, _ = split_indices(len(FeatureStore(directory)))
+            # the samples of the training set of successive rungs contain each other
+            train = np.random.default_rng(self.seed).permutation(train)
+            rungs = self.get_rungs(len(candidates), len(train))
+            log.info(
+                f"Searching {len(candidates)} configurations of {self.model_type.value} in {len(rungs)} rungs with "
+                f"{self.processes} processes of {self.threads} threads"
+            )
+            for rung, (num_configurations, num_train) in enumerate(rungs):
+                candidates = candidates[:num_configurations]
+                train_indices = np.sort(train[:num_train])
+                futures = [
+                    executor.submit(
+                        run_trial,
+                        directory,
+                        self.model_type,
+                        params,
+                        train_indices,
+                        val,
+                        self.threads,
+                    )
+                    for params in candidates
+                ]
+                results = []
+                for params, future in zip(candidates, futures):
+                    trial = {
+                        "trial": len(trials),
+                        "rung": rung,
+                        "params": params,
+                        "train_size": num_train,
+                    }
+                    try:
+                        trial |= future.result()
+                    except Exception as e:
+                        log.warning(f"Trial {trial['trial']} {params} failed: {e}")
+                        trial |= {"f1": None, "seconds": None}
+                    else:
+                        log.info(
+                            f"Trial {trial['trial']} {params} on {num_train} leads: F1 {trial['f1']:.4f} in "
+                            f"{trial['seconds']:.1f} s"
+                        )
+                    trials.append(trial)
+                    results.append(trial)
+                results.sort(
+                    key=lambda t: t["f1"] if t["f1"] is not None else -1, reverse=True
+                )
+                candidates = [trial["params"] for trial in results]
+
+        if results[0]["f1"] is None:
+            raise ValueError(f"All trials of {self.model_type.value} failed")
+        return {
+            "method": self.method,
+            "params": results[0]["params"],
+            "f1": results[0]["f1"],
+            "trials": trials,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def save_best_model(self, result: dict) -> str:
+        """
+        Train the best configuration of a search on the whole training set and save it with its transformer. The
+        search is saved in the classification report of the model.
+        :param result: Result of run()
+        :return: File name of the saved model
+        """
+        evp = EstimatedValuePredictor(
+            data=self.data, model_type=self.model_type, **result["params"]
+        )
+        evp.train()
+        evp.lead_classifier.classification_report["hyperparameter_search"] = result
+        return evp.save_model()
+
+    @contextmanager
+    def _get_feature_store_directory(self):
+        if isinstance(self.data, FeatureStore):
+            yield self.data.directory
+            return
+        with tempfile.TemporaryDirectory() as directory:
+            with FeatureStoreWriter(directory) as writer:
+                writer.write(self.data)
+            yield directory
+
+    def _create_executor(self):
+        if self.processes == 1:
+            # no worker process has to be started and import the models
+            return ThreadPoolExecutor(max_workers=1)
+        # forked processes can deadlock in the OpenMP runtime of LightGBM and XGBoost if it was used before the fork
+        return ProcessPoolExecutor(
+            max_workers=self.processes, mp_context=multiprocessing.get_context("spawn")
+        )
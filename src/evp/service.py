@@ -0,0 +1,245 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import json
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from evp.scoring import BatchScorer
+from logger import get_logger
+
+log = get_logger()
+
+# Requests arriving within this time after the first request of a batch are predicted together
+DEFAULT_MAX_WAIT_MS = 5
+# Maximum number of leads predicted together
+DEFAULT_MAX_BATCH_SIZE = 256
+# Number of the latest requests whose latencies are kept for the latency metrics
+LATENCY_WINDOW = 10_000
+
+
+class InvalidLeadsError(ValueError):
+    """
+    The leads of a request cannot be predicted, e.g. because a column is missing or has an invalid value
+    """
+
+
+class PredictionService:
+    """
+    Long-lived online prediction of the merchant size of single leads or small batches of leads. The preprocessing
+    transformer and the model are loaded once and kept in memory, see BatchScorer.
+
+    Requests are micro-batched: a worker thread collects the requests arriving within max_wait_ms after the first
+    waiting request, up to max_batch_size leads, transforms and predicts them together and returns every request
+    its predictions. The latencies of the requests, from submitting them until their predictions are available, are
+    kept for the latest LATENCY_WINDOW requests.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        max_wait_ms: float = DEFAULT_MAX_WAIT_MS,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        workers: int = None,
+    ) -> None:
+        """
+        :param model_name: File name of the model, e.g. lightgbm_epochs(1)_f1(0.6375)_numclasses(5)_model.pkl
+        :param max_wait_ms: Maximum time a request waits for other requests to be batched with, with 0 only the
+        requests that are already waiting are batched
+        :param max_batch_size: Maximum number of leads predicted together, 1 = every request is predicted alone
+        :param workers: Number of threads of the model, defaults to the number of CPUs
+        :raises ValueError: If the model or its preprocessing transformer cannot be loaded
+        """
+        self.scorer = BatchScorer(model_name, workers=workers)
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._requests = queue.Queue()
+        self._latencies = deque(maxlen=LATENCY_WINDOW)
+        self._batch_sizes = deque(maxlen=LATENCY_WINDOW)
+        self._worker = None
+
+    def start(self) -> "PredictionService":
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self._run, name="prediction-service", daemon=True
+            )
+            self._worker.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop the worker thread after the waiting requests were predicted
+        """
+        if self._worker is not None:
+            worker, self._worker = self._worker, None
+            self._requests.put(None)
+            worker.join()
+            # requests submitted while stopping are not predicted anymore
+            while not self._requests.empty():
+                request = self._requests.get_nowait()
+                if request is not None:
+                    request[1].set_exception(
+                        RuntimeError("The prediction service was stopped")
+                    )
+
+    def __enter__(self) -> "PredictionService":
+        return self.start()
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.stop()
+
+    def submit(self, leads) -> Future:
+        """
+        Submit enriched leads for prediction without waiting for the predictions
+        :param leads: Enriched lead as dict of column values or list of such dicts
+        :return: Future of the predicted merchant sizes, one per lead, e.g. ["XS"]
+        :raises RuntimeError: If the service is not started, its requests would never be predicted
+        """
+        if self._worker is None:
+            raise RuntimeError("The prediction service is not running, start it first")
+        if isinstance(leads, dict):
+            leads = [leads]
+        future = Future()
+        self._requests.put((list(leads), future, time.perf_counter()))
+        return future
+
+    def predict(self, leads, timeout: float = None) -> list[str]:
+        """
+        Predict the merchant size of enriched leads, see submit()
+        :param timeout: Maximum time to wait for the predictions in seconds
+        :raises InvalidLeadsError: If the leads cannot be predicted, e.g. because a numerical column is not a number
+        :raises RuntimeError: If the service is not running
+        """
+        return self.submit(leads).result(timeout)
+
+    def get_metrics(self) -> dict:
+        """
+        :return: Number of requests and p50 and p99 latency in milliseconds of the latest requests, mean number of
+        leads per predicted batch
+        """
+        latencies = np.array(self._latencies) * 1000
+        if len(latencies) == 0:
+            return {"requests": 0, "p50_ms": None, "p99_ms": None, "mean_batch": None}
+        return {
+            "requests": len(latencies),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p99_ms": float(np.percentile(latencies, 99)),
+            "mean_batch": float(np.mean(self._batch_sizes)),
+        }
+
+    def _run(self) -> None:
+        while (request := self._requests.get()) is not None:
+            batch = [request]
+            num_leads = len(request[0])
+            deadline = time.perf_counter() + self.max_wait
+            stopped = False
+            while num_leads < self.max_batch_size:
+                try:
+                    request = self._requests.get(
+                        timeout=max(deadline - time.perf_counter(), 0)
+                    )
+                except queue.Empty:
+                    break
+                if request is None:
+                    stopped = True
+                    break
+                batch.append(request)
+                num_leads += len(request[0])
+            self._predict_batch(batch)
+            if stopped:
+                return
+
+    def _predict_batch(self, batch: list) -> None:
+        try:
+            leads = pd.DataFrame.from_records(
+                [lead for lead_batch, _, _ in batch for lead in lead_batch]
+            )
+            predictions = self.scorer.predict(leads).tolist()
+        except Exception as e:
+            # the requests are predicted one by one, so only requests with invalid leads fail
+            if len(batch) > 1:
+                for request in batch:
+                    self._predict_batch([request])
+                return
+            error = InvalidLeadsError(f"{type(e).__name__}: {e}")
+            error.__cause__ = e
+            batch[0][1].set_exception(error)
+            return
+
+        start = 0
+        for lead_batch, future, submitted in batch:
+            future.set_result(predictions[start : start + len(lead_batch)])
+            start += len(lead_batch)
+            self._latencies.append(time.perf_counter() - submitted)
+        self._batch_sizes.append(len(predictions))
+
+
+class PredictionRequestHandler(BaseHTTPRequestHandler):
+    """
+    JSON endpoints of a PredictionService:
+        - POST /predict: a lead ({"google_places_rating": 4.5, ...}) or {"leads": [...]}, returns
+          {"predictions": ["XS", ...]}
+        - GET /metrics: the latency metrics of the service
+        - GET /health: {"status": "ok"}
+    """
+
+    service: PredictionService = None
+
+    def do_POST(self) -> None:
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            leads = body["leads"] if "leads" in body else body
+            predictions = self.service.predict(leads)
+        except (TypeError, ValueError) as e:
+            # invalid JSON, no leads or leads that cannot be predicted (InvalidLeadsError)
+            self._send_json(400, {"error": str(e)})
+            return
+        except Exception as e:
+            log.exception(f"Prediction request failed! {e}")
+            self._send_json(500, {"error": str(e)})
+            return
+        self._send_json(200, {"predictions": predictions})
+
+    def do_GET(self) -> None:
+        if self.path == "/metrics":
+            self._send_json(200, self.service.get_metrics())
+        elif self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def log_message(self, format, *args) -> None:
+        log.debug(f"{self.address_string()} {format % args}")
+
+    def _send_json(self, status: int, data: dict) -> None:
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def create_http_server(
+    service: PredictionService, host: str = "127.0.0.1", port: int = 8000
+) -> ThreadingHTTPServer:
+    """
+    Create a local HTTP server for a started PredictionService, every request is handled in its own thread
+    :param port: Port of the server, 0 = any free port
+    """
+    handler = type(
+        "ServicePredictionRequestHandler",
+        (PredictionRequestHandler,),
+        {"service": service},
+    )
+    return ThreadingHTTPServer((host, port), handler)
@@ -1,20 +1,43 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Felix Zailskas <felixzailskas@gmail.com>
 
+import argparse
 import os
+import sys
 
-from demo import (
+# Environment variables limiting the threads of the numerical libraries. The libraries only read them when they are
+# loaded, so they are set before the demos import numpy and pandas.
+THREAD_ENV_VARS = ["OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"]
+
+
+def limit_threads(argv: list[str]) -> None:
+    """
+    Limit the threads of the numerical libraries (OpenMP, BLAS) to the --workers argument of a subcommand
+    :param argv: Command line arguments without the program name
+    """
+    parser = argparse.ArgumentParser(prog="main.py", add_help=False)
+    parser.add_argument("--workers", type=int)
+    workers = parser.parse_known_args(argv)[0].workers
+    if workers is not None:
+        for env_var in THREAD_ENV_VARS:
+            os.environ[env_var] = str(workers)
+
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    limit_threads(sys.argv[1:])
+
+from demo import (  # noqa: E402
     evp_demo,
     get_multiple_choice,
     pipeline_demo,
     predict_MerchantSize_on_lead_data_demo,
     preprocessing_demo,
 )
-from logger import get_logger
+from demo.cli import parse_args, run_command  # noqa: E402
+from logger import get_logger  # noqa: E402
 
 abspath = os.path.abspath(__file__)
 dname = os.path.dirname(abspath)
-os.chdir(dname)
 
 log = get_logger()
 
@@ -29,6 +52,13 @@ PROMPT = "Choose demo:\n"
 EXIT = "Exit"
 
 if __name__ == "__main__":
+    # headless runs for scheduled jobs, see demo/cli.py
+    if len(sys.argv) > 1:
+        args = parse_args()
+        os.chdir(dname)
+        sys.exit(run_command(args))
+
+    os.chdir(dname)
     options = list(DEMOS.keys()) + [EXIT]
     while True:
         choice = get_multiple_choice(PROMPT, options)
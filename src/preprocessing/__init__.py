@@ -2,3 +2,4 @@
 # SPDX-FileCopyrightText: 2023 Ahmed Sheta <ahmed.sheta@fau.de>
 
 from .preprocessing import *
+from .transformer import *
@@ -2,35 +2,46 @@
 # SPDX-FileCopyrightText: 2023 Ahmed Sheta <ahmed.sheta@fau.de>
 
 
+import contextlib
 import os
 import sys
-from ast import literal_eval
 
 import pandas as pd
 from scipy import stats
-from sklearn.impute import SimpleImputer
-from sklearn.preprocessing import (
-    MinMaxScaler,
-    MultiLabelBinarizer,
-    Normalizer,
-    OneHotEncoder,
-    RobustScaler,
-    StandardScaler,
-)
+from sklearn.preprocessing import Normalizer
 
 current_dir = os.path.dirname(__file__) if "__file__" in locals() else os.getcwd()
 parent_dir = os.path.join(current_dir, "..")
 sys.path.append(parent_dir)
 from database import get_database
+from database.leads import FeatureStoreWriter, get_storage_format, write_dataframe
 from logger import get_logger
+from preprocessing.transformer import (
+    PREPROCESSING_TRANSFORMER,
+    PreprocessingTransformer,
+)
 
 sys.path.append(current_dir)
 log = get_logger()
 
 
 class Preprocessing:
-    def __init__(self, filter_null_data=True, historical_bool=True):
+    def __init__(
+        self,
+        filter_null_data=True,
+        historical_bool=True,
+        transformer: PreprocessingTransformer = None,
+        sparse: bool = False,
+    ):
+        """
+        :param filter_null_data: Filter out leads without Google Places data
+        :param historical_bool: Preprocess the historical data instead of the lead data. The transformer is fitted
+        on the historical data and saved, the lead data is transformed with the saved transformer.
+        :param transformer: Fitted transformer to use instead of the saved one, e.g. the transformer of a model
+        :param sparse: Keep the features as sparse columns, see PreprocessingTransformer
+        """
         data_repo = get_database()
+        self.historical_bool = historical_bool
         self.data_path = data_repo.get_enriched_data_path(historical=historical_bool)
         self.preprocessed_df = None
         self.preprocessed_data_output_path = data_repo.get_preprocessed_data_path(
@@ -38,6 +49,9 @@ class Preprocessing:
         )
 
         self.filter_bool = filter_null_data
+        self.transformer = transformer
+        self.transformer_fitted = False
+        self.sparse = sparse
         # columns that would be added later after one-hot encoding each class
         self.added_features = []
         self.numerical_data = [
@@ -74,8 +88,12 @@ class Preprocessing:
             "regional_atlas_pop_avg_age_zensus",
             "regional_atlas_regional_score",
         ]
-        # numerical data that need scaling
+        # numerical data that need scaling, robust scaling unless scaling_strategies selects another strategy
         self.data_to_scale = []
+        # strategies of the numerical data by column, see NumericalTransformer. Missing values are filled with 0
+        # unless imputation_strategies selects another strategy.
+        self.imputation_strategies = {}
+        self.scaling_strategies = {}
 
         # categorical data that needs one-hot encoding
         self.categorical_data = [
@@ -87,51 +105,21 @@ class Preprocessing:
 
         self.class_labels = "MerchantSizeByDPV"
 
+    def load_data(self):
+        """
+        Load the enriched data, reading only the columns that are used for preprocessing
+        """
+        self.preprocessed_df = get_database().load_enriched_dataframe(
+            historical=self.historical_bool,
+            columns=self.numerical_data + self.categorical_data + [self.class_labels],
+        )
+        return self.preprocessed_df
+
     def filter_out_null_data(self):
         self.preprocessed_df = self.preprocessed_df[
             self.preprocessed_df["google_places_rating"].notnull()
         ]
 
-    def fill_missing_values(self, column, strategy="constant"):
-        if (
-            column in self.preprocessed_df.columns
-            and not self.preprocessed_df[column].empty
-        ):
-            imputer = SimpleImputer(strategy=strategy)
-            self.preprocessed_df[column] = imputer.fit_transform(
-                self.preprocessed_df[[column]]
-            )
-        else:
-            log.info(f"The column '{column}' does not exist in the DataFrame.")
-
-        return self.preprocessed_df
-
-    def standard_scaling(self, column):
-        # scales the data in such that the mean of the data becomes 0 and the standard deviation becomes 1.
-        if column in self.preprocessed_df.columns:
-            scaler = StandardScaler()
-            self.preprocessed_df[column] = scaler.fit_transform(
-                self.preprocessed_df[[column]]
-            )
-        return self.preprocessed_df
-
-    def min_max_scaling(self, column):
-        # scales the data to a given range, usually between 0 and 1.
-        if column in self.preprocessed_df.columns:
-            scaler = MinMaxScaler()
-            self.preprocessed_df[column] = scaler.fit_transform(
-                self.preprocessed_df[[column]]
-            )
-        return self.preprocessed_df
-
-    def robust_scaling(self, column):
-        if column in self.preprocessed_df.columns:
-            scaler = RobustScaler()
-            self.preprocessed_df[column] = scaler.fit_transform(
-                self.preprocessed_df[[column]]
-            )
-        return self.preprocessed_df
-
     def normalization(self, column):
         if column in self.preprocessed_df.columns:
             scaler = Normalizer()
@@ -158,72 +146,58 @@ class Preprocessing:
             log.info(f"Class labels {column} does not exist in the dataframe!")
         return self.preprocessed_df
 
-    def single_one_hot_encoding(self, column):
-        # one-hot encoding categorical data and creating columns for the newly created classes
-        if column in self.preprocessed_df.columns:
-            data_to_encode = self.preprocessed_df[[column]].fillna("").astype(str)
-            encoder = OneHotEncoder(sparse=False)
-            encoded_data = encoder.fit_transform(data_to_encode)
-            encoded_columns = encoder.get_feature_names_out([column])
-            self.added_features.extend(encoded_columns)
-            encoded_df = pd.DataFrame(
-                encoded_data, columns=encoded_columns, index=self.preprocessed_df.index
-            )
-            self.preprocessed_df = pd.concat([self.preprocessed_df, encoded_df], axis=1)
-        else:
-            log.info(f"The column '{column}' does not exist in the DataFrame.")
-
-        return self.preprocessed_df
+    def create_transformer(self) -> PreprocessingTransformer:
+        """
+        Create an unfitted transformer of the features
+        """
+        return PreprocessingTransformer(
+            numerical_columns=self.numerical_data,
+            categorical_columns=[
+                col
+                for col in self.categorical_data
+                if col != "google_places_detailed_type"
+            ],
+            multi_label_columns=["google_places_detailed_type"],
+            columns_to_scale=self.data_to_scale,
+            imputation_strategies=self.imputation_strategies,
+            scaling_strategies=self.scaling_strategies,
+        )
 
-    def multiple_label_encoding(self, column):
-        if column in self.preprocessed_df.columns:
-            # one-hot encoding for the columns that has multiple labels as element
-            self.preprocessed_df[column].fillna("", inplace=True)
-            self.preprocessed_df[column] = self.preprocessed_df[column].apply(
-                lambda x: literal_eval(x) if x != "" else []
-            )
-            mlb = MultiLabelBinarizer()
-            encoded_data = mlb.fit_transform(self.preprocessed_df[column])
-            self.added_features.extend(mlb.classes_)
-            if self.filter_bool:
-                encoded_df = pd.DataFrame(
-                    encoded_data, columns=mlb.classes_, index=self.preprocessed_df.index
+    def load_saved_transformer(self) -> PreprocessingTransformer:
+        """
+        Load the transformer of the historical data to transform the lead data with, unless a transformer was given
+        :return: The transformer or None if it has to be fitted
+        """
+        if self.transformer is None and not self.historical_bool:
+            self.transformer = get_database().load_ml_model(PREPROCESSING_TRANSFORMER)
+            if self.transformer is None:
+                log.warning(
+                    "No transformer of the historical data found, fitting it on the lead data. The features may not match the features of the models!"
                 )
-            else:
-                encoded_df = pd.DataFrame(encoded_data, columns=mlb.classes_)
-            self.preprocessed_df = pd.concat([self.preprocessed_df, encoded_df], axis=1)
-        else:
-            log.info(f"The column '{column}' does not exist in the DataFrame.")
+        return self.transformer
 
-        return self.preprocessed_df
+    def get_transformer(self) -> PreprocessingTransformer:
+        """
+        Get the transformer of the features. A new transformer is fitted on the historical data, the lead data is
+        transformed with the transformer of the historical data.
+        """
+        if self.load_saved_transformer() is None:
+            self.transformer = self.create_transformer().fit(self.preprocessed_df)
+            self.transformer_fitted = True
+        return self.transformer
 
     def implement_preprocessing_pipeline(self):
         if self.filter_bool:
             self.filter_out_null_data()
 
-        for data_column in self.numerical_data:
-            self.preprocessed_df = self.fill_missing_values(data_column)
-            if data_column in self.data_to_scale:
-                self.preprocessed_df = self.robust_scaling(data_column)
-
-        for data_column in self.categorical_data:
-            if data_column == "google_places_detailed_type":
-                continue
-            try:
-                self.preprocessed_df = self.single_one_hot_encoding(data_column)
-            except ValueError as e:
-                log.error(
-                    f"Failed to one-hot encode data type ({data_column})! Error: {e}"
-                )
-
-        try:
-            self.preprocessed_df = self.multiple_label_encoding(
-                "google_places_detailed_type"
-            )
-        except ValueError as e:
-            log.error(
-                f"Failed to one-hot encode data type 'google_places_detailed_type'! Error: {e}"
-            )
+        transformer = self.get_transformer()
+        features = transformer.transform(self.preprocessed_df, sparse=self.sparse)
+        self.added_features = [
+            col for col in features.columns if col not in transformer.numerical_columns
+        ]
+        if self.class_labels in self.preprocessed_df:
+            features[self.class_labels] = self.preprocessed_df[self.class_labels]
+        self.preprocessed_df = features
 
         try:
             self.preprocessed_df = self.class_label_encoding(self.class_labels)
@@ -235,21 +209,107 @@ class Preprocessing:
         return self.preprocessed_df
 
     def save_preprocessed_data(self):
-        columns_to_save = []
-        columns_to_save.extend(self.numerical_data)
-        columns_to_save.extend(self.added_features)
-        columns_to_save.append(self.class_labels)
-        selected_df = pd.DataFrame()
         try:
-            for column in columns_to_save:
-                if column in self.preprocessed_df.columns:
-                    selected_df[column] = self.preprocessed_df[column]
-        except ValueError as e:
-            log.error(f"Failed to save the selected columns for preprocessing! {e}")
-        try:
-            selected_df.to_csv(self.preprocessed_data_output_path, index=False)
+            write_dataframe(
+                self._to_dense(self.preprocessed_df),
+                self.preprocessed_data_output_path,
+                get_storage_format(self.preprocessed_data_output_path),
+            )
             log.info(
                 f"Preprocessed dataframe of shape {self.preprocessed_df.shape} is saved at {self.preprocessed_data_output_path}"
             )
         except ValueError as e:
             log.error(f"Failed to save preprocessed data file! {e}")
+        else:
+            feature_store = self.open_feature_store_writer()
+            if feature_store is not None:
+                with feature_store:
+                    feature_store.write(self.preprocessed_df)
+
+        self.save_transformer()
+
+    def open_feature_store_writer(self):
+        """
+        Open a writer of the FeatureStore, whose memory-mapped features the models only copy the rows of a data
+        set from when the set is used
+        :return: The FeatureStoreWriter or None if the database has no feature store
+        """
+        directory = get_database().get_feature_store_path(self.historical_bool)
+        if directory is None:
+            return None
+        return FeatureStoreWriter(
+            directory,
+            label_column=self.class_labels,
+            source_path=get_database().get_preprocessed_data_path(self.historical_bool),
+        )
+
+    def save_transformer(self):
+        # the models trained on the preprocessed historical data are saved with this transformer
+        if self.historical_bool and self.transformer_fitted:
+            get_database().save_ml_model(self.transformer, PREPROCESSING_TRANSFORMER)
+
+    def preprocess_in_chunks(self, chunk_size: int) -> int:
+        """
+        Preprocess the enriched data out-of-core, with two passes over chunks of chunk_size leads, such that the
+        memory usage does not depend on the number of leads. The first pass fits the transformer, unless the lead
+        data is transformed with the saved transformer. The second pass transforms every chunk and saves it.
+        Replaces load_data(), implement_preprocessing_pipeline() and save_preprocessed_data().
+        :return: Number of saved rows
+        :raises ValueError: If there are no leads to fit the transformer on
+        """
+        if self.load_saved_transformer() is None:
+            transformer = self.create_transformer()
+            for chunk in self.iter_data(chunk_size):
+                self.preprocessed_df = chunk
+                if self.filter_bool:
+                    self.filter_out_null_data()
+                transformer.partial_fit(self.preprocessed_df)
+            if transformer.feature_names_ is None:
+                raise ValueError(
+                    "The preprocessing transformer cannot be fitted without leads!"
+                )
+            log.info(
+                f"Fitted preprocessing transformer with {len(transformer.feature_names_)} features"
+            )
+            self.transformer = transformer
+            self.transformer_fitted = True
+
+        def preprocess_chunks():
+            for chunk in self.iter_data(chunk_size):
+                self.preprocessed_df = chunk
+                df = self._to_dense(self.implement_preprocessing_pipeline())
+                if self.class_labels in df:
+                    # all chunks get the same type, also if only some of them have missing labels
+                    df[self.class_labels] = df[self.class_labels].astype("Int64")
+                if feature_store is not None:
+                    feature_store.write(df)
+                yield df
+
+        with self.open_feature_store_writer() or contextlib.nullcontext() as feature_store:
+            rows = get_database().save_preprocessed_data_chunks(
+                preprocess_chunks(), historical=self.historical_bool
+            )
+        self.preprocessed_df = None
+        self.save_transformer()
+        return rows
+
+    def iter_data(self, chunk_size: int):
+        """
+        Read the enriched data in chunks, reading only the columns that are used for preprocessing
+        """
+        return get_database().iter_enriched_dataframe(
+            chunk_size,
+            historical=self.historical_bool,
+            columns=self.numerical_data + self.categorical_data + [self.class_labels],
+        )
+
+    @staticmethod
+    def _to_dense(df: pd.DataFrame) -> pd.DataFrame:
+        # Parquet does not support sparse columns
+        return df.astype(
+            {
+                col: dtype.subtype
+                for col, dtype in df.dtypes.items()
+                if isinstance(dtype, pd.SparseDtype)
+            }
+        )
@@ -0,0 +1,519 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import itertools
+import warnings
+
+import numpy as np
+import pandas as pd
+import scipy.sparse
+from sklearn.preprocessing import MultiLabelBinarizer, OneHotEncoder
+
+from database import get_database
+from database.leads import decode_list_column
+from logger import get_logger
+
+log = get_logger()
+
+# Model name of the transformer fitted by the latest preprocessing of the historical data
+PREPROCESSING_TRANSFORMER = "preprocessing_transformer.pkl"
+
+
+def get_transformer_name(model_name: str) -> str:
+    """
+    :return: Name under which the transformer of the given model is saved next to it
+    """
+    return f"preprocessing_{model_name}"
+
+
+def load_transformer(model_name: str = None):
+    """
+    Load the transformer saved with a model. Models that were saved without a transformer use the transformer of
+    the latest preprocessing of the historical data.
+    :param model_name: File name of the model, None to load the transformer of the historical data
+    :return: The fitted PreprocessingTransformer or None if no transformer was saved
+    """
+    if model_name is not None:
+        transformer = get_database().load_ml_model(get_transformer_name(model_name))
+        if transformer is not None:
+            return transformer
+        log.warning(
+            f"No transformer saved with model {model_name}, using the transformer of the historical data"
+        )
+    return get_database().load_ml_model(PREPROCESSING_TRANSFORMER)
+
+
+def parse_list_column(column: pd.Series) -> list:
+    """
+    Parse a column of lists, see decode_list_column. Missing values become empty lists.
+    """
+    return [
+        value if isinstance(value, (list, np.ndarray)) else []
+        for value in decode_list_column(column)
+    ]
+
+
+# Strategies of NumericalTransformer, missing values are imputed before scaling
+IMPUTATION_STRATEGIES = ["constant", "mean", "median"]
+SCALING_STRATEGIES = ["robust", "standard", "min_max"]
+
+
+class NumericalTransformer:
+    """
+    Imputes and scales numerical columns. All columns are processed together as one 2-D float32 array, instead of
+    fitting a separate imputer and scaler per column. Every column has its own strategies:
+        - imputation: "constant" fills 0, "mean" and "median" fill the statistic of the column
+        - scaling: "robust" subtracts the median and divides by the interquartile range, "standard" subtracts the
+          mean and divides by the standard deviation, "min_max" scales to [0, 1], columns without a strategy are
+          not scaled
+
+    The fitted statistics are kept in fill_values_, center_ and scale_, one value per column, so that new leads are
+    transformed like the data the transformer was fitted on. Columns without values are filled with 0.
+
+    With partial_fit the transformer is fitted chunk by chunk. Counts, means, variances and ranges are merged
+    exactly, medians and quartiles are computed from a uniform sample of at most sample_size rows, which is exact
+    as long as no more rows were seen. The sample is not saved when the transformer is pickled.
+    """
+
+    # Default number of rows sampled for medians and quartiles
+    SAMPLE_SIZE = 200_000
+
+    def __init__(
+        self,
+        columns: list[str],
+        imputation_strategies: dict[str, str] = None,
+        scaling_strategies: dict[str, str] = None,
+        sample_size: int = SAMPLE_SIZE,
+    ) -> None:
+        """
+        :param columns: Names of the numerical columns
+        :param imputation_strategies: Imputation strategy by column, "constant" if a column is missing
+        :param scaling_strategies: Scaling strategy by column, columns that are missing are not scaled
+        :param sample_size: Maximum number of rows kept for medians and quartiles
+        :raises ValueError: If a strategy is unknown
+        """
+        self.columns = list(columns)
+        self.imputation_strategies = {
+            col: strategy
+            for col, strategy in (imputation_strategies or {}).items()
+            if col in self.columns
+        }
+        self.scaling_strategies = {
+            col: strategy
+            for col, strategy in (scaling_strategies or {}).items()
+            if col in self.columns
+        }
+        for strategy in self.imputation_strategies.values():
+            if strategy not in IMPUTATION_STRATEGIES:
+                raise ValueError(
+                    f"Unknown imputation strategy {strategy}, has to be one of {IMPUTATION_STRATEGIES}"
+                )
+        for strategy in self.scaling_strategies.values():
+            if strategy not in SCALING_STRATEGIES:
+                raise ValueError(
+                    f"Unknown scaling strategy {strategy}, has to be one of {SCALING_STRATEGIES}"
+                )
+        self.sample_size = sample_size
+        self.fill_values_ = None
+        self.center_ = None
+        self.scale_ = None
+        self._state = None
+
+    def fit(self, df: pd.DataFrame) -> "NumericalTransformer":
+        """
+        :raises ValueError: If df has no rows
+        """
+        self.fill_values_ = self.center_ = self.scale_ = None
+        self._state = None
+        self.partial_fit(df)
+        if self.fill_values_ is None:
+            raise ValueError("The numerical transformer cannot be fitted without rows!")
+        return self
+
+    def partial_fit(self, df: pd.DataFrame) -> "NumericalTransformer":
+        """
+        Update the statistics with another chunk of rows
+        :raises ValueError: If the transformer was loaded from a pickle, its statistics cannot be updated
+        """
+        if self._state is None:
+            if self.fill_values_ is not None:
+                raise ValueError(
+                    "A loaded numerical transformer cannot be updated, fit a new transformer instead!"
+                )
+            num_columns = len(self.columns)
+            self._state = {
+                "rows": 0,
+                "count": np.zeros(num_columns),
+                "mean": np.zeros(num_columns),
+                "m2": np.zeros(num_columns),
+                "min": np.full(num_columns, np.inf),
+                "max": np.full(num_columns, -np.inf),
+                "sample": np.empty((0, len(self._get_sampled_indices())), np.float32),
+                "sample_keys": np.empty(0),
+                "rng": np.random.default_rng(0),
+            }
+        if len(df) == 0:
+            return self
+
+        data = self._to_array(df)
+        self._update_moments(data)
+        self._update_sample(data)
+        self._update_statistics()
+        return self
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """
+        :return: Imputed and scaled float32 array with one column per column of the transformer. Columns that are
+        not part of df are imputed.
+        """
+        if self.fill_values_ is None:
+            raise ValueError("The numerical transformer has not been fitted!")
+        data = self._impute(self._to_array(df))
+        data -= self.center_
+        data /= self.scale_
+        return data
+
+    def fit_transform(self, df: pd.DataFrame) -> np.ndarray:
+        return self.fit(df).transform(df)
+
+    def get_statistics(self) -> pd.DataFrame:
+        """
+        :return: Fitted fill value, center and scale of every column
+        """
+        return pd.DataFrame(
+            {
+                "fill_value": self.fill_values_,
+                "center": self.center_,
+                "scale": self.scale_,
+            },
+            index=self.columns,
+        )
+
+    def __getstate__(self) -> dict:
+        return self.__dict__ | {"_state": None}
+
+    def _update_moments(self, data: np.ndarray) -> None:
+        # counts, means and sums of squared deviations of the present values are merged with the previous chunks
+        state = self._state
+        present = ~np.isnan(data)
+        count = present.sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            mean = np.nan_to_num(np.nanmean(data, axis=0, dtype=np.float64))
+            state["min"] = np.fmin(state["min"], np.nanmin(data, axis=0))
+            state["max"] = np.fmax(state["max"], np.nanmax(data, axis=0))
+        m2 = np.nansum(np.square(data - mean, dtype=np.float64), axis=0)
+
+        total = state["count"] + count
+        delta = mean - state["mean"]
+        ratio = np.divide(count, total, out=np.zeros_like(delta), where=total > 0)
+        state["mean"] = state["mean"] + delta * ratio
+        state["m2"] = state["m2"] + m2 + delta**2 * state["count"] * ratio
+        state["count"] = total
+        state["rows"] += len(data)
+
+    def _update_sample(self, data: np.ndarray) -> None:
+        # uniform sample without replacement: the rows with the sample_size smallest random keys are kept
+        state = self._state
+        sampled = self._get_sampled_indices()
+        if len(sampled) == 0:
+            return
+        sample = np.concatenate([state["sample"], data[:, sampled]])
+        keys = np.concatenate([state["sample_keys"], state["rng"].random(len(data))])
+        if len(keys) > self.sample_size:
+            kept = np.argpartition(keys, self.sample_size)[: self.sample_size]
+            sample, keys = sample[kept], keys[kept]
+        state["sample"], state["sample_keys"] = sample, keys
+
+    def _update_statistics(self) -> None:
+        state = self._state
+        rows, count = state["rows"], state["count"]
+        sampled = self._get_sampled_indices()
+        sample = state["sample"].copy()
+
+        fill_values = np.zeros(len(self.columns))
+        mean = self._get_indices(self.imputation_strategies, "mean")
+        fill_values[mean] = state["mean"][mean]
+        median = self._get_indices(self.imputation_strategies, "median")
+        if len(median) > 0:
+            with warnings.catch_warnings():
+                # medians of columns without values are nan and replaced by 0
+                warnings.simplefilter("ignore", RuntimeWarning)
+                fill_values[median] = np.nanmedian(
+                    sample[:, np.searchsorted(sampled, median)], axis=0
+                )
+        fill_values = np.nan_to_num(fill_values)
+        missing = rows - count
+
+        # statistics of the imputed columns, as if the missing values had been filled before fitting
+        imputed_mean = (count * state["mean"] + missing * fill_values) / rows
+        imputed_m2 = (
+            state["m2"]
+            + count * (state["mean"] - imputed_mean) ** 2
+            + missing * (fill_values - imputed_mean) ** 2
+        )
+        imputed_min = np.where(
+            missing > 0, np.fmin(state["min"], fill_values), state["min"]
+        )
+        imputed_max = np.where(
+            missing > 0, np.fmax(state["max"], fill_values), state["max"]
+        )
+        rows_with_nan, cols_with_nan = np.nonzero(np.isnan(sample))
+        sample[rows_with_nan, cols_with_nan] = fill_values[sampled][cols_with_nan]
+
+        center = np.zeros(len(self.columns))
+        scale = np.ones(len(self.columns))
+        robust = self._get_indices(self.scaling_strategies, "robust")
+        if len(robust) > 0:
+            q25, q50, q75 = np.percentile(
+                sample[:, np.searchsorted(sampled, robust)], [25, 50, 75], axis=0
+            )
+            center[robust], scale[robust] = q50, q75 - q25
+        standard = self._get_indices(self.scaling_strategies, "standard")
+        center[standard] = imputed_mean[standard]
+        scale[standard] = np.sqrt(imputed_m2[standard] / rows)
+        min_max = self._get_indices(self.scaling_strategies, "min_max")
+        center[min_max] = imputed_min[min_max]
+        scale[min_max] = imputed_max[min_max] - imputed_min[min_max]
+        # constant columns are only centered, like in scikit-learn
+        scale[~np.isfinite(scale) | (scale == 0)] = 1
+        center[~np.isfinite(center)] = 0
+
+        self.fill_values_ = fill_values.astype(np.float32)
+        self.center_ = center.astype(np.float32)
+        self.scale_ = scale.astype(np.float32)
+
+    def _to_array(self, df: pd.DataFrame) -> np.ndarray:
+        return np.array(df.reindex(columns=self.columns), dtype=np.float32)
+
+    def _impute(self, data: np.ndarray) -> np.ndarray:
+        rows, cols = np.nonzero(np.isnan(data))
+        data[rows, cols] = self.fill_values_[cols]
+        return data
+
+    def _get_indices(self, strategies: dict[str, str], strategy: str) -> np.ndarray:
+        return np.array(
+            [
+                i
+                for i, col in enumerate(self.columns)
+                if strategies.get(col) == strategy
+            ],
+            dtype=int,
+        )
+
+    def _get_sampled_indices(self) -> np.ndarray:
+        # medians and quartiles are needed for median imputation and robust scaling
+        return np.union1d(
+            self._get_indices(self.imputation_strategies, "median"),
+            self._get_indices(self.scaling_strategies, "robust"),
+        ).astype(int)
+
+
+class PreprocessingTransformer:
+    """
+    Transforms enriched leads into the feature matrix of the models. All encodings are fitted once, on the
+    historical data, and the fitted transformer is saved with the models. New leads are transformed with the
+    fitted encodings, so they always get the same feature columns as the training data: Missing numerical columns
+    are imputed, unknown categories and labels are ignored.
+
+    The transformer is applied in the following stages:
+        - numerical columns: imputation of missing values and scaling, see NumericalTransformer
+        - categorical columns: one-hot encoding, one column per category named <column>_<category>
+        - multi-label columns: one column per label, named by the label
+
+    Most of the encoded features are zero, e.g. a lead has a few of the hundreds of place types. With sparse=True
+    the encodings are never materialized as dense arrays and the features are returned as sparse columns.
+    """
+
+    def __init__(
+        self,
+        numerical_columns: list[str],
+        categorical_columns: list[str],
+        multi_label_columns: list[str],
+        columns_to_scale: list[str] = None,
+        imputation_strategies: dict[str, str] = None,
+        scaling_strategies: dict[str, str] = None,
+    ) -> None:
+        """
+        :param columns_to_scale: Numerical columns with robust scaling
+        :param imputation_strategies: Imputation strategy by numerical column, defaults to "constant"
+        :param scaling_strategies: Scaling strategy by numerical column, overrides the scaling of columns_to_scale
+        """
+        self.numerical_columns = numerical_columns
+        self.categorical_columns = categorical_columns
+        self.multi_label_columns = multi_label_columns
+        self.columns_to_scale = columns_to_scale or []
+        self.imputation_strategies = imputation_strategies or {}
+        self.scaling_strategies = scaling_strategies or {}
+        self.numerical_transformer = None
+        self.one_hot_encoder = None
+        self.multi_label_binarizers = {}
+        self.feature_names_ = None
+        self._vocabularies = None
+
+    def fit(self, df: pd.DataFrame) -> "PreprocessingTransformer":
+        """
+        Fit all encodings on the given leads. Columns that are not part of the leads are not used as features.
+        :raises ValueError: If df has no rows
+        """
+        self.numerical_transformer = None
+        self.feature_names_ = None
+        self.partial_fit(df)
+        if self.feature_names_ is None:
+            raise ValueError(
+                "The preprocessing transformer cannot be fitted without leads!"
+            )
+        log.info(
+            f"Fitted preprocessing transformer with {len(self.feature_names_)} features"
+        )
+        return self
+
+    def partial_fit(self, df: pd.DataFrame) -> "PreprocessingTransformer":
+        """
+        Update the encodings with another chunk of leads, e.g. to fit the transformer on data that does not fit into
+        memory. The columns used as features are selected on the first chunk. Categories and labels are collected
+        from all chunks, see NumericalTransformer.partial_fit for the numerical statistics.
+        :raises ValueError: If the transformer was loaded from a pickle, its encodings cannot be updated
+        """
+        if self.numerical_transformer is None:
+            self._start_fit(df)
+        elif self._vocabularies is None:
+            raise ValueError(
+                "A loaded preprocessing transformer cannot be updated, fit a new transformer instead!"
+            )
+        if len(df) == 0:
+            return self
+
+        self.numerical_transformer.partial_fit(df)
+        categorical_data = self._get_categorical_data(df)
+        for col in self.categorical_columns:
+            self._vocabularies[col].update(categorical_data[col].unique())
+        for col in self.multi_label_columns:
+            self._vocabularies[col].update(
+                itertools.chain.from_iterable(parse_list_column(df[col]))
+            )
+        self._update_encoders()
+        return self
+
+    def _start_fit(self, df: pd.DataFrame) -> None:
+        self.numerical_columns = [col for col in self.numerical_columns if col in df]
+        self.categorical_columns = [
+            col for col in self.categorical_columns if col in df
+        ]
+        self.multi_label_columns = [
+            col for col in self.multi_label_columns if col in df
+        ]
+        self.columns_to_scale = [
+            col for col in self.columns_to_scale if col in self.numerical_columns
+        ]
+        self.numerical_transformer = NumericalTransformer(
+            self.numerical_columns,
+            imputation_strategies=self.imputation_strategies,
+            scaling_strategies={col: "robust" for col in self.columns_to_scale}
+            | self.scaling_strategies,
+        )
+        self._vocabularies = {
+            col: set() for col in self.categorical_columns + self.multi_label_columns
+        }
+
+    def _update_encoders(self) -> None:
+        # the encoders get the sorted vocabularies, like when they are fitted on all leads at once
+        feature_names = list(self.numerical_columns)
+        if self.categorical_columns:
+            categories = [
+                sorted(self._vocabularies[col]) for col in self.categorical_columns
+            ]
+            self.one_hot_encoder = OneHotEncoder(
+                categories=categories, handle_unknown="ignore", sparse_output=True
+            )
+            self.one_hot_encoder.fit(
+                pd.DataFrame(
+                    [[values[0] for values in categories]],
+                    columns=self.categorical_columns,
+                )
+            )
+            feature_names.extend(self.one_hot_encoder.get_feature_names_out())
+        self.multi_label_binarizers = {}
+        for col in self.multi_label_columns:
+            mlb = MultiLabelBinarizer(
+                classes=sorted(self._vocabularies[col]), sparse_output=True
+            )
+            mlb.fit([])
+            self.multi_label_binarizers[col] = mlb
+            feature_names.extend(mlb.classes_)
+        self.feature_names_ = feature_names
+
+    def transform(self, df: pd.DataFrame, sparse: bool = False) -> pd.DataFrame:
+        """
+        Transform leads with the fitted encodings
+        :param sparse: Return the features as float32 columns of pandas.SparseDtype, backed by a CSR matrix
+        :return: Features of the leads, with the index of df
+        """
+        features = self.transform_array(df, sparse=sparse)
+        if sparse:
+            return pd.DataFrame.sparse.from_spmatrix(
+                features, index=df.index, columns=self.feature_names_
+            )
+        return pd.DataFrame(
+            features.astype(float), columns=self.feature_names_, index=df.index
+        )
+
+    def transform_array(self, df: pd.DataFrame, sparse: bool = False):
+        """
+        Transform leads with the fitted encodings into a feature matrix, without creating a dataframe, e.g. to pass
+        the features of a chunk of leads directly to a model
+        :param sparse: Return a CSR matrix instead of a dense array
+        :return: float32 array or CSR matrix with one column per feature of get_feature_names_out()
+        """
+        if self.feature_names_ is None:
+            raise ValueError("The preprocessing transformer has not been fitted!")
+
+        blocks = [self.numerical_transformer.transform(df)]
+        if len(df) == 0:
+            # the encoders do not accept empty data, e.g. an empty chunk of leads
+            blocks.append(
+                scipy.sparse.csr_matrix(
+                    (0, len(self.feature_names_) - len(self.numerical_columns))
+                )
+            )
+        else:
+            blocks.extend(self._encode(df))
+
+        if sparse:
+            return scipy.sparse.hstack(blocks, format="csr", dtype=np.float32)
+        return np.hstack(
+            [
+                block.toarray() if scipy.sparse.issparse(block) else block
+                for block in blocks
+            ]
+        ).astype(np.float32, copy=False)
+
+    def fit_transform(self, df: pd.DataFrame, sparse: bool = False) -> pd.DataFrame:
+        return self.fit(df).transform(df, sparse=sparse)
+
+    def get_feature_names_out(self) -> list[str]:
+        return list(self.feature_names_)
+
+    def __getstate__(self) -> dict:
+        return self.__dict__ | {"_vocabularies": None}
+
+    def _encode(self, df: pd.DataFrame) -> list:
+        blocks = []
+        if self.one_hot_encoder is not None:
+            blocks.append(
+                self.one_hot_encoder.transform(
+                    self._get_categorical_data(
+                        df.reindex(columns=self.categorical_columns)
+                    )
+                )
+            )
+        for col, mlb in self.multi_label_binarizers.items():
+            labels = parse_list_column(df[col]) if col in df else [[]] * len(df)
+            with warnings.catch_warnings():
+                # labels that were not seen while fitting are ignored
+                warnings.simplefilter("ignore", UserWarning)
+                blocks.append(mlb.transform(labels))
+        return blocks
+
+    def _get_categorical_data(self, df: pd.DataFrame) -> pd.DataFrame:
+        return df[self.categorical_columns].fillna("").astype(str)
@@ -3,10 +3,13 @@
 
 import hashlib
 import unittest
+from datetime import datetime, timedelta
+from unittest import mock
 
 import pandas as pd
 
 from bdc.steps.hash_generator import HashGenerator
+from bdc.steps.helpers import LeadHashGenerator
 
 
 class TestStepExecution(unittest.TestCase):
@@ -46,6 +49,80 @@ class TestStepExecution(unittest.TestCase):
         )
         self.assertEqual(result.iloc[0]["lead_hash"], expected_hash)
 
+    def test_hash_leads_matches_hash_lead(self):
+        leads = pd.DataFrame(
+            {
+                "First Name": ["John", None, "Jane"],
+                "Last Name": ["Doe", "Roe", float("nan")],
+                "Company / Account": ["ABC Corp", "XYZ", "Corp"],
+                "Phone": [4912345678.0, 4987654321.0, None],
+                "Email": ["john.doe@john.com", "", "jane@corp.com"],
+            },
+            index=[3, 5, 7],
+        )
+        generator = LeadHashGenerator()
+
+        hashes = generator.hash_leads(leads)
+
+        pd.testing.assert_series_equal(
+            hashes, leads.apply(generator.hash_lead, axis=1), check_dtype=False
+        )
+
+
+class TestHashCheck(unittest.TestCase):
+    def setUp(self):
+        self.lead = pd.Series(
+            {
+                "First Name": "John",
+                "Last Name": "Doe",
+                "Company / Account": "ABC Corp",
+                "Phone": "+4912345678",
+                "Email": "john.doe@john.com",
+                "collected": "previous",
+            }
+        )
+        self.generator = LeadHashGenerator()
+        self.lead_hash = self.generator.hash_lead(self.lead)
+        self.get_database_patch = mock.patch(
+            "bdc.steps.helpers.generate_hash_leads.get_database"
+        )
+        self.db_mock = self.get_database_patch.start().return_value
+
+    def tearDown(self):
+        self.get_database_patch.stop()
+
+    def _hash_check(self, last_updated: datetime):
+        self.db_mock.load_lookup_table.return_value = {
+            self.lead_hash: [
+                "John",
+                "Doe",
+                "ABC Corp",
+                "+4912345678",
+                "john.doe@john.com",
+                last_updated.strftime(LeadHashGenerator.LAST_UPDATED_FORMAT),
+            ]
+        }
+        return self.generator.hash_check(
+            self.lead, lambda: "collected", "Step", "collected"
+        )
+
+    def test_fresh_data_is_reused(self):
+        self.generator.freshness_windows = {"Step": timedelta(days=30)}
+        self.assertEqual(
+            self._hash_check(datetime.now() - timedelta(days=1)), "previous"
+        )
+
+    def test_expired_data_is_collected(self):
+        self.generator.freshness_windows = {"Step": timedelta(days=30)}
+        self.assertEqual(
+            self._hash_check(datetime.now() - timedelta(days=31)), "collected"
+        )
+        self.db_mock.save_lookup_table.assert_called_once()
+
+    def test_refresh_hashes_are_collected(self):
+        self.generator.refresh_hashes = {self.lead_hash}
+        self.assertEqual(self._hash_check(datetime.now()), "collected")
+
 
 if __name__ == "__main__":
     unittest.main()
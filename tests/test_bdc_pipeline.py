@@ -1,15 +1,19 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2023 Lucca Baumgärtner <lucca.baumgaertner@fau.de>
 import os
+import tempfile
 import unittest
+from datetime import datetime
 from unittest import mock
 
 import pandas as pd
 from pandas import DataFrame
 
 from bdc.pipeline import Pipeline
-from bdc.steps.step import Step
-from database.leads import decode_s3_url
+from bdc.run_report import StepMetrics
+from bdc.steps.helpers import get_external_call_counter, get_lead_hash_generator
+from bdc.steps.step import Step, StepError
+from database.leads import LocalRepository, decode_s3_url
 
 
 class DummyStepOne(Step):
@@ -52,6 +56,34 @@ class DummyStepTwo(Step):
         pass
 
 
+class DummyStepAddingColumn(Step):
+    name = "Dummy_Step_Adding_Column"
+    added_cols = ["TestCol"]
+
+    def load_data(self) -> None:
+        pass
+
+    def verify(self) -> bool:
+        return True
+
+    def run(self) -> DataFrame:
+        self.df["TestCol"] = self.df["Value"] * 2
+        return self.df
+
+    def finish(self) -> None:
+        pass
+
+
+class DummyStepFailing(DummyStepAddingColumn):
+    name = "Dummy_Step_Failing"
+    added_cols = ["Value", "FailingCol"]
+
+    def run(self) -> DataFrame:
+        self.df["Value"] = -1
+        self.df["FailingCol"] = 1
+        raise StepError("Step failed")
+
+
 class TestPipelineFramework(unittest.TestCase):
     p_one: Pipeline
     p_two: Pipeline
@@ -144,6 +176,343 @@ class TestPipelineFramework(unittest.TestCase):
             finish_mock_three.assert_called_once()
 
 
+class TestChunkedPipeline(unittest.TestCase):
+    def test_chunked_run(self):
+        chunks = [
+            pd.DataFrame({"Value": [1, 2]}),
+            pd.DataFrame({"Value": [3, 4]}),
+            pd.DataFrame({"Value": [5]}),
+        ]
+        with mock.patch("bdc.pipeline.get_database") as get_database_mock:
+            db_mock = get_database_mock.return_value
+            db_mock.iter_dataframe.return_value = iter(chunks)
+
+            pipeline = Pipeline([DummyStepAddingColumn()], limit=3, chunk_size=2)
+            pipeline.run()
+
+            db_mock.get_dataframe.assert_not_called()
+            db_mock.iter_dataframe.assert_called_once_with(2)
+            saved_chunks = [
+                (c.args[0], c.kwargs["first_chunk"])
+                for c in db_mock.save_dataframe_chunk.call_args_list
+            ]
+            self.assertEqual(len(saved_chunks), 2)
+            self.assertEqual([first for _, first in saved_chunks], [True, False])
+            self.assertEqual(saved_chunks[0][0]["TestCol"].to_list(), [2, 4])
+            self.assertEqual(saved_chunks[1][0]["TestCol"].to_list(), [6])
+            db_mock.finish_dataframe_chunks.assert_called_once()
+            db_mock.save_dataframe.assert_not_called()
+
+    def test_interrupted_chunked_run_is_aborted(self):
+        chunks = [pd.DataFrame({"Value": [1, 2]}), pd.DataFrame({"Value": [3]})]
+        with mock.patch("bdc.pipeline.get_database") as get_database_mock:
+            db_mock = get_database_mock.return_value
+            db_mock.iter_dataframe.return_value = iter(chunks)
+            db_mock.save_dataframe_chunk.side_effect = [None, KeyboardInterrupt]
+
+            pipeline = Pipeline([DummyStepAddingColumn()], chunk_size=2)
+            with self.assertRaises(KeyboardInterrupt):
+                pipeline.run()
+
+            db_mock.abort_dataframe_chunks.assert_called_once()
+            db_mock.finish_dataframe_chunks.assert_not_called()
+
+
+class TestStepHandOff(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame({"Value": [1.0, None], "Name": ["A", None]})
+        self.get_database_patch = mock.patch("bdc.pipeline.get_database")
+        self.get_database_patch.start()
+
+    def tearDown(self):
+        self.get_database_patch.stop()
+
+    def test_steps_share_dataframe(self):
+        step = DummyStepAddingColumn()
+        pipeline = Pipeline([step], chunk_size=1)
+
+        df, error_occurred = pipeline._run_steps(self.df, "run_id")
+
+        self.assertFalse(error_occurred)
+        self.assertIs(step.df, self.df)
+        self.assertIs(df, self.df)
+        # numerical columns keep their dtype, missing values in object columns are None
+        self.assertEqual(df["TestCol"].dtype, "float64")
+        self.assertEqual(df["Value"].dtype, "float64")
+        self.assertIsNone(df["Name"][1])
+
+    def test_failed_step_is_rolled_back(self):
+        pipeline = Pipeline([DummyStepFailing()], chunk_size=1)
+
+        df, error_occurred = pipeline._run_steps(self.df, "run_id")
+
+        self.assertTrue(error_occurred)
+        self.assertEqual(list(df.columns), ["Value", "Name"])
+        self.assertEqual(df["Value"][0], 1.0)
+        self.assertTrue(pd.isna(df["Value"][1]))
+
+
+class TestRunReport(unittest.TestCase):
+    def test_step_metrics_measure(self):
+        metrics = StepMetrics("Dummy")
+        with metrics.measure():
+            get_lead_hash_generator().cache_hits += 3
+            get_lead_hash_generator().cache_misses += 1
+            get_external_call_counter().count("google_places_find_place", 2)
+
+        self.assertEqual(metrics.cache_hits, 3)
+        self.assertEqual(metrics.cache_misses, 1)
+        self.assertEqual(metrics.cache_hit_rate, 0.75)
+        self.assertEqual(metrics.external_calls, {"google_places_find_place": 2})
+        self.assertGreaterEqual(metrics.wall_time, 0)
+
+    def test_report_is_saved(self):
+        with mock.patch("bdc.pipeline.get_database") as get_database_mock:
+            db_mock = get_database_mock.return_value
+            db_mock.iter_dataframe.return_value = iter(
+                [pd.DataFrame({"Value": [1, 2]}), pd.DataFrame({"Value": [3]})]
+            )
+
+            pipeline = Pipeline(
+                [DummyStepAddingColumn(), DummyStepFailing()], chunk_size=2
+            )
+            pipeline.run()
+
+            db_mock.save_run_report.assert_called_once()
+            report = db_mock.save_run_report.call_args.args[0]
+            self.assertEqual(
+                [step["status"] for step in report["steps"]], ["completed", "failed"]
+            )
+            self.assertEqual(report["steps"][0]["rows_processed"], 3)
+            self.assertEqual(report["steps"][1]["rows_processed"], 0)
+
+
+class DummyStepFixed(DummyStepAddingColumn):
+    name = "Dummy_Step_Failing"
+    added_cols = ["FixedCol"]
+
+    def run(self) -> DataFrame:
+        self.df["FixedCol"] = 1
+        return self.df
+
+
+class TestResumableRun(unittest.TestCase):
+    RUN_ID = "2024_01_01_120000"
+    PREFIX = "2024/01/01/120000/"
+
+    def setUp(self):
+        self.get_database_patch = mock.patch("bdc.pipeline.get_database")
+        self.db_mock = self.get_database_patch.start().return_value
+        self.snapshot = pd.DataFrame({"Value": [1.0], "TestCol": [2.0]})
+
+    def tearDown(self):
+        self.get_database_patch.stop()
+
+    def _manifest(self, *statuses):
+        names = ["Dummy_Step_Adding_Column", "Dummy_Step_Failing", "Third_Step"]
+        return {
+            "run_id": self.PREFIX,
+            "steps": [
+                {"index": idx, "name": names[idx], "status": status, "checksum": idx}
+                for idx, status in enumerate(statuses)
+            ],
+        }
+
+    def test_resume_skips_completed_steps(self):
+        self.db_mock.load_snapshot_manifest.return_value = self._manifest(
+            "completed", "failed"
+        )
+        self.db_mock.load_snapshot.return_value = self.snapshot
+
+        pipeline = Pipeline(
+            [DummyStepAddingColumn(), DummyStepFixed()], resume_run_id=self.RUN_ID
+        )
+        self.assertEqual(pipeline.completed_steps, 1)
+        self.db_mock.get_dataframe.assert_not_called()
+        self.db_mock.load_snapshot.assert_called_once_with(
+            self.PREFIX, "Dummy_Step_Adding_Column", checksum=0
+        )
+
+        pipeline.run()
+
+        df = self.db_mock.set_dataframe.call_args.args[0]
+        self.assertEqual(df["FixedCol"].to_list(), [1])
+        self.db_mock.clean_snapshots.assert_called_once_with(self.PREFIX)
+        manifest = self.db_mock.save_snapshot_manifest.call_args.args[0]
+        self.assertEqual(
+            [step["status"] for step in manifest["steps"]], ["completed", "completed"]
+        )
+        report = self.db_mock.save_run_report.call_args.args[0]
+        self.assertEqual(
+            [step["status"] for step in report["steps"]], ["skipped", "completed"]
+        )
+
+    def test_resume_falls_back_on_corrupted_snapshot(self):
+        self.db_mock.load_snapshot_manifest.return_value = self._manifest(
+            "completed", "completed", "failed"
+        )
+        self.db_mock.load_snapshot.side_effect = [None, self.snapshot]
+
+        pipeline = Pipeline(
+            [DummyStepAddingColumn(), DummyStepFixed()], resume_run_id=self.RUN_ID
+        )
+
+        self.assertEqual(pipeline.completed_steps, 1)
+        self.assertIs(pipeline.df, self.snapshot)
+
+    def test_resume_applies_limit(self):
+        self.db_mock.load_snapshot_manifest.return_value = self._manifest(
+            "completed", "failed"
+        )
+        self.db_mock.load_snapshot.return_value = pd.DataFrame({"Value": [1, 2, 3]})
+
+        pipeline = Pipeline(
+            [DummyStepAddingColumn(), DummyStepFixed()],
+            limit=2,
+            resume_run_id=self.RUN_ID,
+        )
+
+        self.assertEqual(pipeline.df["Value"].to_list(), [1, 2])
+
+    def test_resume_takes_run_id_from_manifest(self):
+        manifest = self._manifest("completed", "failed")
+        manifest["run_id"] = "nightly_run/"
+        self.db_mock.load_snapshot_manifest.return_value = manifest
+        self.db_mock.load_snapshot.return_value = self.snapshot
+
+        pipeline = Pipeline(
+            [DummyStepAddingColumn(), DummyStepFixed()], resume_run_id="nightly_run"
+        )
+
+        self.db_mock.load_snapshot_manifest.assert_called_once_with("nightly_run/")
+        self.assertEqual(pipeline.run_id, "nightly_run/")
+        self.db_mock.load_snapshot.assert_called_once_with(
+            "nightly_run/", "Dummy_Step_Adding_Column", checksum=0
+        )
+
+    def test_resume_without_manifest_starts_new_run(self):
+        self.db_mock.load_snapshot_manifest.return_value = None
+
+        pipeline = Pipeline([DummyStepAddingColumn()], resume_run_id=self.RUN_ID)
+
+        self.assertEqual(pipeline.completed_steps, 0)
+        self.assertIsNone(pipeline.run_id)
+        self.db_mock.get_dataframe.assert_called_once()
+
+
+class TestIncrementalRun(unittest.TestCase):
+    def setUp(self):
+        self.get_database_patch = mock.patch("bdc.pipeline.get_database")
+        self.db_mock = self.get_database_patch.start().return_value
+        self.hash_generator = get_lead_hash_generator()
+
+        leads = pd.DataFrame(
+            {
+                "First Name": ["A", "B", "C", "D"],
+                "Last Name": "Doe",
+                "Company / Account": "Company",
+                "Phone": "+49123",
+                "Email": "mail@company.de",
+                "Value": [1, 2, 3, 4],
+            }
+        )
+        self.hashes = leads.apply(self.hash_generator.hash_lead, axis=1).to_list()
+        # lead D was removed from the input and lead C is new
+        self.db_mock.get_dataframe.return_value = leads.iloc[:3].copy()
+        enriched = leads.iloc[[0, 1, 3]].copy()
+        enriched["lead_hash"] = [self.hashes[i] for i in [0, 1, 3]]
+        enriched["TestCol"] = -1
+        self.db_mock.load_enriched_dataframe.return_value = enriched
+        # the data of lead B is outside of the freshness window
+        self.db_mock.load_lookup_table.return_value = {
+            self.hashes[0]: [datetime.now().strftime("%Y-%m-%d_%H:%M:%S")],
+            self.hashes[1]: ["2020-01-01_00:00:00"],
+        }
+
+    def tearDown(self):
+        self.get_database_patch.stop()
+        self.hash_generator.freshness_windows = {}
+        self.hash_generator.refresh_hashes = set()
+
+    def test_only_new_and_expired_leads_are_enriched(self):
+        pipeline = Pipeline(
+            [DummyStepAddingColumn(freshness_days=30)], incremental=True
+        )
+        self.assertEqual(pipeline.df["lead_hash"].to_list(), self.hashes[1:3])
+        self.assertEqual(self.hash_generator.refresh_hashes, {self.hashes[2]})
+
+        pipeline.run()
+
+        df = self.db_mock.set_dataframe.call_args.args[0]
+        self.assertEqual(df["lead_hash"].to_list(), self.hashes[:3])
+        self.assertEqual(df["TestCol"].to_list(), [-1, 4, 6])
+        self.assertEqual(self.hash_generator.refresh_hashes, set())
+
+    def test_new_leads_with_fresh_data_are_not_refreshed(self):
+        self.db_mock.load_lookup_table.return_value[self.hashes[2]] = [
+            datetime.now().strftime("%Y-%m-%d_%H:%M:%S")
+        ]
+
+        pipeline = Pipeline(
+            [DummyStepAddingColumn(freshness_days=30)], incremental=True
+        )
+
+        self.assertIn(self.hashes[2], pipeline.df["lead_hash"].to_list())
+        self.assertEqual(self.hash_generator.refresh_hashes, set())
+
+    def test_first_run_enriches_all_leads(self):
+        self.db_mock.load_enriched_dataframe.return_value = None
+
+        pipeline = Pipeline([DummyStepAddingColumn()], incremental=True)
+
+        self.assertEqual(len(pipeline.df), 3)
+        self.assertIsNone(pipeline.unchanged_df)
+
+
+class TestLocalSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.snapshots_patch = mock.patch.object(
+            LocalRepository, "SNAPSHOTS", self.tmp_dir.name
+        )
+        self.snapshots_patch.start()
+        self.repository = LocalRepository()
+        self.df = pd.DataFrame({"Value": [1.0, None], "Name": ["A", None]})
+
+    def tearDown(self):
+        self.snapshots_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_snapshot_round_trip(self):
+        prefix = "2024/01/01/120000/"
+        checksum = self.repository.create_snapshot(self.df, prefix, "Step")
+
+        loaded = self.repository.load_snapshot(prefix, "Step", checksum=checksum)
+        pd.testing.assert_frame_equal(loaded, self.df)
+        self.assertIsNone(self.repository.load_snapshot(prefix, "Step", "invalid"))
+        self.assertIsNone(self.repository.load_snapshot(prefix, "Missing"))
+
+    def test_prune_snapshots(self):
+        prefixes = ["2024/01/01/120000/", "2024/01/02/120000/", "2024/01/03/120000/"]
+        for prefix in reversed(prefixes):
+            self.repository.create_snapshot(self.df, prefix, "Step")
+        self.assertEqual(self.repository.get_snapshot_runs(), prefixes)
+
+        self.repository.prune_snapshots(keep_runs=1)
+
+        self.assertEqual(self.repository.get_snapshot_runs(), prefixes[2:])
+
+    def test_manifest_of_run_id_with_underscore(self):
+        prefix = "nightly_run/2024/"
+        manifest = {"run_id": prefix, "steps": []}
+        self.repository.save_snapshot_manifest(manifest, prefix)
+
+        snapshot_dir = self.repository.get_snapshot_dir_name(prefix)
+        self.assertEqual(snapshot_dir, "nightly_run_2024")
+        self.assertEqual(self.repository.load_snapshot_manifest(prefix), manifest)
+        self.assertEqual(self.repository.load_snapshot_manifest(snapshot_dir), manifest)
+
+
 class TestS3Utils(unittest.TestCase):
     def test_s3_url_decoder(self):
         bucket = "amos--data--events"
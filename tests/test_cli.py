@@ -0,0 +1,166 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import os
+import unittest
+from unittest.mock import MagicMock, patch
+
+from demo.cli import EXIT_FAILURE, EXIT_SUCCESS, parse_args, run_command
+from demo.pipeline_utils import DEFAULT_PIPELINE_PATH
+from evp.predictors import Predictors
+from main import THREAD_ENV_VARS, limit_threads
+
+
+class TestCli(unittest.TestCase):
+    def test_parse_enrich(self):
+        args = parse_args(
+            ["enrich", "--config", "run_all_steps.json", "--limit", "10"]
+            + ["--chunk-size", "5", "--format", "parquet"]
+        )
+        self.assertEqual(args.command, "enrich")
+        self.assertEqual(args.config, "run_all_steps.json")
+        self.assertEqual(args.limit, 10)
+        self.assertEqual(args.chunk_size, 5)
+        self.assertEqual(args.format, "parquet")
+        self.assertFalse(args.incremental)
+        self.assertIsNone(args.resume)
+
+    def test_parse_invalid_arguments(self):
+        with self.assertRaises(SystemExit) as cm, patch("sys.stderr"):
+            parse_args(["enrich"])
+        self.assertEqual(cm.exception.code, 2)
+        with self.assertRaises(SystemExit), patch("sys.stderr"):
+            parse_args(["enrich", "--config", "x.json", "--format", "xlsx"])
+        with self.assertRaises(SystemExit), patch("sys.stderr"):
+            parse_args([])
+        # the enrichment does not use the threads of the numerical libraries
+        with self.assertRaises(SystemExit), patch("sys.stderr"):
+            parse_args(["enrich", "--config", "x.json", "--workers", "2"])
+
+    def test_parse_preprocess(self):
+        args = parse_args(["preprocess"])
+        self.assertTrue(args.filter_null_data)
+        self.assertFalse(args.historical)
+        self.assertIsNone(args.chunk_size)
+        args = parse_args(["preprocess", "--historical", "--no-filter-null-data"])
+        self.assertFalse(args.filter_null_data)
+        self.assertTrue(args.historical)
+        args = parse_args(["preprocess", "--chunk-size", "1000"])
+        self.assertEqual(args.chunk_size, 1000)
+
+    @patch("demo.cli.Pipeline")
+    @patch("demo.cli.get_pipeline_config_from_json")
+    def test_enrich_exit_code(self, mock_get_config, mock_pipeline):
+        steps = [MagicMock()]
+        mock_get_config.return_value = steps
+        mock_pipeline.return_value.run.return_value = True
+
+        args = parse_args(["enrich", "--config", "run_all_steps.json", "--limit", "3"])
+        self.assertEqual(run_command(args), EXIT_SUCCESS)
+        mock_get_config.assert_called_once_with(
+            "run_all_steps.json", config_path=DEFAULT_PIPELINE_PATH
+        )
+        mock_pipeline.assert_called_once_with(
+            steps=steps,
+            limit=3,
+            chunk_size=None,
+            resume_run_id=None,
+            incremental=False,
+        )
+
+        # a failed step fails the command
+        mock_pipeline.return_value.run.return_value = False
+        self.assertEqual(run_command(args), EXIT_FAILURE)
+
+    @patch("demo.cli.Pipeline")
+    @patch("demo.cli.get_pipeline_config_from_json")
+    def test_enrich_limit_of_production_output(self, mock_get_config, mock_pipeline):
+        args = parse_args(["enrich", "--config", "run_all_steps.json", "--limit", "3"])
+        with patch("demo.cli.get_database") as mock_get_database:
+            mock_get_database.return_value.is_production_output.return_value = True
+            self.assertEqual(run_command(args), EXIT_FAILURE)
+        mock_pipeline.assert_not_called()
+
+    def test_enrich_config_file(self):
+        config_path = os.path.join(DEFAULT_PIPELINE_PATH, "run_all_steps.json")
+        args = parse_args(["enrich", "--config", config_path])
+        with patch("demo.cli.get_pipeline_config_from_json") as mock_get_config:
+            mock_get_config.side_effect = FileNotFoundError
+            self.assertEqual(run_command(args), EXIT_FAILURE)
+        mock_get_config.assert_called_once_with(
+            "run_all_steps.json", config_path=os.path.dirname(config_path)
+        )
+
+    def test_train_unknown_model_type(self):
+        args = parse_args(["train", "--model-type", "Unknown"])
+        with patch("demo.cli.get_database"):
+            self.assertEqual(run_command(args), EXIT_FAILURE)
+
+    def test_search(self):
+        args = parse_args(
+            ["search", "--model-type", "KNN", "--method", "halving", "--trials", "4"]
+            + ["--workers", "2"]
+        )
+        self.assertIsNone(args.processes)
+        with patch.dict(os.environ), patch("demo.cli.get_database"), patch(
+            "evp.load_training_data"
+        ) as mock_load, patch("evp.HyperparameterSearch") as mock_search:
+            mock_search.return_value.run.return_value = {
+                "params": {"n_neighbors": 5},
+                "f1": 0.5,
+                "trials": [],
+                "seconds": 1.0,
+            }
+            self.assertEqual(run_command(args), EXIT_SUCCESS)
+        mock_search.assert_called_once_with(
+            mock_load.return_value,
+            Predictors.KNN,
+            method="halving",
+            num_trials=4,
+            processes=None,
+            threads=2,
+        )
+        mock_search.return_value.save_best_model.assert_called_once_with(
+            mock_search.return_value.run.return_value
+        )
+
+    def test_workers(self):
+        args = parse_args(["predict", "--model-name", "model.pkl", "--workers", "3"])
+        with patch("demo.cli.predict_merchant_size", return_value=True) as mock_predict:
+            self.assertEqual(run_command(args), EXIT_SUCCESS)
+        mock_predict.assert_called_once_with("model.pkl", chunk_size=None, workers=3)
+
+    def test_limit_threads(self):
+        with patch.dict(os.environ):
+            limit_threads(["train", "--model-type", "KNN", "--workers", "3"])
+            for env_var in THREAD_ENV_VARS:
+                self.assertEqual(os.environ[env_var], "3")
+            limit_threads(["train", "--workers=2"])
+            self.assertEqual(os.environ["OMP_NUM_THREADS"], "2")
+
+    def test_serve_until_interrupted(self):
+        args = parse_args(
+            ["serve", "--model-name", "model.pkl", "--port", "0", "--max-wait-ms", "2"]
+        )
+        with patch("evp.service.PredictionService") as mock_service, patch(
+            "evp.service.create_http_server"
+        ) as mock_create_server:
+            mock_create_server.return_value.serve_forever.side_effect = (
+                KeyboardInterrupt
+            )
+            self.assertEqual(run_command(args), EXIT_SUCCESS)
+        mock_service.assert_called_once_with(
+            "model.pkl", max_wait_ms=2, max_batch_size=256, workers=None
+        )
+        mock_create_server.return_value.server_close.assert_called_once()
+
+    def test_compact(self):
+        args = parse_args(["compact"])
+        with patch("demo.cli.get_database") as mock_get_database:
+            self.assertEqual(run_command(args), EXIT_SUCCESS)
+        mock_get_database.return_value.compact_results.assert_called_once_with()
+        mock_get_database.return_value.compact_reviews.assert_called_once_with()
+
+
+if __name__ == "__main__":
+    unittest.main()
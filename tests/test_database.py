@@ -0,0 +1,879 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import gc
+import hashlib
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import boto3
+import botocore.exceptions
+import numpy as np
+import pandas as pd
+from moto import mock_s3
+
+from database.leads import (
+    FeatureStore,
+    FeatureStoreWriter,
+    JsonlRecordStore,
+    LocalRepository,
+    ModelCache,
+    S3DiskCache,
+    S3Repository,
+    decode_list_column,
+    iter_dataframe_chunks,
+    read_dataframe,
+    s3_repository,
+    write_dataframe,
+)
+from database.leads.repository import get_review_partition
+from database.leads.s3_repository import S3ClientFactory, S3MultipartWriter
+
+
+class TestFeatureStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmp_dir.name, "features")
+        self.chunks = [
+            pd.DataFrame(
+                {
+                    "rating": [4.5, 0.0],
+                    "bar": pd.arrays.SparseArray([1.0, 0.0]),
+                    "MerchantSizeByDPV": pd.array([0, 4], dtype="Int64"),
+                }
+            ),
+            pd.DataFrame(
+                {
+                    "MerchantSizeByDPV": pd.array([None], dtype="Int64"),
+                    "bar": [0.0],
+                    "rating": [3.0],
+                }
+            ),
+        ]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_and_load(self):
+        self.assertFalse(FeatureStore.exists(self.directory))
+        with FeatureStoreWriter(self.directory) as writer:
+            for chunk in self.chunks:
+                writer.write(chunk)
+
+        feature_store = FeatureStore(self.directory)
+        self.assertEqual(len(feature_store), 3)
+        self.assertEqual(feature_store.columns, ["rating", "bar"])
+        # the features are memory-mapped, not read into memory
+        self.assertIsInstance(feature_store.features, np.memmap)
+        self.assertEqual(feature_store.features.dtype, np.float32)
+        self.assertEqual(
+            feature_store.features.tolist(), [[4.5, 1.0], [0.0, 0.0], [3.0, 0.0]]
+        )
+        self.assertEqual(feature_store.labels[:2].tolist(), [0, 4])
+        self.assertTrue(np.isnan(feature_store.labels[2]))
+        self.assertEqual(
+            list(feature_store.to_dataframe().columns),
+            ["rating", "bar", "MerchantSizeByDPV"],
+        )
+
+    def test_failed_write_keeps_previous_store(self):
+        with FeatureStoreWriter(self.directory) as writer:
+            writer.write(self.chunks[0])
+        with self.assertRaises(RuntimeError):
+            with FeatureStoreWriter(self.directory) as writer:
+                writer.write(self.chunks[1])
+                raise RuntimeError
+
+        self.assertEqual(len(FeatureStore(self.directory)), 2)
+        # labels without missing values are integers
+        self.assertEqual(FeatureStore(self.directory).labels.dtype, np.int64)
+
+    def test_truncated_features(self):
+        with FeatureStoreWriter(self.directory) as writer:
+            writer.write(self.chunks[0])
+        with open(os.path.join(self.directory, FeatureStore.FEATURES), "ab") as fp:
+            fp.write(b"\0")
+        with self.assertRaises(ValueError):
+            FeatureStore(self.directory)
+
+    def test_stale_source(self):
+        source_path = os.path.join(self.tmp_dir.name, "preprocessed_data.csv")
+        self.chunks[0].to_csv(source_path, index=False)
+        with FeatureStoreWriter(self.directory, source_path=source_path) as writer:
+            writer.write(self.chunks[0])
+        self.assertFalse(FeatureStore(self.directory).is_stale(source_path))
+        self.assertFalse(FeatureStore(self.directory).is_stale(source_path + ".x"))
+
+        # the preprocessed data was written again without the feature store
+        pd.concat(self.chunks).to_csv(source_path, index=False)
+        self.assertTrue(FeatureStore(self.directory).is_stale(source_path))
+
+        with mock.patch.object(
+            LocalRepository, "DF_PREPROCESSED_INPUT", self.tmp_dir.name
+        ), mock.patch.object(
+            LocalRepository, "get_feature_store_path", return_value=self.directory
+        ):
+            repository = LocalRepository()
+            self.assertIsNone(repository.load_feature_store(historical=False))
+            with FeatureStoreWriter(self.directory, source_path=source_path) as writer:
+                writer.write(pd.concat(self.chunks))
+            self.assertEqual(len(repository.load_feature_store(historical=False)), 3)
+
+
+class TestStorageFormat(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.input_path = os.path.join(self.tmp_dir.name, "leads.csv")
+        self.output_path = os.path.join(self.tmp_dir.name, "leads_enriched.csv")
+        self.paths_patch = mock.patch.multiple(
+            LocalRepository, DF_INPUT=self.input_path, DF_OUTPUT=self.output_path
+        )
+        self.paths_patch.start()
+        self.df = pd.DataFrame(
+            {
+                "Value": [1.0, None],
+                "Name": ["A", None],
+                "Types": [["bar", "food"], []],
+                "Mixed": [True, "unknown"],
+            }
+        )
+
+    def tearDown(self):
+        self.paths_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_invalid_storage_format(self):
+        with self.assertRaises(ValueError):
+            LocalRepository(storage_format="xlsx")
+
+    def test_parquet_round_trip_with_projection(self):
+        repository = LocalRepository(storage_format="parquet")
+        repository.set_dataframe(self.df)
+        repository.save_dataframe()
+
+        self.assertTrue(
+            os.path.exists(os.path.join(self.tmp_dir.name, "leads_enriched.parquet"))
+        )
+        self.assertFalse(os.path.exists(self.output_path))
+
+        df = repository.load_enriched_dataframe(columns=["Value", "Types", "Missing"])
+        self.assertEqual(list(df.columns), ["Value", "Types"])
+        self.assertEqual(list(df["Types"][0]), ["bar", "food"])
+        self.assertTrue(pd.isna(df["Value"][1]))
+        # values of mixed types are stored as strings
+        mixed = repository.load_enriched_dataframe(columns=["Mixed"])["Mixed"]
+        self.assertEqual(mixed.to_list(), ["True", "unknown"])
+
+    def test_parquet_chunks(self):
+        repository = LocalRepository(storage_format="parquet")
+        chunks = [
+            pd.DataFrame({"Value": [1, 2], "Name": [None, None]}),
+            pd.DataFrame({"Value": [3], "Name": ["C"]}),
+        ]
+        for idx, chunk in enumerate(chunks):
+            repository.save_dataframe_chunk(chunk, first_chunk=idx == 0)
+        repository.finish_dataframe_chunks()
+
+        df = repository.load_enriched_dataframe()
+        self.assertEqual(df["Value"].to_list(), [1, 2, 3])
+        self.assertEqual(df["Name"].to_list(), [None, None, "C"])
+
+        # an aborted run keeps the previous output
+        repository.save_dataframe_chunk(chunks[1], first_chunk=True)
+        repository.abort_dataframe_chunks()
+        self.assertEqual(
+            repository.load_enriched_dataframe()["Value"].to_list(), [1, 2, 3]
+        )
+
+    def test_csv_input_is_read_before_conversion(self):
+        self.df.to_csv(self.input_path, index=False)
+        repository = LocalRepository(storage_format="parquet")
+
+        self.assertEqual(repository.get_input_path(), self.input_path)
+        self.assertEqual(len(repository.get_dataframe()), 2)
+        chunk_sizes = [len(chunk) for chunk in repository.iter_dataframe(1)]
+        self.assertEqual(chunk_sizes, [1, 1])
+
+    def test_csv_list_columns(self):
+        df = pd.DataFrame(
+            {"google_places_detailed_type": [["bar", "food"], [], None, ["store"]]}
+        )
+        write_dataframe(df, self.output_path, "csv")
+
+        # lists are stored delimited instead of as Python literals
+        stored = pd.read_csv(self.output_path)["google_places_detailed_type"]
+        self.assertEqual(stored[0], "bar|food")
+        self.assertTrue(stored[1:3].isna().all())
+
+        types = read_dataframe(self.output_path, "csv")["google_places_detailed_type"]
+        self.assertEqual(list(types[0]), ["bar", "food"])
+        self.assertTrue(types[1:3].isna().all())
+        chunks = list(iter_dataframe_chunks(self.output_path, "csv", 3))
+        self.assertEqual(
+            list(chunks[1]["google_places_detailed_type"].iloc[0]), ["store"]
+        )
+
+    def test_decode_legacy_list_column(self):
+        column = pd.Series(["['bar', 'food']", "[]", None], name="types")
+        types = decode_list_column(column)
+        self.assertEqual(list(types[0]), ["bar", "food"])
+        self.assertTrue(types[1:].isna().all())
+
+
+class TestReviewStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths_patch = mock.patch.multiple(
+            LocalRepository,
+            REVIEWS=os.path.join(self.tmp_dir.name, "reviews"),
+            REVIEWS_STORE=os.path.join(self.tmp_dir.name, "reviews_store"),
+        )
+        self.paths_patch.start()
+        os.makedirs(LocalRepository.REVIEWS)
+        self.repository = LocalRepository()
+        self.reviews = {
+            f"place_{idx}": [
+                {"text": f"Review {idx}.{i}", "rating": i, "time": 1700000000 + i}
+                for i in range(idx)
+            ]
+            for idx in range(20)
+        }
+        for place_id, reviews in self.reviews.items():
+            self.repository.save_review(reviews, place_id)
+
+    def tearDown(self):
+        self.repository.flush_gpt_results()
+        self.paths_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_compaction_and_bulk_fetch(self):
+        self.assertEqual(self.repository.compact_reviews(), 20)
+        self.assertEqual(self.repository.compact_reviews(), 0)
+
+        with mock.patch.object(
+            self.repository, "fetch_review", wraps=self.repository.fetch_review
+        ) as fetch_review:
+            reviews = self.repository.fetch_reviews(
+                ["place_0", "place_3", "place_19", None, float("nan")]
+            )
+        fetch_review.assert_not_called()
+
+        self.assertEqual(reviews["place_0"], [])
+        self.assertEqual(
+            [review["text"] for review in reviews["place_19"]],
+            [f"Review 19.{i}" for i in range(19)],
+        )
+        self.assertEqual(reviews["place_3"][2]["rating"], 2)
+        self.assertEqual(len(reviews), 3)
+
+    def test_places_missing_in_store(self):
+        self.repository.compact_reviews()
+        self.repository.save_review([{"text": "New"}], "new_place")
+
+        self.assertNotIn(
+            "new_place", self.repository.fetch_reviews(["new_place"], fallback=False)
+        )
+        reviews = self.repository.fetch_reviews(["new_place", "place_1"])
+        self.assertEqual(reviews["new_place"], [{"text": "New"}])
+        self.assertEqual(reviews["place_1"][0]["text"], "Review 1.0")
+
+        self.assertEqual(self.repository.compact_reviews(), 1)
+        reviews = self.repository.fetch_reviews(["new_place"], fallback=False)
+        self.assertEqual(reviews["new_place"][0]["text"], "New")
+
+    def test_compaction_of_given_places(self):
+        with mock.patch.object(
+            self.repository,
+            "_read_review_partition",
+            wraps=self.repository._read_review_partition,
+        ) as read_partition:
+            self.assertEqual(
+                self.repository.compact_reviews(place_ids=["place_1", "place_2"]), 2
+            )
+        partitions = {get_review_partition("place_1"), get_review_partition("place_2")}
+        self.assertEqual({c.args[0] for c in read_partition.call_args_list}, partitions)
+
+        reviews = self.repository.fetch_reviews(["place_1", "place_3"], fallback=False)
+        self.assertEqual(list(reviews), ["place_1"])
+        self.assertEqual(self.repository.compact_reviews(), 18)
+
+    def test_reviews_saved_again_replace_stored_reviews(self):
+        self.repository.compact_reviews()
+        self.repository.save_review(
+            [{"text": "Updated"}], "place_2", force_refresh=True
+        )
+        # reviews are only replaced if requested
+        self.repository.save_review([{"text": "Ignored"}], "place_3")
+
+        self.assertEqual(self.repository.compact_reviews(), 0)
+        self.assertEqual(self.repository.compact_reviews(place_ids=["place_2"]), 1)
+        reviews = self.repository.fetch_reviews(
+            ["place_2", "place_3", "place_4"], fallback=False
+        )
+        self.assertEqual([r["text"] for r in reviews["place_2"]], ["Updated"])
+        self.assertEqual(len(reviews["place_3"]), 3)
+        self.assertEqual(len(reviews["place_4"]), 4)
+
+
+class TestJsonlRecordStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_segments(self):
+        return sorted(
+            name for name in os.listdir(self.tmp_dir.name) if name.endswith(".jsonl")
+        )
+
+    def test_batched_writes_and_index(self):
+        store = JsonlRecordStore(self.tmp_dir.name, batch_size=3)
+        store.put("a", {"value": 1})
+        store.put("b", [1, 2])
+        self.assertEqual(self.get_segments(), [])
+        self.assertEqual(store.get("a"), {"value": 1})
+
+        store.put("a", {"value": 2})
+        store.put("c", "ü")
+        store.commit()
+        self.assertEqual(self.get_segments(), ["segment-00000.jsonl"])
+
+        # the index is rebuilt from the segments, the latest record of a key wins
+        store = JsonlRecordStore(self.tmp_dir.name)
+        self.assertEqual(sorted(store.keys()), ["a", "b", "c"])
+        self.assertEqual(store.get("a"), {"value": 2})
+        self.assertEqual(store.get("c"), "ü")
+        self.assertIsNone(store.get("d"))
+
+    def test_partially_written_record_is_skipped(self):
+        store = JsonlRecordStore(self.tmp_dir.name)
+        store.put("a", 1)
+        store.commit()
+        with open(os.path.join(self.tmp_dir.name, "segment-00000.jsonl"), "ab") as fp:
+            fp.write(b'{"key": "b", "val')
+
+        store = JsonlRecordStore(self.tmp_dir.name)
+        self.assertEqual(store.keys(), ["a"])
+
+    def test_segments_and_compaction(self):
+        store = JsonlRecordStore(self.tmp_dir.name, batch_size=1, max_segment_size=100)
+        for idx in range(10):
+            store.put(f"key{idx}", idx)
+        self.assertGreater(len(self.get_segments()), 1)
+
+        # outdated versions are removed automatically
+        for value in range(100):
+            store.put("key0", value)
+        size = sum(
+            os.path.getsize(os.path.join(self.tmp_dir.name, segment))
+            for segment in self.get_segments()
+        )
+        self.assertLess(size, 1000)
+
+        store = JsonlRecordStore(self.tmp_dir.name)
+        self.assertEqual(store.get("key0"), 99)
+        self.assertEqual(store.get("key9"), 9)
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths_patch = mock.patch.multiple(
+            LocalRepository,
+            ML_MODELS=os.path.join(self.tmp_dir.name, "models"),
+            CLASSIFICATION_REPORTS=os.path.join(self.tmp_dir.name, "reports"),
+        )
+        self.paths_patch.start()
+        self.repository = LocalRepository()
+
+    def tearDown(self):
+        self.paths_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_versions_and_eviction(self):
+        cache = ModelCache(max_entries=2)
+        cache.put("a", "1", "model a")
+        cache.put("b", "1", "model b")
+        self.assertEqual(cache.get("a", "1"), "model a")
+        self.assertIsNone(cache.get("a", "2"))
+        # b is the least recently used model
+        cache.put("c", "1", "model c")
+        self.assertIsNone(cache.get("b", "1"))
+        self.assertEqual(cache.get("c", "1"), "model c")
+        cache.invalidate("c")
+        self.assertIsNone(cache.get("c", "1"))
+        self.assertEqual((cache.hits, cache.misses), (2, 3))
+
+    def test_local_models_are_cached(self):
+        self.repository.save_ml_model({"weights": np.arange(10.0)}, "model.pkl")
+        self.repository.save_classification_report({"epochs": 1}, "model.pkl")
+
+        model = self.repository.load_ml_model("model.pkl")
+        report = self.repository.load_classification_report("model.pkl")
+        self.assertIsInstance(model["weights"], np.memmap)
+        self.assertEqual(report, {"epochs": 1})
+        with mock.patch("joblib.load") as load:
+            self.assertIs(self.repository.load_ml_model("model.pkl"), model)
+            self.assertIs(
+                self.repository.load_classification_report("model.pkl"), report
+            )
+        load.assert_not_called()
+
+        # saving the model again replaces the file, which is still mapped by the loaded model
+        self.repository.save_ml_model({"weights": np.ones(10)}, "model.pkl")
+        np.testing.assert_array_equal(model["weights"], np.arange(10.0))
+        np.testing.assert_array_equal(
+            self.repository.load_ml_model("model.pkl")["weights"], np.ones(10)
+        )
+        self.assertIsNone(self.repository.load_ml_model("missing.pkl"))
+
+
+class TestLocalResults(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.paths_patch = mock.patch.multiple(
+            LocalRepository,
+            REVIEWS=os.path.join(self.tmp_dir.name, "reviews"),
+            GPT_RESULTS=os.path.join(self.tmp_dir.name, "gpt-results"),
+        )
+        self.paths_patch.start()
+        os.makedirs(LocalRepository.REVIEWS)
+        os.makedirs(LocalRepository.GPT_RESULTS)
+        self.repository = LocalRepository()
+
+    def tearDown(self):
+        self.repository.flush_gpt_results()
+        self.paths_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_gpt_results(self):
+        self.assertEqual(self.repository.fetch_gpt_result("place_a", "summary"), "")
+        self.repository.save_gpt_result("Summary", "place_a", "summary")
+        self.repository.save_gpt_result(0.5, "place_a", "sentiment")
+        self.repository.flush_gpt_results()
+
+        repository = LocalRepository()
+        self.assertEqual(
+            repository.fetch_gpt_result("place_a", "summary")["result"], "Summary"
+        )
+        self.assertEqual(
+            repository.fetch_gpt_result("place_a", "sentiment")["result"], 0.5
+        )
+        self.assertEqual(
+            os.listdir(LocalRepository.GPT_RESULTS), ["segment-00000.jsonl"]
+        )
+
+    def test_legacy_files_are_moved_into_record_store(self):
+        with open(
+            os.path.join(LocalRepository.REVIEWS, "place_a_gpt_results.json"), "w"
+        ) as fp:
+            json.dump([{"text": "Good"}], fp, indent=4)
+        with open(
+            os.path.join(LocalRepository.GPT_RESULTS, "place_a_gpt_results.json"), "w"
+        ) as fp:
+            json.dump({"summary": {"result": "Summary"}}, fp, indent=4)
+
+        self.assertEqual(self.repository.fetch_review("place_a"), [{"text": "Good"}])
+        self.repository.compact_results()
+
+        self.assertEqual(os.listdir(LocalRepository.REVIEWS), ["segment-00001.jsonl"])
+        self.assertEqual(self.repository.fetch_review("place_a"), [{"text": "Good"}])
+        self.assertEqual(
+            self.repository.fetch_gpt_result("place_a", "summary")["result"], "Summary"
+        )
+
+
+@mock_s3
+class TestS3ClientFactory(unittest.TestCase):
+    def test_client_is_created_lazily_per_process(self):
+        factory = S3ClientFactory(max_pool_connections=4, max_attempts=3)
+        self.assertIsNone(factory._client)
+        self.assertEqual(factory.config.max_pool_connections, 4)
+        self.assertEqual(
+            factory.config.retries, {"max_attempts": 3, "mode": "adaptive"}
+        )
+
+        client = factory.get_client()
+        self.assertIs(factory.get_client(), client)
+        with mock.patch("os.getpid", return_value=-1):
+            self.assertIsNot(factory.get_client(), client)
+
+    def test_operation_latencies(self):
+        factory = S3ClientFactory()
+        factory.create_bucket(Bucket="amos--data--events")
+        for _ in range(2):
+            factory.put_object(Bucket="amos--data--events", Key="a", Body=b"a")
+
+        latencies = factory.get_latencies()
+        self.assertEqual(latencies["CreateBucket"]["calls"], 1)
+        self.assertEqual(latencies["PutObject"]["calls"], 2)
+        self.assertGreaterEqual(
+            latencies["PutObject"]["total_time"], latencies["PutObject"]["max_time"]
+        )
+
+
+@mock_s3
+class TestS3Streaming(unittest.TestCase):
+    BUCKET = "amos--data--events"
+
+    def setUp(self):
+        self.client = boto3.client("s3", region_name="us-east-1")
+        self.client.create_bucket(Bucket=self.BUCKET)
+        self.client_patch = mock.patch.object(s3_repository, "s3", self.client)
+        self.client_patch.start()
+        self.df = pd.DataFrame(
+            {"Value": [1.0, 2.0, None], "Name": ["A", "B", None], "Count": [1, 2, 3]}
+        )
+
+    def tearDown(self):
+        self.client_patch.stop()
+
+    def get_object(self, key):
+        return self.client.get_object(Bucket=self.BUCKET, Key=key)["Body"].read()
+
+    def test_multipart_upload(self):
+        data = os.urandom(11 * 2**20)
+        with S3MultipartWriter(self.BUCKET, "data.bin", part_size=5 * 2**20) as fp:
+            fp.write(data[: 3 * 2**20])
+            fp.write(data[3 * 2**20 :])
+            # nothing is visible before the upload is completed
+            self.assertNotIn(
+                "Contents", self.client.list_objects_v2(Bucket=self.BUCKET)
+            )
+
+        self.assertEqual(self.get_object("data.bin"), data)
+        self.assertEqual(fp.checksum, hashlib.sha256(data).hexdigest())
+
+    def test_failed_upload_is_aborted(self):
+        with self.assertRaises(RuntimeError):
+            with S3MultipartWriter(
+                self.BUCKET, "data.bin", part_size=5 * 2**20
+            ) as fp:
+                fp.write(os.urandom(6 * 2**20))
+                raise RuntimeError()
+
+        self.assertNotIn("Contents", self.client.list_objects_v2(Bucket=self.BUCKET))
+        self.assertNotIn(
+            "Uploads", self.client.list_multipart_uploads(Bucket=self.BUCKET)
+        )
+
+    def test_upload_is_only_completed_by_commit(self):
+        self.client.put_object(Bucket=self.BUCKET, Key="data.bin", Body=b"previous")
+        fp = S3MultipartWriter(self.BUCKET, "data.bin", part_size=5 * 2**20)
+        fp.write(os.urandom(6 * 2**20))
+        fp.write(b"buffered")
+        # e.g. the writer of a failed run is garbage-collected
+        del fp
+        gc.collect()
+
+        self.assertEqual(self.get_object("data.bin"), b"previous")
+        self.assertNotIn(
+            "Uploads", self.client.list_multipart_uploads(Bucket=self.BUCKET)
+        )
+
+    def test_aborted_chunks_keep_previous_output(self):
+        repository = S3Repository()
+        repository.set_dataframe(self.df)
+        repository.save_dataframe()
+        repository.save_dataframe_chunk(self.df[:1], first_chunk=True)
+        repository.abort_dataframe_chunks()
+
+        self.assertEqual(
+            repository.load_enriched_dataframe()["Count"].to_list(), [1, 2, 3]
+        )
+
+    def test_save_and_load_dataframe(self):
+        for storage_format in ["csv", "parquet"]:
+            with self.subTest(storage_format=storage_format):
+                repository = S3Repository(storage_format=storage_format)
+                repository.set_dataframe(self.df)
+                repository.save_dataframe()
+
+                df = repository.load_enriched_dataframe(columns=["Name", "Count"])
+                self.assertEqual(list(df.columns), ["Name", "Count"])
+                self.assertEqual(df["Count"].to_list(), [1, 2, 3])
+
+    def test_production_output(self):
+        self.assertTrue(S3Repository().is_production_output())
+        with mock.patch.object(
+            S3Repository, "DF_OUTPUT", f"s3://{self.BUCKET}/test/enriched.csv"
+        ):
+            self.assertFalse(S3Repository().is_production_output())
+        self.assertFalse(LocalRepository().is_production_output())
+
+    def test_save_dataframe_chunks(self):
+        repository = S3Repository(storage_format="parquet")
+        repository.save_dataframe_chunk(self.df[:2], first_chunk=True)
+        repository.save_dataframe_chunk(self.df[2:])
+        repository.finish_dataframe_chunks()
+
+        df = repository.load_enriched_dataframe()
+        self.assertEqual(df["Count"].to_list(), [1, 2, 3])
+
+    def test_snapshot_checksum(self):
+        repository = S3Repository()
+        checksum = repository.create_snapshot(self.df, prefix="2024/", name="step")
+
+        data = self.get_object("snapshots/2024/step_snapshot.pkl")
+        self.assertEqual(checksum, hashlib.sha256(data).hexdigest())
+        df = repository.load_snapshot("2024/", "step", checksum=checksum)
+        pd.testing.assert_frame_equal(df, self.df)
+
+    def test_review_store(self):
+        repository = S3Repository()
+        repository.save_review([{"text": "Good", "rating": 5}], "place_a")
+        repository.save_review([], "place_b")
+
+        self.assertEqual(repository.compact_reviews(), 2)
+        reviews = repository.fetch_reviews(["place_a", "place_b"], fallback=False)
+        self.assertEqual(reviews["place_a"][0]["text"], "Good")
+        self.assertEqual(reviews["place_b"], [])
+
+        repository.save_review([{"text": "New"}], "place_b", force_refresh=True)
+        self.assertEqual(repository.compact_reviews(place_ids=["place_b"]), 1)
+        reviews = repository.fetch_reviews(["place_a", "place_b"], fallback=False)
+        self.assertEqual(reviews["place_a"][0]["text"], "Good")
+        self.assertEqual(reviews["place_b"][0]["text"], "New")
+
+    def test_gpt_result_cache(self):
+        repository = S3Repository()
+        self.assertIsNone(repository.fetch_gpt_result("place_a", "summary"))
+        repository.save_gpt_result("Summary", "place_a", "summary")
+        repository.save_gpt_result(0.5, "place_a", "sentiment")
+        self.assertEqual(
+            repository.fetch_gpt_result("place_a", "sentiment")["result"], 0.5
+        )
+        # one GET for the miss, the writes are coalesced into one PUT when flushing
+        self.assertEqual(
+            repository.get_request_counts(),
+            {"gpt_results_get": 1, "gpt_results_cache_hit": 3},
+        )
+        repository.flush_gpt_results()
+        self.assertEqual(repository.get_request_counts()["gpt_results_put"], 1)
+
+        results = S3Repository()
+        self.assertEqual(
+            results.fetch_gpt_result("place_a", "summary")["result"], "Summary"
+        )
+        self.assertEqual(
+            results.fetch_gpt_result("place_a", "sentiment")["result"], 0.5
+        )
+        self.assertEqual(results.get_request_counts()["gpt_results_get"], 1)
+
+    def test_gpt_results_are_flushed_at_exit(self):
+        with mock.patch.object(s3_repository.atexit, "register") as register:
+            repository = S3Repository()
+        register.assert_called_once_with(repository.flush_gpt_results)
+
+        repository.save_gpt_result("Summary", "place_a", "summary")
+        register.call_args.args[0]()
+        self.assertEqual(
+            S3Repository().fetch_gpt_result("place_a", "summary")["result"], "Summary"
+        )
+
+    def test_gpt_result_cache_eviction(self):
+        with mock.patch.multiple(
+            S3Repository, GPT_RESULTS_CACHE_SIZE=2, GPT_RESULTS_BATCH_SIZE=2
+        ):
+            repository = S3Repository()
+            for place_id in ["place_a", "place_b", "place_c"]:
+                repository.save_gpt_result("Summary", place_id, "summary")
+
+            # the batch of the first two places was written, the LRU keeps the last two places
+            self.assertEqual(repository.get_request_counts()["gpt_results_put"], 2)
+            self.assertEqual(list(repository._gpt_results), ["place_b", "place_c"])
+            self.assertEqual(
+                repository.fetch_gpt_result("place_a", "summary")["result"], "Summary"
+            )
+            repository.flush_gpt_results()
+
+
+@mock_s3
+class TestS3DiskCache(unittest.TestCase):
+    BUCKET = "amos--data--events"
+
+    def setUp(self):
+        self.client = boto3.client("s3", region_name="us-east-1")
+        self.client.create_bucket(Bucket=self.BUCKET)
+        self.client_patch = mock.patch.object(s3_repository, "s3", self.client)
+        self.client_patch.start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.cache = S3DiskCache(self.tmp_dir.name, max_size=2**20)
+
+    def tearDown(self):
+        self.client_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def get_data_files(self):
+        return [
+            name for name in os.listdir(self.tmp_dir.name) if name.endswith(".data")
+        ]
+
+    def test_objects_are_validated_by_etag(self):
+        self.client.put_object(Bucket=self.BUCKET, Key="a.json", Body=b"old")
+        self.assertEqual(self.cache.read(self.client, self.BUCKET, "a.json"), b"old")
+
+        with mock.patch.object(
+            self.client, "get_object", wraps=self.client.get_object
+        ) as get_object:
+            self.assertEqual(
+                self.cache.read(self.client, self.BUCKET, "a.json"), b"old"
+            )
+        self.assertIn("IfNoneMatch", get_object.call_args.kwargs)
+
+        self.client.put_object(Bucket=self.BUCKET, Key="a.json", Body=b"new")
+        self.assertEqual(self.cache.read(self.client, self.BUCKET, "a.json"), b"new")
+        # the outdated version is removed
+        self.assertEqual(len(self.get_data_files()), 1)
+
+        with self.assertRaises(botocore.exceptions.ClientError):
+            self.cache.read(self.client, self.BUCKET, "missing.json")
+
+    def test_least_recently_used_objects_are_evicted(self):
+        for key in ["a", "b", "c"]:
+            self.client.put_object(
+                Bucket=self.BUCKET, Key=key, Body=os.urandom(400_000)
+            )
+        for key in ["a", "b"]:
+            self.cache.read(self.client, self.BUCKET, key)
+        data_a = self.cache.get_path(self.client, self.BUCKET, "a")
+        data_b = self.cache.get_path(self.client, self.BUCKET, "b")
+        # a was used more recently than b
+        os.utime(data_b, (0, 0))
+        self.cache.read(self.client, self.BUCKET, "c")
+
+        self.assertEqual(len(self.get_data_files()), 2)
+        self.assertTrue(os.path.exists(data_a))
+        self.assertFalse(os.path.exists(data_b))
+
+    def test_repository_writes_through_cache(self):
+        repository = S3Repository(cache=self.cache)
+        repository.save_review([{"text": "Good"}], "place_a")
+
+        with mock.patch.object(
+            self.client, "get_object", wraps=self.client.get_object
+        ) as get_object:
+            self.assertEqual(repository.fetch_review("place_a"), [{"text": "Good"}])
+        self.assertIn("IfNoneMatch", get_object.call_args.kwargs)
+
+        repository = S3Repository(storage_format="parquet", cache=self.cache)
+        repository.set_dataframe(pd.DataFrame({"Value": [1, 2]}))
+        repository.save_dataframe()
+        for _ in range(2):
+            df = repository.load_enriched_dataframe(columns=["Value"])
+            self.assertEqual(df["Value"].to_list(), [1, 2])
+
+
+@mock_s3
+class TestS3ModelCache(unittest.TestCase):
+    BUCKET = "amos--models"
+
+    def setUp(self):
+        self.client = boto3.client("s3", region_name="us-east-1")
+        self.client.create_bucket(Bucket=self.BUCKET)
+        self.client_patch = mock.patch.object(s3_repository, "s3", self.client)
+        self.client_patch.start()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.client_patch.stop()
+        self.tmp_dir.cleanup()
+
+    def test_models_are_validated_by_etag(self):
+        repository = S3Repository()
+        repository.save_ml_model({"weights": np.arange(10.0)}, "model.pkl")
+        model = repository.load_ml_model("model.pkl")
+
+        with mock.patch.object(
+            self.client, "get_object", wraps=self.client.get_object
+        ) as get_object:
+            self.assertIs(repository.load_ml_model("model.pkl"), model)
+            get_object.assert_not_called()
+
+            # a model saved by another process is downloaded again
+            S3Repository().save_ml_model({"weights": np.ones(10)}, "model.pkl")
+            np.testing.assert_array_equal(
+                repository.load_ml_model("model.pkl")["weights"], np.ones(10)
+            )
+            get_object.assert_called_once()
+        self.assertIsNone(repository.load_ml_model("missing.pkl"))
+
+    def test_models_are_memory_mapped_from_disk_cache(self):
+        repository = S3Repository(
+            cache=S3DiskCache(self.tmp_dir.name, max_size=2**20)
+        )
+        repository.save_ml_model({"weights": np.arange(10.0)}, "model.pkl")
+        model = repository.load_ml_model("model.pkl")
+
+        self.assertIsInstance(model["weights"], np.memmap)
+        self.assertTrue(model["weights"].filename.startswith(self.tmp_dir.name))
+        with mock.patch.object(
+            self.client, "get_object", wraps=self.client.get_object
+        ) as get_object:
+            self.assertIs(repository.load_ml_model("model.pkl"), model)
+        # the cached file is validated without downloading it again
+        self.assertIn("IfNoneMatch", get_object.call_args.kwargs)
+
+
+@mock_s3
+class TestS3Backups(unittest.TestCase):
+    BUCKET = "amos--data--events"
+
+    def setUp(self):
+        self.client = boto3.client("s3", region_name="us-east-1")
+        self.client.create_bucket(Bucket=self.BUCKET)
+        self.client_patch = mock.patch.object(s3_repository, "s3", self.client)
+        self.client_patch.start()
+        self.repository = S3Repository()
+
+    def tearDown(self):
+        self.client_patch.stop()
+
+    def save(self, values):
+        self.repository.set_dataframe(pd.DataFrame({"Value": values}))
+        self.repository.save_dataframe()
+
+    def test_backups_are_deduplicated(self):
+        self.save([1])
+        self.save([2])
+        self.save([2])
+        with mock.patch.object(
+            self.client, "get_object", wraps=self.client.get_object
+        ) as get_object:
+            self.save([3])
+        # the enriched data is not downloaded for the backup
+        self.assertNotIn(
+            "leads/enriched.csv",
+            [call.kwargs["Key"] for call in get_object.call_args_list],
+        )
+
+        backups = self.repository.list_backups()
+        self.assertEqual(len(backups), 2)
+        objects = self.client.list_objects_v2(
+            Bucket=self.BUCKET, Prefix="backup/objects/"
+        )["Contents"]
+        self.assertEqual(
+            sorted(obj["Key"] for obj in objects),
+            sorted(backup["backup"] for backup in backups),
+        )
+
+    def test_restore_backup(self):
+        self.save([1])
+        self.save([2])
+        etag = self.repository.list_backups()[0]["etag"]
+
+        self.assertTrue(self.repository.restore_backup(etag))
+        self.assertEqual(
+            self.repository.load_enriched_dataframe()["Value"].to_list(), [1]
+        )
+        # the replaced data is backed up as well
+        self.assertEqual(len(self.repository.list_backups()), 2)
+        self.assertFalse(self.repository.restore_backup("unknown"))
+
+
+if __name__ == "__main__":
+    unittest.main()
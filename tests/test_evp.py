@@ -0,0 +1,402 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import json
+import os
+import tempfile
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.model_selection import train_test_split
+
+from database.leads import (
+    FeatureStore,
+    FeatureStoreWriter,
+    LocalRepository,
+    read_dataframe,
+    write_dataframe,
+)
+from evp import (
+    LEAD_ID_COLUMNS,
+    BatchScorer,
+    EstimatedValuePredictor,
+    HyperparameterSearch,
+    InvalidLeadsError,
+    PredictionService,
+    create_http_server,
+    split_indices,
+)
+from evp.predictors import Predictors
+from preprocessing import PreprocessingTransformer, get_transformer_name
+
+
+def create_preprocessed_data(num_leads: int = 100) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    return pd.DataFrame(
+        {
+            "google_places_rating": rng.random(num_leads),
+            "restaurant": rng.integers(0, 2, num_leads).astype(float),
+            "MerchantSizeByDPV": rng.integers(0, 5, num_leads),
+        }
+    )
+
+
+class TestEstimatedValuePredictor(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.df = create_preprocessed_data()
+        directory = os.path.join(self.tmp_dir.name, "features")
+        with FeatureStoreWriter(directory) as writer:
+            writer.write(self.df)
+        self.feature_store = FeatureStore(directory)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_feature_store_matches_dataframe(self):
+        evp = EstimatedValuePredictor(data=self.df, limit_classes=True)
+        store_evp = EstimatedValuePredictor(data=self.feature_store, limit_classes=True)
+
+        self.assertEqual(store_evp.X_train.dtype, np.float32)
+        np.testing.assert_array_equal(store_evp.X_train, evp.X_train)
+        np.testing.assert_array_equal(store_evp.y_test, evp.y_test)
+        self.assertEqual(set(store_evp.y_train), {0, 1, 2})
+        # the labels of the data are not changed
+        self.assertEqual(self.df["MerchantSizeByDPV"].max(), 4)
+
+    def test_data_sets_are_copied_on_use(self):
+        evp = EstimatedValuePredictor(data=self.feature_store)
+        self.assertNotIn("X_val", evp.__dict__)
+        features = np.asarray(self.feature_store.features)
+        np.testing.assert_array_equal(evp.X_val, features[evp.val_indices])
+        X_train, _, y_train, _ = train_test_split(
+            features, self.feature_store.labels, test_size=0.2, random_state=42
+        )
+        np.testing.assert_array_equal(evp.X_train, X_train)
+        np.testing.assert_array_equal(evp.y_train, y_train)
+
+    def test_selected_features(self):
+        evp = EstimatedValuePredictor(
+            data=self.feature_store, selected_features=["restaurant"]
+        )
+        self.assertEqual(evp.X_train.shape[1], 1)
+        self.assertTrue(np.isin(evp.X_train, [0, 1]).all())
+
+    def test_sparse_feature_store(self):
+        evp = EstimatedValuePredictor(
+            data=self.feature_store, model_type=Predictors.LightGBM, sparse=True
+        )
+        self.assertEqual(evp.X_train.shape, (80, 2))
+        self.assertEqual(evp.X_train.dtype, np.float32)
+
+
+class TestHyperparameterSearch(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.df = create_preprocessed_data(200)
+        directory = os.path.join(self.tmp_dir.name, "features")
+        with FeatureStoreWriter(directory) as writer:
+            writer.write(self.df)
+        self.feature_store = FeatureStore(directory)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_successive_halving_rungs(self):
+        search = HyperparameterSearch(
+            self.df, Predictors.LightGBM, method="halving", num_trials=16
+        )
+        self.assertEqual(search.get_rungs(16, 9000), [(16, 1000), (6, 3000), (2, 9000)])
+        self.assertEqual(search.get_rungs(1, 9000), [(1, 9000)])
+        search.method = "random"
+        self.assertEqual(search.get_rungs(16, 9000), [(16, 9000)])
+
+    def test_configurations_are_distinct(self):
+        configurations = HyperparameterSearch(
+            self.df, Predictors.KNN, num_trials=100
+        ).sample_configurations()
+        self.assertEqual(len(configurations), 8)
+        self.assertEqual(len({tuple(c.items()) for c in configurations}), 8)
+        self.assertEqual(
+            HyperparameterSearch(
+                self.df, Predictors.NaiveBayes
+            ).sample_configurations(),
+            [{}],
+        )
+
+    def test_trials_do_not_see_test_set(self):
+        evp = EstimatedValuePredictor(data=self.df)
+        train, val, test = split_indices(len(self.df))
+        features = self.df.drop(columns="MerchantSizeByDPV").to_numpy(np.float32)
+        np.testing.assert_array_equal(features[train], evp.X_train)
+        np.testing.assert_array_equal(features[test], evp.X_test)
+        self.assertFalse(set(test) & (set(train) | set(val)))
+
+    def test_search_and_save_best_model(self):
+        repository = LocalRepository()
+        with patch.multiple(
+            LocalRepository,
+            ML_MODELS=self.tmp_dir.name,
+            CLASSIFICATION_REPORTS=self.tmp_dir.name,
+        ), patch("evp.predictors.get_database", return_value=repository), patch(
+            "evp.evp.load_transformer", return_value=None
+        ):
+            search = HyperparameterSearch(
+                self.df, Predictors.KNN, method="halving", num_trials=4, processes=1
+            )
+            result = search.run()
+            model_name = search.save_best_model(result)
+            report = repository.load_classification_report(model_name)
+
+        # 4 configurations in the first rung, the best 2 in the second
+        self.assertEqual(
+            [trial["rung"] for trial in result["trials"]], [0] * 4 + [1] * 2
+        )
+        for trial in result["trials"]:
+            self.assertGreaterEqual(trial["f1"], 0)
+            self.assertGreater(trial["seconds"], 0)
+        self.assertEqual(result["f1"], max(t["f1"] for t in result["trials"][4:]))
+        self.assertTrue(model_name.startswith("knnclassifier_"))
+        self.assertEqual(report["hyperparameter_search"]["params"], result["params"])
+
+    def test_trials_in_process_pool(self):
+        search = HyperparameterSearch(
+            self.feature_store, Predictors.AdaBoost, num_trials=2, processes=2
+        )
+        result = search.run()
+        in_process = HyperparameterSearch(
+            self.df, Predictors.AdaBoost, num_trials=2, processes=1
+        ).run()
+
+        self.assertEqual(len(result["trials"]), 2)
+        self.assertEqual(
+            [trial["f1"] for trial in result["trials"]],
+            [trial["f1"] for trial in in_process["trials"]],
+        )
+
+    def test_unknown_method(self):
+        with self.assertRaises(ValueError):
+            HyperparameterSearch(self.df, Predictors.KNN, method="grid")
+
+
+def create_enriched_leads(num_leads: int = 50) -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    leads = pd.DataFrame(
+        {
+            "google_places_rating": rng.random(num_leads) * 5,
+            "review_polarization_type": rng.choice(["High", "Low", None], num_leads),
+            "google_places_detailed_type": rng.choice(
+                ["restaurant|food", "bar", ""], num_leads
+            ),
+        }
+    )
+    for column in LEAD_ID_COLUMNS:
+        leads[column] = [f"{column} {i}" for i in range(num_leads)]
+    return leads
+
+
+class SavedModelTestCase(unittest.TestCase):
+    """
+    Enriched leads, a preprocessing transformer fitted on them and a temporary LocalRepository to save models to
+    """
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.patch = patch.multiple(
+            LocalRepository,
+            DF_OUTPUT=os.path.join(self.tmp_dir.name, "leads_enriched.csv"),
+            DF_PREDICTION_OUTPUT=os.path.join(self.tmp_dir.name, "predictions.csv"),
+            ML_MODELS=self.tmp_dir.name,
+        )
+        self.patch.start()
+        self.repository = LocalRepository()
+        self.leads = create_enriched_leads()
+        write_dataframe(self.leads, self.repository.get_enriched_data_path())
+
+        self.transformer = PreprocessingTransformer(
+            numerical_columns=["google_places_rating"],
+            categorical_columns=["review_polarization_type"],
+            multi_label_columns=["google_places_detailed_type"],
+        ).fit(read_dataframe(self.repository.get_enriched_data_path()))
+        self.features = self.transformer.transform_array(self.leads)
+        self.labels = np.arange(len(self.leads)) % 5
+
+    def tearDown(self):
+        self.patch.stop()
+        self.tmp_dir.cleanup()
+
+    def save_model(self, model, model_name: str) -> None:
+        self.repository.save_ml_model(model, model_name)
+        self.repository.save_ml_model(
+            self.transformer, get_transformer_name(model_name)
+        )
+
+    def save_random_forest(self) -> str:
+        model = RandomForestClassifier(n_estimators=5, random_state=0)
+        model.fit(self.features, self.labels)
+        model_name = "randomforest_epochs(1)_f1(0.5)_numclasses(5)_model.pkl"
+        self.save_model(model, model_name)
+        self.model = model
+        return model_name
+
+
+class TestBatchScorer(SavedModelTestCase):
+    def test_score_in_chunks(self):
+        model_name = self.save_random_forest()
+
+        with patch("evp.scoring.get_database", return_value=self.repository), patch(
+            "preprocessing.transformer.get_database", return_value=self.repository
+        ):
+            scorer = BatchScorer(model_name, workers=2)
+            report = scorer.score(chunk_size=7)
+
+        self.assertEqual(scorer.model.n_jobs, 2)
+        self.assertEqual(report["leads"], len(self.leads))
+        self.assertGreater(report["leads_per_second"], 0)
+        predictions = pd.read_csv(LocalRepository.DF_PREDICTION_OUTPUT)
+        self.assertEqual(
+            list(predictions.columns), LEAD_ID_COLUMNS + ["PredictedMerchantSize"]
+        )
+        pd.testing.assert_frame_equal(
+            predictions[LEAD_ID_COLUMNS], self.leads[LEAD_ID_COLUMNS]
+        )
+        expected = np.array(["XS", "S", "M", "L", "XL"])[
+            self.model.predict(self.features)
+        ]
+        self.assertEqual(predictions["PredictedMerchantSize"].tolist(), list(expected))
+
+    def test_xgboost_with_3_classes(self):
+        model = xgb.train(
+            {"objective": "multi:softmax", "num_class": 3},
+            xgb.DMatrix(self.features, label=self.labels % 3),
+            num_boost_round=2,
+        )
+        model_name = "xgb_epochs(1)_f1(0.5)_numclasses(3)_model.pkl"
+        self.save_model(model, model_name)
+
+        with patch("evp.scoring.get_database", return_value=self.repository), patch(
+            "preprocessing.transformer.get_database", return_value=self.repository
+        ):
+            scorer = BatchScorer(model_name)
+
+        predictions = scorer.predict(self.leads)
+        expected = model.predict(xgb.DMatrix(self.features)).astype(int)
+        self.assertEqual(
+            list(predictions), list(np.array(["XS", "{S, M, L}", "XL"])[expected])
+        )
+        self.assertEqual(len(scorer.predict(self.leads.iloc[:0])), 0)
+
+    def test_threads_do_not_change_the_shared_model(self):
+        model_name = self.save_random_forest()
+        shared_model = self.repository.load_ml_model(model_name)
+
+        with patch("evp.scoring.get_database", return_value=self.repository), patch(
+            "preprocessing.transformer.get_database", return_value=self.repository
+        ), patch.object(self.repository, "load_ml_model", return_value=shared_model):
+            scorers = [BatchScorer(model_name, workers=workers) for workers in [1, 3]]
+
+        self.assertEqual([scorer.model.n_jobs for scorer in scorers], [1, 3])
+        self.assertIsNone(shared_model.n_jobs)
+        self.assertIs(scorers[0].model.estimators_, shared_model.estimators_)
+
+    def test_missing_model(self):
+        with patch("evp.scoring.get_database", return_value=self.repository), patch(
+            "preprocessing.transformer.get_database", return_value=self.repository
+        ):
+            with self.assertRaises(ValueError):
+                BatchScorer("missing_model.pkl")
+
+
+class TestPredictionService(SavedModelTestCase):
+    def setUp(self):
+        super().setUp()
+        model_name = self.save_random_forest()
+        with patch("evp.scoring.get_database", return_value=self.repository), patch(
+            "preprocessing.transformer.get_database", return_value=self.repository
+        ):
+            self.service = PredictionService(model_name, max_wait_ms=50).start()
+        self.expected = np.array(["XS", "S", "M", "L", "XL"])[
+            self.model.predict(self.features)
+        ]
+        self.records = self.leads.to_dict("records")
+
+    def tearDown(self):
+        self.service.stop()
+        super().tearDown()
+
+    def test_requests_are_micro_batched(self):
+        futures = [self.service.submit(lead) for lead in self.records[:10]]
+        futures.append(self.service.submit(self.records[10:20]))
+
+        predictions = [prediction for f in futures for prediction in f.result(5)]
+        self.assertEqual(predictions, list(self.expected[:20]))
+        metrics = self.service.get_metrics()
+        self.assertEqual(metrics["requests"], 11)
+        self.assertGreater(metrics["mean_batch"], 1)
+        self.assertLessEqual(metrics["p50_ms"], metrics["p99_ms"])
+
+    def test_invalid_lead_only_fails_its_request(self):
+        invalid = self.service.submit({"google_places_rating": "unknown"})
+        valid = self.service.submit(self.records[0])
+
+        self.assertEqual(valid.result(5), [self.expected[0]])
+        with self.assertRaises(InvalidLeadsError):
+            invalid.result(5)
+
+    def test_submit_to_stopped_service(self):
+        self.service.stop()
+        with self.assertRaises(RuntimeError):
+            self.service.submit(self.records[0])
+
+    def test_http_server(self):
+        server = create_http_server(self.service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            request = urllib.request.Request(
+                f"{url}/predict",
+                data=json.dumps({"leads": self.records[:2]}).encode("utf-8"),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request, timeout=5) as response:
+                predictions = json.load(response)["predictions"]
+            self.assertEqual(predictions, list(self.expected[:2]))
+
+            with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+                self.assertEqual(json.load(response)["requests"], 1)
+
+            request = urllib.request.Request(f"{url}/predict", data=b"no json")
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(request, timeout=5)
+            self.assertEqual(context.exception.code, 400)
+
+            # every error of predicting the leads is a bad request, not only a ValueError
+            request = urllib.request.Request(
+                f"{url}/predict", data=json.dumps(self.records[0]).encode("utf-8")
+            )
+            with patch.object(
+                self.service.scorer, "predict", side_effect=KeyError("Phone")
+            ), self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(request, timeout=5)
+            self.assertEqual(context.exception.code, 400)
+
+            # a stopped service is an error of the server, not of the request
+            self.service.stop()
+            with self.assertRaises(urllib.error.HTTPError) as context:
+                urllib.request.urlopen(request, timeout=5)
+            self.assertEqual(context.exception.code, 500)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+
+if __name__ == "__main__":
+    unittest.main()
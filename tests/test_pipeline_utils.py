@@ -1,10 +1,25 @@
 # SPDX-License-Identifier: MIT
 # SPDX-FileCopyrightText: 2024 Felix Zailskas <felixzailskas@gmail.com>
 
+import os
+import subprocess
+import sys
 import unittest
 from unittest.mock import MagicMock, mock_open, patch
 
-from bdc.steps import *
+from bdc.steps import (
+    AnalyzeEmails,
+    GooglePlaces,
+    GooglePlacesDetailed,
+    GPTReviewSentimentAnalyzer,
+    GPTSummarizer,
+    HashGenerator,
+    PreprocessPhonenumbers,
+    RegionalAtlas,
+    SearchOffeneRegister,
+    SmartReviewInsightsEnhancer,
+    get_step_class,
+)
 from demo.pipeline_utils import (
     get_all_available_pipeline_json_configs,
     get_pipeline_additional_steps,
@@ -145,5 +160,30 @@ class TestPipelineUtils(unittest.TestCase):
                 self.assertEqual(step.force_refresh, gt.force_refresh)
 
 
+class TestLazyImports(unittest.TestCase):
+    def test_step_modules_imported_on_access(self):
+        # a fresh interpreter is needed, the other tests already imported the steps
+        code = (
+            "import sys, demo; "
+            "from bdc.steps import *; "
+            "assert 'bdc.steps.analyze_reviews' not in sys.modules; "
+            "assert 'sklearn' not in sys.modules and 'xgboost' not in sys.modules; "
+            "from bdc.steps import GPTReviewSentimentAnalyzer; "
+            "assert 'bdc.steps.analyze_reviews' in sys.modules"
+        )
+        subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=os.path.join(os.path.dirname(__file__), "../src"),
+            check=True,
+        )
+
+    def test_get_step_class(self):
+        self.assertIs(get_step_class("HashGenerator"), HashGenerator)
+        with self.assertRaises(KeyError):
+            get_step_class("UnknownStep")
+        with self.assertRaises(ImportError):
+            from bdc.steps import UnknownStep
+
+
 if __name__ == "__main__":
     unittest.main()
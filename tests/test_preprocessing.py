@@ -0,0 +1,319 @@
+# SPDX-License-Identifier: MIT
+# SPDX-FileCopyrightText: 2026 agent <agent@local>
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import numpy as np
+import pandas as pd
+
+from database.leads import (
+    STORAGE_FORMATS,
+    LocalRepository,
+    decode_list_column,
+    write_dataframe,
+)
+from preprocessing import (
+    PREPROCESSING_TRANSFORMER,
+    NumericalTransformer,
+    Preprocessing,
+    PreprocessingTransformer,
+)
+
+
+def create_enriched_leads() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "google_places_rating": [4.5, None, 3.0, 5.0],
+            "google_places_user_ratings_total": [10.0, 20.0, None, 40.0],
+            "review_polarization_type": [
+                "High-Rating Dominance",
+                None,
+                "Low-Rating Dominance",
+                "High-Rating Dominance",
+            ],
+            "google_places_detailed_type": [
+                "restaurant|food",
+                None,
+                "bar",
+                ["store"],
+            ],
+            "MerchantSizeByDPV": ["XS", "S", "M", "XL"],
+        }
+    )
+
+
+class TestNumericalTransformer(unittest.TestCase):
+    def setUp(self):
+        self.df = pd.DataFrame(
+            {
+                "a": [1.0, None, 3.0, 4.0],
+                "b": [10.0, 20.0, None, 50.0],
+                "c": [2.0, 2.0, None, 6.0],
+            }
+        )
+
+    def test_strategies_by_column(self):
+        transformer = NumericalTransformer(
+            ["a", "b", "c", "missing"],
+            imputation_strategies={"a": "mean", "b": "median"},
+            scaling_strategies={"a": "standard", "b": "robust", "c": "min_max"},
+        )
+        data = transformer.fit_transform(self.df)
+
+        self.assertEqual(data.dtype, np.float32)
+        self.assertEqual(data.shape, (4, 4))
+        statistics = transformer.get_statistics()
+        self.assertAlmostEqual(statistics.loc["a", "fill_value"], 8 / 3, places=5)
+        self.assertEqual(statistics.loc["b", "fill_value"], 20)
+        # constant imputation fills 0, also for columns without values
+        self.assertEqual(statistics.loc["c", "fill_value"], 0)
+        self.assertEqual(data[:, 3].tolist(), [0, 0, 0, 0])
+
+        self.assertAlmostEqual(data[:, 0].mean(), 0, places=5)
+        self.assertAlmostEqual(data[:, 0].std(), 1, places=5)
+        self.assertEqual(np.median(data[:, 1]), 0)
+        np.testing.assert_allclose(data[:, 2], [1 / 3, 1 / 3, 0, 1], rtol=1e-6)
+
+    def test_transform_reuses_statistics(self):
+        transformer = NumericalTransformer(
+            ["a", "b"], scaling_strategies={"b": "robust"}
+        ).fit(self.df)
+        data = transformer.transform(pd.DataFrame({"b": [None, 15.0]}))
+
+        self.assertEqual(data[:, 0].tolist(), [0, 0])
+        center, scale = transformer.center_[1], transformer.scale_[1]
+        np.testing.assert_allclose(data[:, 1], [-center / scale, (15 - center) / scale])
+
+    def test_partial_fit(self):
+        strategies = {
+            "imputation_strategies": {"a": "median", "b": "mean"},
+            "scaling_strategies": {"a": "robust", "b": "standard", "c": "min_max"},
+        }
+        transformer = NumericalTransformer(["a", "b", "c"], **strategies).fit(self.df)
+        chunked_transformer = NumericalTransformer(["a", "b", "c"], **strategies)
+        for start in range(0, len(self.df), 3):
+            chunked_transformer.partial_fit(self.df.iloc[start : start + 3])
+
+        pd.testing.assert_frame_equal(
+            chunked_transformer.get_statistics(), transformer.get_statistics()
+        )
+
+    def test_invalid_strategy(self):
+        with self.assertRaises(ValueError):
+            NumericalTransformer(["a"], scaling_strategies={"a": "log"})
+        with self.assertRaises(ValueError):
+            NumericalTransformer(["a"]).transform(self.df)
+
+
+class TestPreprocessingTransformer(unittest.TestCase):
+    def setUp(self):
+        self.transformer = PreprocessingTransformer(
+            numerical_columns=[
+                "google_places_rating",
+                "google_places_user_ratings_total",
+                "regional_atlas_regional_score",
+            ],
+            categorical_columns=["review_polarization_type"],
+            multi_label_columns=["google_places_detailed_type"],
+            columns_to_scale=["google_places_user_ratings_total"],
+        )
+
+    def test_fit_transform(self):
+        features = self.transformer.fit_transform(create_enriched_leads())
+
+        # columns that are not part of the leads are not used as features
+        self.assertEqual(
+            list(features.columns),
+            [
+                "google_places_rating",
+                "google_places_user_ratings_total",
+                "review_polarization_type_",
+                "review_polarization_type_High-Rating Dominance",
+                "review_polarization_type_Low-Rating Dominance",
+                "bar",
+                "food",
+                "restaurant",
+                "store",
+            ],
+        )
+        self.assertEqual(features["google_places_rating"].tolist(), [4.5, 0, 3.0, 5.0])
+        self.assertEqual(features["restaurant"].tolist(), [1, 0, 0, 0])
+        self.assertEqual(features["review_polarization_type_"].tolist(), [0, 1, 0, 0])
+        # robust scaling centers the median
+        self.assertEqual(np.median(features["google_places_user_ratings_total"]), 0)
+
+    def test_transform_new_leads(self):
+        fitted_features = self.transformer.fit_transform(create_enriched_leads())
+        new_leads = pd.DataFrame(
+            {
+                "google_places_rating": [2.0, None],
+                "review_polarization_type": ["Unknown Type", "Low-Rating Dominance"],
+                "google_places_detailed_type": ["bar|unknown", None],
+            },
+            index=[7, 9],
+        )
+        features = self.transformer.transform(new_leads)
+
+        self.assertEqual(
+            list(features.columns), self.transformer.get_feature_names_out()
+        )
+        self.assertEqual(list(features.index), [7, 9])
+        # missing columns are imputed, unknown categories and labels are ignored
+        self.assertEqual(
+            features.loc[7, "google_places_user_ratings_total"],
+            fitted_features.loc[2, "google_places_user_ratings_total"],
+        )
+        self.assertEqual(
+            features.filter(like="review_polarization_type").sum(axis=1).tolist(),
+            [0, 1],
+        )
+        self.assertEqual(features[["bar", "food"]].values.tolist(), [[1, 0], [0, 0]])
+
+    def test_transform_sparse(self):
+        dense = self.transformer.fit_transform(create_enriched_leads())
+        sparse = self.transformer.transform(create_enriched_leads(), sparse=True)
+
+        self.assertTrue(
+            all(isinstance(dtype, pd.SparseDtype) for dtype in sparse.dtypes)
+        )
+        self.assertEqual(list(sparse.columns), list(dense.columns))
+        np.testing.assert_allclose(
+            sparse.sparse.to_dense().to_numpy(), dense.to_numpy(), rtol=1e-6
+        )
+        # a lead has at most one category of every categorical column
+        self.assertLessEqual(sparse.sparse.density, 0.5)
+
+    def test_partial_fit(self):
+        leads = create_enriched_leads()
+        features = self.transformer.fit_transform(leads)
+        chunked_transformer = PreprocessingTransformer(
+            numerical_columns=list(self.transformer.numerical_columns),
+            categorical_columns=["review_polarization_type"],
+            multi_label_columns=["google_places_detailed_type"],
+            columns_to_scale=["google_places_user_ratings_total"],
+        )
+        for idx in range(len(leads)):
+            chunked_transformer.partial_fit(leads.iloc[[idx]])
+
+        # the vocabularies of all chunks are sorted like when fitting all leads
+        self.assertEqual(
+            chunked_transformer.get_feature_names_out(),
+            self.transformer.get_feature_names_out(),
+        )
+        pd.testing.assert_frame_equal(chunked_transformer.transform(leads), features)
+
+    def test_transform_unfitted(self):
+        with self.assertRaises(ValueError):
+            self.transformer.transform(create_enriched_leads())
+
+
+class TestPreprocessing(unittest.TestCase):
+    def test_fit_on_historical_data(self):
+        preprocessor = Preprocessing(filter_null_data=False, historical_bool=True)
+        preprocessor.preprocessed_df = create_enriched_leads()
+        df = preprocessor.implement_preprocessing_pipeline()
+
+        self.assertTrue(preprocessor.transformer_fitted)
+        self.assertEqual(df["MerchantSizeByDPV"].tolist(), [0, 1, 2, 4])
+        self.assertEqual(
+            list(df.columns),
+            preprocessor.transformer.get_feature_names_out() + ["MerchantSizeByDPV"],
+        )
+        self.assertIn("restaurant", preprocessor.added_features)
+
+    def test_save_sparse_features(self):
+        preprocessor = Preprocessing(
+            filter_null_data=False, historical_bool=True, sparse=True
+        )
+        preprocessor.preprocessed_df = create_enriched_leads()
+        df = preprocessor.implement_preprocessing_pipeline()
+        self.assertIsInstance(df["restaurant"].dtype, pd.SparseDtype)
+
+        with patch("preprocessing.preprocessing.write_dataframe") as mock_write, patch(
+            "preprocessing.preprocessing.get_database"
+        ) as mock_get_database:
+            mock_get_database.return_value.get_feature_store_path.return_value = None
+            preprocessor.save_preprocessed_data()
+        written_df = mock_write.call_args[0][0]
+        self.assertFalse(
+            any(isinstance(dtype, pd.SparseDtype) for dtype in written_df.dtypes)
+        )
+        self.assertEqual(written_df["restaurant"].tolist(), [1, 0, 0, 0])
+
+    def test_preprocess_in_chunks(self):
+        leads = create_enriched_leads()
+        leads["google_places_detailed_type"] = decode_list_column(
+            leads["google_places_detailed_type"]
+        )
+        preprocessor = Preprocessing(filter_null_data=True, historical_bool=True)
+        preprocessor.preprocessed_df = leads.copy()
+        expected = preprocessor.implement_preprocessing_pipeline()
+
+        for storage_format in STORAGE_FORMATS:
+            with tempfile.TemporaryDirectory() as tmp_dir, patch.multiple(
+                LocalRepository,
+                DF_HISTORICAL_OUTPUT=os.path.join(tmp_dir, "historic_enriched.csv"),
+                DF_PREPROCESSED_INPUT=tmp_dir,
+            ):
+                repository = LocalRepository(storage_format=storage_format)
+                write_dataframe(
+                    leads,
+                    repository.get_enriched_data_path(historical=True),
+                    storage_format,
+                )
+                with patch(
+                    "preprocessing.preprocessing.get_database", return_value=repository
+                ), patch.object(repository, "save_ml_model") as mock_save:
+                    preprocessor = Preprocessing(
+                        filter_null_data=True, historical_bool=True
+                    )
+                    # the second chunk is empty after filtering the leads without rating
+                    rows = preprocessor.preprocess_in_chunks(chunk_size=1)
+
+                self.assertEqual(rows, 3)
+                mock_save.assert_called_once_with(
+                    preprocessor.transformer, PREPROCESSING_TRANSFORMER
+                )
+                pd.testing.assert_frame_equal(
+                    repository.load_preprocessed_data(),
+                    expected.reset_index(drop=True),
+                    check_dtype=False,
+                )
+                feature_store = repository.load_feature_store()
+                self.assertEqual(
+                    feature_store.columns,
+                    preprocessor.transformer.get_feature_names_out(),
+                )
+                np.testing.assert_allclose(
+                    feature_store.to_dataframe(), expected, rtol=1e-6
+                )
+
+    def test_transform_lead_data(self):
+        transformer = PreprocessingTransformer(
+            numerical_columns=["google_places_rating"],
+            categorical_columns=["review_polarization_type"],
+            multi_label_columns=["google_places_detailed_type"],
+        ).fit(create_enriched_leads())
+        preprocessor = Preprocessing(
+            filter_null_data=True, historical_bool=False, transformer=transformer
+        )
+        preprocessor.preprocessed_df = create_enriched_leads().iloc[[1, 3]]
+
+        with patch("preprocessing.preprocessing.get_database") as mock_get_database:
+            df = preprocessor.implement_preprocessing_pipeline()
+        mock_get_database.assert_not_called()
+
+        # the lead data is not used for fitting, leads without rating are filtered
+        self.assertFalse(preprocessor.transformer_fitted)
+        self.assertEqual(list(df.index), [3])
+        self.assertEqual(
+            list(df.columns),
+            transformer.get_feature_names_out() + ["MerchantSizeByDPV"],
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()